@@ -85,6 +85,163 @@ export const processQuery = async (req, res) => {
   }
 };
 
+export const processQueryStream = async (req, res) => {
+  const { query } = req.body;
+
+  if (!query || !query.trim()) {
+    return res.status(400).json({
+      message: "Query is required",
+      error: "Empty query provided"
+    });
+  }
+
+  try {
+    console.log(`[ChatController] Streaming query: ${query.substring(0, 50)}...`);
+
+    // No overall timeout: tokens keep arriving, so long answers are not cut off at 30s
+    const response = await axios.post(
+      "http://localhost:5001/askai",
+      { prompt: query, stream: true },
+      {
+        responseType: "stream",
+        headers: {
+          'Content-Type': 'application/json',
+          'Accept': 'text/event-stream'
+        }
+      }
+    );
+
+    res.writeHead(200, {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache',
+      'Connection': 'keep-alive',
+      'X-Accel-Buffering': 'no'
+    });
+
+    // Relay events as they arrive and remember the final content for MongoDB
+    let buffer = "";
+    let finalContent = null;
+    response.data.on("data", (chunk) => {
+      res.write(chunk);
+      buffer += chunk.toString();
+      const events = buffer.split("\n\n");
+      buffer = events.pop();
+      for (const event of events) {
+        if (event.startsWith("event: done")) {
+          const dataLine = event.split("\n").find((line) => line.startsWith("data: "));
+          try {
+            finalContent = JSON.parse(dataLine.slice(6)).content;
+          } catch (parseError) {
+            console.error("[ChatController] Could not parse final stream event:", parseError);
+          }
+        }
+      }
+    });
+
+    response.data.on("end", async () => {
+      res.end();
+      if (!finalContent) return;
+      try {
+        await new Chat({
+          userId: req.user.id,
+          query,
+          response: finalContent,
+          timestamp: new Date(),
+        }).save();
+      } catch (dbError) {
+        console.error("[ChatController] Error saving streamed chat to MongoDB:", dbError);
+      }
+    });
+
+    response.data.on("error", (streamError) => {
+      console.error("[ChatController] Gemini stream error:", streamError);
+      res.end();
+    });
+
+    // req's "close" has already fired once express.json() consumed the body; the response
+    // closing before we end it is what signals that the client went away
+    const stopUpstream = () => {
+      if (!res.writableEnded) response.data.destroy();
+    };
+    res.on("close", stopUpstream);
+    if (res.destroyed) stopUpstream(); // the client left while waiting for the upstream headers
+  } catch (error) {
+    console.error("[ChatController] Error in processQueryStream:", error);
+
+    if (error.code === 'ECONNREFUSED' || error.code === 'ETIMEDOUT') {
+      return res.status(503).json({
+        message: "AI service is unavailable",
+        error: "Cannot connect to Gemini service. Please ensure the Gemini service is running on port 5001.",
+        details: error.message
+      });
+    }
+
+    res.status(500).json({
+      message: "Error processing query",
+      error: error.message || "Unknown error occurred"
+    });
+  }
+};
+
+export const processBatchQuery = async (req, res) => {
+  const { queries } = req.body;
+
+  if (!Array.isArray(queries) || queries.length === 0) {
+    return res.status(400).json({
+      message: "Queries are required",
+      error: "Expected a non-empty array of queries"
+    });
+  }
+
+  try {
+    console.log(`[ChatController] Processing batch of ${queries.length} queries`);
+
+    // One round trip to the Gemini RAG service for the whole batch
+    const response = await axios.post(
+      "http://localhost:5001/batch",
+      { items: queries.map((query) => ({ type: "askai", prompt: query })) },
+      {
+        timeout: 120000, // LLM calls run concurrently, but allow for large batches
+        headers: {
+          'Content-Type': 'application/json'
+        }
+      }
+    );
+
+    const responses = response.data.results.map((result) =>
+      result.content || result.error || "I'm sorry, I couldn't generate a response. Please try again."
+    );
+
+    try {
+      await Chat.insertMany(queries.map((query, i) => ({
+        userId: req.user.id,
+        query,
+        response: responses[i],
+        timestamp: new Date(),
+      })));
+    } catch (dbError) {
+      console.error("[ChatController] Error saving batch to MongoDB:", dbError);
+    }
+
+    res.json({ responses });
+  } catch (error) {
+    console.error("[ChatController] Error in processBatchQuery:", error);
+
+    if (error.code === 'ECONNREFUSED' || error.code === 'ETIMEDOUT') {
+      return res.status(503).json({
+        message: "AI service is unavailable",
+        error: "Cannot connect to Gemini service. Please ensure the Gemini service is running on port 5001.",
+        details: error.message
+      });
+    }
+
+    res.status(500).json({
+      message: "Error processing batch query",
+      error: error.response?.data?.error || error.message || "Unknown error occurred"
+    });
+  }
+};
+
 export const getChatHistory = async (req, res) => {
   try {
     const chatHistory = await Chat.find({ userId: req.user.id }).sort({
@@ -1,5 +1,5 @@
 import express from "express";
-import { processQuery, getChatHistory } from "../controllers/chatController.js";
+import { processQuery, processQueryStream, processBatchQuery, getChatHistory } from "../controllers/chatController.js";
 import { authenticateToken } from "../middleware/auth.js";
 import fs from 'fs';
 import path from 'path';
@@ -12,6 +12,8 @@ const __dirname = path.dirname(__filename);
 const router = express.Router();
 
 router.post("/query", authenticateToken, processQuery);
+router.post("/query-stream", authenticateToken, processQueryStream);
+router.post("/batch-query", authenticateToken, processBatchQuery);
 router.get("/chat-history", authenticateToken, getChatHistory);
 // Twitter Trends Endpoint - reads from Models/twitter_scraper.csv
 router.get('/twitter-trends', (req, res) => {
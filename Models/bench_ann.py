@@ -0,0 +1,103 @@
+"""
+Recall vs latency report for the vector index backends.
+
+Builds each backend over a synthetic clustered corpus of 384-d embeddings
+(trend embeddings are far from uniform, so clustered data is the realistic
+case), then reports build time, per-query latency and recall@k against the
+exact flat index for a sweep of each backend's speed/accuracy knob.
+
+Usage:
+    python bench_ann.py
+    python bench_ann.py --sizes 100000 1000000 --queries 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from trend_index import normalize_rows
+from vector_index import FlatIndex, IVFIndex, HNSWIndex
+
+DIM = 384
+
+
+def make_corpus(n: int, rng: np.random.Generator, num_topics: int = 2000):
+    """Gaussian mixture around random topic centres, normalized"""
+    centres = rng.standard_normal((num_topics, DIM), dtype=np.float32)
+    topics = rng.integers(0, num_topics, size=n)
+    vectors = centres[topics] + 0.6 * rng.standard_normal((n, DIM), dtype=np.float32)
+    return normalize_rows(vectors), centres
+
+
+def make_queries(centres: np.ndarray, count: int, rng: np.random.Generator):
+    picks = centres[rng.integers(0, len(centres), size=count)]
+    return normalize_rows(picks + 0.8 * rng.standard_normal(picks.shape, dtype=np.float32))
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def time_queries(index, queries, top_k):
+    index.search(queries[:1], top_k)  # warm-up
+    start = time.perf_counter()
+    results = [index.search(q[None, :], top_k)[0][0] for q in queries]
+    elapsed_ms = (time.perf_counter() - start) / len(queries) * 1000
+    return np.array(results), elapsed_ms
+
+
+def report(name, setting, build_s, latency_ms, rec):
+    print(f"{name:>6} | {setting:>14} | {build_s:>9.2f} | {latency_ms:>11.3f} | {rec:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--skip-hnsw", action="store_true", help="HNSW builds are slow at millions of rows")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        vectors, centres = make_corpus(n, rng)
+        queries = make_queries(centres, args.queries, rng)
+
+        print(f"\n== {n} vectors, {args.queries} queries, recall@{args.top_k} ==")
+        print(f"{'index':>6} | {'setting':>14} | {'build (s)':>9} | {'ms / query':>11} | {'recall':>9}")
+        print("-" * 62)
+
+        start = time.perf_counter()
+        flat = FlatIndex(DIM).build(vectors)
+        build_s = time.perf_counter() - start
+        truth, latency_ms = time_queries(flat, queries, args.top_k)
+        report("flat", "exact", build_s, latency_ms, 1.0)
+
+        start = time.perf_counter()
+        ivf = IVFIndex(DIM).build(vectors)
+        build_s = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            found, latency_ms = time_queries(ivf, queries, args.top_k)
+            report("ivf", f"nprobe={nprobe}", build_s, latency_ms, recall(found, truth))
+
+        if args.skip_hnsw:
+            continue
+        try:
+            start = time.perf_counter()
+            hnsw = HNSWIndex(DIM).build(vectors)
+            build_s = time.perf_counter() - start
+        except ImportError as e:
+            print(f"  hnsw skipped: {e}")
+            continue
+        for ef in args.ef:
+            hnsw.ef = ef
+            found, latency_ms = time_queries(hnsw, queries, args.top_k)
+            report("hnsw", f"ef={ef}", build_s, latency_ms, recall(found, truth))
+
+
+if __name__ == "__main__":
+    main()
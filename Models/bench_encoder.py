@@ -0,0 +1,109 @@
+"""
+Throughput and parity of the sentence encoder backends (see encoders.py).
+
+For every backend the same texts are encoded, and the report covers:
+
+- load (s): time to load the model (or exported graph)
+- corpus texts/s: batched encode of the whole text set (batch size 32), as
+  in an index build
+- query p50 / p95 (ms): one text per call, as in /askai retrieval
+- parity against the torch backend: the smallest cosine between the two
+  vectors of a text, the largest change in any pairwise similarity score,
+  and the overlap of each text's top-5 neighbours
+
+Texts are the trend texts from twitter_scraper.csv when present, otherwise
+synthetic ones. Exits with status 1 when a backend's smallest cosine is
+below --tolerance.
+
+Usage:
+    python bench_encoder.py
+    python bench_encoder.py --backends torch onnx-int8 --texts 5000 --queries 300
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from encoders import BACKENDS, load_encoder, parity
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def load_texts(n: int) -> list:
+    """Up to n trend texts from the live corpus, padded with synthetic trend texts"""
+    texts = []
+    csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "twitter_scraper.csv")
+    if os.path.exists(csv_path):
+        from trend_corpus import load_corpus
+        from trend_index import build_trend_texts
+        texts = build_trend_texts(load_corpus(csv_path))[:n]
+    rng = np.random.default_rng(0)
+    words = ["cricket", "election", "music", "launch", "final", "festival", "budget", "trailer", "match", "release"]
+    while len(texts) < n:
+        trend = "#" + "".join(w.title() for w in rng.choice(words, size=rng.integers(1, 4)))
+        texts.append(f"Twitter Trend: {trend} | Tweet Count: {rng.integers(1, 500)}K")
+    return texts
+
+
+def run_backend(backend: str, texts: list, queries: list):
+    start = time.perf_counter()
+    encoder = load_encoder(MODEL_NAME, backend)
+    load_s = time.perf_counter() - start
+
+    encoder.encode(texts[:32], batch_size=32, convert_to_numpy=True)  # warm-up
+    start = time.perf_counter()
+    vectors = encoder.encode(texts, batch_size=32, convert_to_numpy=True)
+    throughput = len(texts) / (time.perf_counter() - start)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        encoder.encode(query, convert_to_numpy=True)
+        latencies.append(time.perf_counter() - start)
+    p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+    return load_s, throughput, p50, p95, np.asarray(vectors, dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--tolerance", type=float, default=0.99, help="Minimum cosine to the torch vectors")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    queries = texts[:args.queries]
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    print(f"{len(texts)} texts, {len(queries)} single-text queries, model {MODEL_NAME}\n")
+    print(f"{'backend':>12} | {'load (s)':>8} | {'corpus texts/s':>14} | {'query p50 ms':>12} | {'query p95 ms':>12} | "
+          f"{'min cosine':>10} | {'max d score':>11} | {'top-5 same':>10}")
+    print("-" * 112)
+
+    reference = None
+    failed = False
+    for backend in backends:
+        try:
+            load_s, throughput, p50, p95, vectors = run_backend(backend, texts, queries)
+        except ImportError as e:
+            print(f"{backend:>12} | skipped: {e}")
+            continue
+        if backend == "torch":
+            reference = vectors
+        row = f"{backend:>12} | {load_s:>8.2f} | {throughput:>14.1f} | {p50:>12.2f} | {p95:>12.2f} | "
+        if reference is None:
+            # Parity is always against torch; without it only speed is reported
+            print(row + f"{'-':>10} | {'-':>11} | {'-':>10}")
+            continue
+        check = parity(reference, vectors)
+        print(row + f"{check['min_cosine']:>10.5f} | {check['max_score_diff']:>11.2e} | {check['topk_overlap']:>10.3f}")
+        if check["min_cosine"] < args.tolerance:
+            print(f"  {backend}: min cosine {check['min_cosine']:.5f} is below the tolerance {args.tolerance}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
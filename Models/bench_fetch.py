@@ -0,0 +1,129 @@
+"""
+Scrape-cycle benchmark for the shared fetch layer, against a local stub server.
+
+Starts a threaded HTTP server on localhost that serves synthetic trends24
+region pages with a fixed per-request latency (standing in for the real
+site's response time) and honours If-None-Match. Then compares, for the
+same set of regions:
+
+    sequential   one bare requests.get per region (the old scraper)
+    fetcher      fetch.Fetcher: pooled session, concurrent, per-host limit
+    fetcher 304  a second cycle where every page is unchanged
+
+and checks that every page parses to the expected trends.
+
+Usage:
+    python bench_fetch.py
+    python bench_fetch.py --regions 48 --latency 0.25 --per-host 16
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from fetch import Fetcher
+from twitter_scraper import parse_trends24
+
+CARDS = 24
+TRENDS_PER_CARD = 50
+
+
+def region_page(region: str) -> bytes:
+    """A trends24-shaped page: CARDS hourly cards of TRENDS_PER_CARD trends each"""
+    cards = []
+    for slot in range(CARDS):
+        items = "".join(
+            f'<li><span class="trend-name"><a href="#">#{region}Trend{slot}x{rank}Tag</a></span>'
+            f'<span class="tweet-count">{(rank + 1) * 3}K</span></li>'
+            for rank in range(TRENDS_PER_CARD)
+        )
+        cards.append(f'<div class="trend-card"><h3 class="title">{slot} hours ago</h3>'
+                     f'<ol class="trend-card__list">{items}</ol></div>')
+    return f"<html><body>{''.join(cards)}</body></html>".encode()
+
+
+def make_handler(pages: dict, latency: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = pages.get(self.path.strip("/"))
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--regions", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.3, help="Server-side seconds per request")
+    parser.add_argument("--per-host", type=int, default=None, help="Fetcher per-host limit (default: all regions)")
+    args = parser.parse_args()
+
+    regions = [f"region{i}" for i in range(args.regions)]
+    pages = {region: region_page(region) for region in regions}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(pages, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/{region}/" for region in regions]
+    expected = CARDS * TRENDS_PER_CARD
+
+    print(f"{len(regions)} regions, {args.latency * 1000:.0f} ms server latency, "
+          f"{len(pages[regions[0]]) // 1024} KiB per page\n")
+
+    start = time.perf_counter()
+    sequential = [requests.get(url, timeout=(5, 20)).content for url in urls]
+    sequential_s = time.perf_counter() - start
+    assert all(len(parse_trends24(page)) == expected for page in sequential)
+    print(f"{'sequential requests.get':<28} {sequential_s:>7.2f} s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fetcher = Fetcher(max_workers=max(len(urls), 1), per_host_limit=args.per_host or len(urls),
+                          validators_path=os.path.join(tmp, "validators.json"))
+        start = time.perf_counter()
+        results = fetcher.fetch_many(urls, namespace="bench")
+        fetch_s = time.perf_counter() - start
+        assert all(r.ok and len(parse_trends24(r.content)) == expected for r in results.values())
+        for url in urls:
+            fetcher.commit(url, namespace="bench")
+        print(f"{'fetcher (concurrent)':<28} {fetch_s:>7.2f} s   {sequential_s / fetch_s:>5.1f}x")
+
+        start = time.perf_counter()
+        results = fetcher.fetch_many(urls, namespace="bench")
+        unchanged_s = time.perf_counter() - start
+        skipped = sum(r.not_modified for r in results.values())
+        print(f"{'fetcher, unchanged (304)':<28} {unchanged_s:>7.2f} s   {skipped}/{len(urls)} pages skipped")
+        print(f"\nfetcher stats: {fetcher.stats()}")
+        fetcher.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Offline parse benchmark for the scraper parser backends (page_parsers.py).
+
+Parses HTML fixtures with every installed backend and reports pages/sec and
+peak memory per backend and page kind, after checking that each backend
+returns exactly what the bs4 reference returns. Peak memory is the growth of
+peak RSS (ru_maxrss) while parsing the pages once, measured in a fresh
+subprocess per backend and kind, so it includes memory that libxml2
+allocates in C, which tracemalloc cannot see. Unix only; "n/a" elsewhere.
+
+Fixtures are *.html files named by page kind:
+
+    trends24*.html   trends24 region pages
+    reels*.html      slayingsocial Reels trends page (current + past sections)
+    songs*.html      socialbu trending songs page
+
+Without --fixtures, synthetic pages of the real sites' shape are used,
+including non-ASCII pages with and without a declared charset.
+--download DIR saves the live pages once (through fetch.Fetcher) so
+later runs can use real markup offline.
+
+Usage:
+    python bench_parse.py
+    python bench_parse.py --download fixtures/ --regions india,united-states
+    python bench_parse.py --fixtures fixtures/ --repeat 20
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from bench_fetch import region_page
+from page_parsers import CURRENT_REELS_HEADING, PARSERS, PAST_REELS_HEADING, get_parser
+
+KINDS = ("trends24", "reels", "songs")
+
+
+def reels_page(trends: int = 40) -> bytes:
+    """A slayingsocial-shaped page: current and past sections of <p><strong> trends"""
+    def section(heading_id, prefix):
+        paragraphs = "".join(
+            f'<p><strong>{prefix} trend {i} <a href="https://www.instagram.com/reel/{prefix}{i}/">example</a></strong>'
+            f' Use this audio with a {i}-step transition and text overlay.</p>'
+            f'<figure class="wp-block-embed"><div>embed {i}</div></figure>'
+            for i in range(trends)
+        )
+        return f'<h2 id="{heading_id}">{prefix} trends</h2>{paragraphs}'
+    body = section("current-instagram-reels-trends-this-week", "Current") + \
+        section("past-instagram-reels-trends", "Past") + '<h2 id="faq">FAQ</h2><p><strong>Q</strong> A</p>'
+    return f"<html><body><article>{body}</article></body></html>".encode()
+
+
+def songs_page(songs: int = 60) -> bytes:
+    """A socialbu-shaped page: a song <li> followed by its "# of Reels" <li>"""
+    items = "".join(
+        f'<ul><li><a href="https://www.instagram.com/reels/audio/{i}/">Song {i} - Artist {i % 7}</a></li>'
+        f'<li># of Reels: {(i + 1) * 1.5:.1f}K</li></ul>'
+        f'<p>Song {i} works for slow-motion and outfit reels.</p><p><strong>{i * 13}</strong> likes</p>'
+        for i in range(songs)
+    )
+    nav = "".join(f'<li><a href="/blog/{i}">Post {i}</a></li>' for i in range(20))
+    return f"<html><body><nav><ul>{nav}</ul></nav><article>{items}</article></body></html>".encode()
+
+
+# Devanagari, accented and emoji names: pages without a <meta charset> must still decode as UTF-8
+NON_ASCII_NAMES = ("#शिवजी_की_समर्थता", "Café Müller", "Año Nuevo 🎉", "#ТрендДня")
+
+
+def non_ascii_fixtures() -> dict:
+    """One page per kind with non-ASCII names: UTF-8 with no declared charset, and declared windows-1252"""
+    names = NON_ASCII_NAMES
+    items = "".join(
+        f'<li><span class="trend-name"><a href="#">{name}</a></span><span class="tweet-count">{i + 2}5K</span></li>'
+        for i, name in enumerate(names)
+    )
+    trends = f'<html><body><ol class="trend-card__list">{items}</ol></body></html>'
+    reels = "".join(f'<p><strong>{name} <a href="https://www.instagram.com/reel/{i}/">reel</a></strong>'
+                    f' Ajoutez « {name} » à la vidéo.</p>' for i, name in enumerate(names))
+    reels = (f'<html><body><h2 id="current-instagram-reels-trends-this-week">Tendências</h2>{reels}'
+             f'<h2 id="past-instagram-reels-trends">Passé</h2>{reels}<h2 id="faq">FAQ</h2></body></html>')
+    songs = "".join(
+        f'<ul><li><a href="https://www.instagram.com/reels/audio/{i}/">{name} - Beyoncé</a></li>'
+        f'<li># of Reels: {i + 1}.5K</li></ul><p>Música para «{name}».</p><p><strong>{i}2</strong> likes</p>'
+        for i, name in enumerate(names)
+    )
+    songs = f"<html><body><article>{songs}</article></body></html>"
+    latin = '<html><head><meta charset="windows-1252"></head><body><ol class="trend-card__list">' \
+            '<li>Café Müller12K</li><li>Año Nuevo3K</li></ol></body></html>'
+    return {
+        "trends24": [trends.encode("utf-8"), latin.encode("windows-1252")],
+        "reels": [reels.encode("utf-8")],
+        "songs": [songs.encode("utf-8")],
+    }
+
+
+def synthetic_fixtures(regions: int) -> dict:
+    fixtures = {
+        "trends24": [region_page(f"region{i}") for i in range(regions)],
+        "reels": [reels_page()],
+        "songs": [songs_page()],
+    }
+    for kind, pages in non_ascii_fixtures().items():
+        fixtures[kind] += pages
+    return fixtures
+
+
+def load_fixtures(directory: str) -> dict:
+    fixtures = {kind: [] for kind in KINDS}
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        kind = next((k for k in KINDS if os.path.basename(path).startswith(k)), None)
+        if kind is None:
+            print(f"[bench_parse] skipping {path}: name does not start with {'/'.join(KINDS)}")
+            continue
+        with open(path, "rb") as f:
+            fixtures[kind].append(f.read())
+    return fixtures
+
+
+def download_fixtures(directory: str, regions):
+    from fetch import Fetcher
+    from instagram_trending_songs import url as songs_url
+    from latest_insta_trends import url as reels_url
+    from twitter_scraper import region_url
+
+    os.makedirs(directory, exist_ok=True)
+    targets = {f"trends24-{region}.html": region_url(region) for region in regions}
+    targets.update({"reels.html": reels_url, "songs.html": songs_url})
+    fetcher = Fetcher(conditional=False)
+    results = fetcher.fetch_many(targets.values(), namespace="bench_parse")
+    for filename, url in targets.items():
+        result = results[url]
+        if not result.ok:
+            print(f"[bench_parse] {url}: {result.error}")
+            continue
+        with open(os.path.join(directory, filename), "wb") as f:
+            f.write(result.content)
+        print(f"[bench_parse] saved {filename} ({len(result.content) // 1024} KiB)")
+    fetcher.close()
+
+
+def parse_page(parser, kind: str, page: bytes):
+    if kind == "trends24":
+        return parser.trends24(page)
+    if kind == "reels":
+        return parser.reels_section(page, CURRENT_REELS_HEADING), parser.reels_section(page, PAST_REELS_HEADING)
+    return parser.trending_songs(page)
+
+
+def run(parser, kind: str, pages: list, repeat: int) -> float:
+    """Pages/sec over `repeat` passes"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parse_page(parser, kind, page)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+
+def _max_rss_kib() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / 1024 if sys.platform == "darwin" else rss
+
+
+def measure_rss(backend: str, kind: str, pages: list):
+    """Peak RSS growth (KiB) of parsing the pages once; call in a fresh process"""
+    # Load every backend, as the parent has, so the baseline matches the high-water mark inherited from it
+    parsers = {name: get_parser(name) for name in PARSERS}
+    parser = parsers[backend]
+    before = _max_rss_kib()
+    for page in pages:
+        parse_page(parser, kind, page)
+    return _max_rss_kib() - before
+
+
+def peak_rss(backend: str, kind: str, args):
+    """
+    measure_rss in a subprocess, so earlier backends and runs do not raise the high-water mark.
+
+    Linux carries ru_maxrss across fork and exec, so call this before the
+    calling process parses anything itself.
+    """
+    if resource is None:
+        return None
+    command = [sys.executable, os.path.abspath(__file__), "--measure-rss", backend, kind,
+               "--synthetic-regions", str(args.synthetic_regions)]
+    if args.fixtures:
+        command += ["--fixtures", args.fixtures]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="Directory of saved *.html fixtures")
+    parser.add_argument("--download", metavar="DIR", help="Save live pages as fixtures into DIR and exit")
+    parser.add_argument("--regions", default="india", help="trends24 regions for --download")
+    parser.add_argument("--synthetic-regions", type=int, default=8, help="Synthetic trends24 pages")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--measure-rss", nargs=2, metavar=("BACKEND", "KIND"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.download:
+        download_fixtures(args.download, [r.strip() for r in args.regions.split(",") if r.strip()])
+        return
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else synthetic_fixtures(args.synthetic_regions)
+    if args.measure_rss:
+        backend, kind = args.measure_rss
+        print(measure_rss(backend, kind, fixtures[kind]))
+        return
+    backends = []
+    for name in PARSERS:
+        backend = get_parser(name)
+        if backend.name == name:
+            backends.append(backend)
+    reference = get_parser("bs4")
+    peaks = {
+        (backend.name, kind): peak_rss(backend.name, kind, args)
+        for kind, pages in fixtures.items() if pages for backend in backends
+    }
+
+    print(f"{'kind':<10} {'pages':>5} {'KiB':>7}  " + "  ".join(f"{b.name + ' pages/s':>14} {'RSS KiB':>9}" for b in backends))
+    for kind, pages in fixtures.items():
+        if not pages:
+            continue
+        expected = [parse_page(reference, kind, page) for page in pages]
+        for backend in backends:
+            got = [parse_page(backend, kind, page) for page in pages]
+            assert got == expected, f"{backend.name} output differs from bs4 on {kind} pages"
+        size = sum(len(page) for page in pages) / len(pages) / 1024
+        cells = []
+        for backend in backends:
+            pages_per_sec = run(backend, kind, pages, args.repeat)
+            peak = peaks[backend.name, kind]
+            cells.append(f"{pages_per_sec:>14.1f} " + (f"{peak:>9.0f}" if peak is not None else f"{'n/a':>9}"))
+        print(f"{kind:<10} {len(pages):>5} {size:>7.0f}  " + "  ".join(cells))
+    print("\nAll backends match the bs4 reference output.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Memory, load time and accuracy of the quantized index backends (fp16, int8)
+against the exact float32 flat index.
+
+For each corpus size, every backend is built over the same synthetic
+clustered 384-d corpus and saved. The report then covers:
+
+- load: time to open the saved index (np.load for flat, mmap for fp16/int8)
+- resident: growth of this process's RSS over load + queries, i.e. what a
+  worker actually keeps in memory (mapped pages that were read included)
+- ms / query: top-k search latency
+- recall / same top-k / max |d score|: agreement with the flat index
+
+Exits with status 1 when a backend's recall@k is below --tolerance.
+
+Usage:
+    python bench_quantized.py
+    python bench_quantized.py --sizes 200000 1000000 --queries 200 --tolerance 0.98
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench_ann import DIM, make_corpus, make_queries
+from vector_index import QUANTIZED_BACKENDS, create_index, index_filename, load_index
+
+
+def rss_bytes() -> int:
+    """Resident set size from /proc (Linux); 0 where unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def run_backend(backend: str, path: str, queries: np.ndarray, top_k: int):
+    gc.collect()
+    before = rss_bytes()
+    start = time.perf_counter()
+    index = load_index(path, backend)
+    load_s = time.perf_counter() - start
+
+    index.search(queries[:1], top_k)  # warm-up
+    start = time.perf_counter()
+    results = [index.search(q[None, :], top_k) for q in queries]
+    latency_ms = (time.perf_counter() - start) / len(queries) * 1000
+    resident = rss_bytes() - before
+    ids = np.array([r[0][0] for r in results])
+    scores = np.array([r[1][0] for r in results])
+    del index, results
+    gc.collect()
+    return load_s, resident, latency_ms, ids, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 500_000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.99, help="Minimum recall@k vs flat")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    failed = False
+    for n in args.sizes:
+        vectors, centres = make_corpus(n, rng)
+        queries = make_queries(centres, args.queries, rng)
+        print(f"\n== {n} vectors ({vectors.nbytes / 2**20:.0f} MiB float32), {args.queries} queries, top-{args.top_k} ==")
+        print(f"{'index':>6} | {'load (s)':>8} | {'resident MiB':>12} | {'ms / query':>10} | "
+              f"{'recall':>7} | {'same top-k':>10} | {'max |d score|':>13}")
+        print("-" * 87)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {}
+            for backend in ("flat", *QUANTIZED_BACKENDS):
+                path = os.path.join(tmp, index_filename(backend, "bench"))
+                create_index(backend, DIM).build(vectors).save(path)
+                paths[backend] = path
+            del vectors
+            gc.collect()
+
+            truth_ids = truth_scores = None
+            for backend, path in paths.items():
+                load_s, resident, latency_ms, ids, scores = run_backend(backend, path, queries, args.top_k)
+                if truth_ids is None:
+                    truth_ids, truth_scores = ids, scores
+                hits = sum(len(set(f) & set(t)) for f, t in zip(ids, truth_ids))
+                rec = hits / truth_ids.size
+                same = float(np.mean([np.array_equal(f, t) for f, t in zip(ids, truth_ids)]))
+                max_diff = float(np.max(np.abs(np.sort(scores, axis=1) - np.sort(truth_scores, axis=1))))
+                print(f"{backend:>6} | {load_s:>8.3f} | {resident / 2**20:>12.1f} | {latency_ms:>10.3f} | "
+                      f"{rec:>7.4f} | {same:>10.3f} | {max_diff:>13.2e}")
+                if rec < args.tolerance:
+                    print(f"  {backend}: recall {rec:.4f} is below the tolerance {args.tolerance}")
+                    failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Per-query retrieval latency benchmark.
+
+Compares the original retrieval path (sklearn cosine_similarity over the full
+matrix, full argsort, per-row DataFrame.iloc lookups) with TrendIndex.search
+on synthetic corpora of MiniLM-sized (384-d) embeddings.
+
+Usage:
+    python bench_retrieval.py
+    python bench_retrieval.py --sizes 10000 100000 --queries 50
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from trend_index import TrendIndex
+
+DIM = 384
+TOP_K = 5
+
+
+def make_corpus(n: int, rng: np.random.Generator):
+    embeddings = rng.standard_normal((n, DIM), dtype=np.float32)
+    df = pd.DataFrame({
+        'Trend': [f"#trend{i}" for i in range(n)],
+        'Count': rng.integers(0, 1_000_000, size=n),
+    })
+    texts = [f"Twitter Trend: #trend{i}" for i in range(n)]
+    return df, texts, embeddings
+
+
+def legacy_retrieve(query, embeddings, df):
+    from sklearn.metrics.pairwise import cosine_similarity
+    similarities = cosine_similarity(query.reshape(1, -1), embeddings)[0]
+    top_indices = np.argsort(similarities)[-TOP_K:][::-1]
+    return [
+        {'trend': df.iloc[idx]['Trend'], 'count': df.iloc[idx]['Count'], 'similarity': float(similarities[idx])}
+        for idx in top_indices
+    ]
+
+
+def time_per_query(fn, queries):
+    fn(queries[0])  # warm-up
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time TrendIndex.search")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, DIM), dtype=np.float32)
+
+    print(f"{'trends':>10} | {'legacy ms/query':>16} | {'index ms/query':>15} | {'speedup':>8}")
+    print("-" * 60)
+    for n in args.sizes:
+        df, texts, embeddings = make_corpus(n, rng)
+        # Row-level search, comparable with the legacy path
+        index = TrendIndex(df, texts, embeddings, clustering=False)
+
+        fast_ms = time_per_query(lambda q: index.results(*index.search(q, TOP_K)), queries)
+
+        if args.skip_legacy:
+            print(f"{n:>10} | {'-':>16} | {fast_ms:>15.3f} | {'-':>8}")
+            continue
+
+        legacy_ms = time_per_query(lambda q: legacy_retrieve(q, embeddings, df), queries)
+
+        # Sanity check: both paths must agree on the top-k rows
+        legacy = [r['trend'] for r in legacy_retrieve(queries[0], embeddings, df)]
+        fast = [r['trend'] for r in index.results(*index.search(queries[0], TOP_K))]
+        assert legacy == fast, f"Top-{TOP_K} mismatch at n={n}: {legacy} != {fast}"
+
+        print(f"{n:>10} | {legacy_ms:>16.3f} | {fast_ms:>15.3f} | {legacy_ms / fast_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+# Default location for persisted embeddings, next to the scrapers' CSV output
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'embeddings')
+# Entries allowed past max_entries before a compaction, as a fraction of it
+COMPACT_SLACK = 0.25
+KEY_BYTES = 20
+
+
+def _atomic_save(path: str, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _write_at(path: str, offset: int, data: bytes):
+    """Write data at offset, dropping anything after it (e.g. a torn earlier append)"""
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        f.seek(offset)
+        f.write(data)
+        f.truncate()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of sentence embeddings.
+
+    Each text is keyed by a SHA-1 of (model name, text), so the same trend text
+    is only ever encoded once per model. Vectors are persisted per model in
+    append-only files under <cache_dir>/<model>/, so a save writes only the
+    rows added since the previous one:
+
+        keys.bin      20-byte keys, one per row
+        vectors.f32   float32 rows
+        recency.npy   last-use stamp per row (4 bytes per row, rewritten)
+        meta.json     dim and committed row count, written last; rows past
+                      the count (an interrupted save) are ignored
+
+    The cache is LRU-capped at max_entries, enforced by save(): once it holds
+    COMPACT_SLACK more, the least recently used entries are dropped and the
+    files rewritten, so compaction cost is spread over many saves. Between
+    saves the in-memory cache grows with every new text, so len() can
+    exceed max_entries until the next save. A cache saved as a single
+    .npz by older versions is migrated on the first save.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = None, max_entries: int = None):
+        self.model_name = model_name
+        self.cache_dir = cache_dir or os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_CACHE_DIR)
+        # Trend texts embed the tweet count, so old entries go stale; keep the N most recently used
+        self.max_entries = max_entries or int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name)
+        self.directory = os.path.join(self.cache_dir, safe_name)
+        self.legacy_path = os.path.join(self.cache_dir, f"{safe_name}.npz")
+        self._index = {}
+        self._keys = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        self._last_used = np.zeros(0, dtype=np.uint32)
+        self._clock = 0
+        self._saved_rows = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def key_for(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.model_name}\x00{text}".encode("utf-8")).digest()
+
+    def __len__(self):
+        return len(self._index)
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _reset(self):
+        self._index, self._keys = {}, []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        self._last_used = np.zeros(0, dtype=np.uint32)
+        self._saved_rows = 0
+
+    def _set_rows(self, keys, vectors, last_used):
+        self._keys = list(keys)
+        self._index = {key: row for row, key in enumerate(self._keys)}
+        self._vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._size = len(self._keys)
+        self._last_used = np.asarray(last_used, dtype=np.uint32).copy()
+
+    def load(self):
+        """Load persisted vectors from disk, ignoring missing or corrupt files"""
+        try:
+            if os.path.exists(self._file("meta.json")):
+                with open(self._file("meta.json")) as f:
+                    meta = json.load(f)
+                rows, dim = meta["rows"], meta["dim"]
+                keys = np.fromfile(self._file("keys.bin"), dtype=f"S{KEY_BYTES}", count=rows)
+                vectors = np.fromfile(self._file("vectors.f32"), dtype=np.float32, count=rows * dim)
+                if len(keys) < rows or len(vectors) < rows * dim:
+                    raise ValueError(f"expected {rows} rows")
+                last_used = np.load(self._file("recency.npy"))
+                if len(last_used) < rows:
+                    last_used = np.concatenate([last_used, np.zeros(rows - len(last_used), dtype=np.uint32)])
+                self._set_rows((bytes(k) for k in keys), vectors.reshape(rows, dim), last_used[:rows])
+                self._clock = meta.get("clock", 0)
+                self._saved_rows = rows
+                source = self.directory
+            elif os.path.exists(self.legacy_path):
+                with np.load(self.legacy_path) as data:
+                    keys, vectors = data["keys"], data["vectors"]
+                self._set_rows((bytes(k) for k in keys), vectors, np.zeros(len(keys), dtype=np.uint32))
+                # Rewritten in the append-only layout on the next save
+                self._dirty = bool(len(keys))
+                source = self.legacy_path
+            else:
+                return
+            print(f"[embedding_cache] Loaded {len(self._index)} cached embeddings from {source}")
+        except Exception as e:
+            print(f"[embedding_cache] Ignoring unreadable cache {self.directory}: {e}")
+            self._reset()
+
+    def save(self):
+        """Persist rows added since the last save (or compact, past the size cap)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            if self._size > self.max_entries * (1 + COMPACT_SLACK) or not os.path.exists(self._file("meta.json")):
+                self._compact()
+            else:
+                self._append()
+            self._dirty = False
+        if os.path.exists(self.legacy_path):
+            os.remove(self.legacy_path)
+
+    def _write_meta(self):
+        meta = {"dim": self._vectors.shape[1], "rows": self._size, "clock": self._clock}
+        _atomic_save(self._file("meta.json"), lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+    def _append(self):
+        start, dim = self._saved_rows, self._vectors.shape[1]
+        if self._size > start:
+            _write_at(self._file("keys.bin"), start * KEY_BYTES, b"".join(self._keys[start:self._size]))
+            _write_at(self._file("vectors.f32"), start * dim * 4, self._vectors[start:self._size].tobytes())
+        _atomic_save(self._file("recency.npy"), lambda f: np.save(f, self._last_used[:self._size]))
+        self._write_meta()
+        self._saved_rows = self._size
+
+    def _compact(self):
+        """Keep the max_entries most recently used rows and rewrite every file"""
+        rows = np.arange(self._size)
+        if self._size > self.max_entries:
+            rows = np.sort(np.argsort(-self._last_used[:self._size].astype(np.int64), kind="stable")[:self.max_entries])
+            self._set_rows([self._keys[row] for row in rows], self._vectors[rows], self._last_used[rows])
+        # Without meta.json the files are ignored, so a crash mid-rewrite loses the cache but never corrupts it
+        if os.path.exists(self._file("meta.json")):
+            os.remove(self._file("meta.json"))
+        self._saved_rows = 0
+        self._append()
+
+    def _touch(self, rows):
+        self._last_used[rows] = self._clock
+
+    def touch(self, texts):
+        """Mark cached texts as used, e.g. the ones an index still serves, so the size cap keeps them"""
+        with self._lock:
+            self._clock += 1
+            _, rows = self.get_many(texts)
+            rows = rows[rows >= 0]
+            self._touch(rows)
+            # Stamps are persisted (recency.npy) with the next save
+            self._dirty = self._dirty or len(rows) > 0
+
+    def get_many(self, texts):
+        """
+        Look up cached vectors.
+
+        Returns:
+            (keys, rows) where rows[i] is the row in the vector table or -1 on a miss
+        """
+        keys = [self.key_for(t) for t in texts]
+        rows = np.array([self._index.get(k, -1) for k in keys], dtype=np.int64)
+        return keys, rows
+
+    def put_many(self, keys, vectors):
+        """Append vectors for keys that are not cached yet"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        added = []
+        for i, key in enumerate(keys):
+            if key in self._index:
+                continue
+            self._index[key] = self._size + len(added)
+            self._keys.append(key)
+            added.append(i)
+        if not added:
+            return
+        end = self._size + len(added)
+        if end > len(self._vectors):
+            # Grow geometrically so appends are amortized O(1)
+            capacity = max(end, 2 * len(self._vectors), 1024)
+            grown = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            if self._size:
+                grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+            last_used = np.zeros(capacity, dtype=np.uint32)
+            last_used[:self._size] = self._last_used[:self._size]
+            self._last_used = last_used
+        self._vectors[self._size:end] = vectors[added]
+        self._last_used[self._size:end] = self._clock
+        self._size = end
+        self._dirty = True
+
+    def encode(self, encoder, texts, batch_size: int = 64) -> np.ndarray:
+        """
+        Encode texts, only sending cache misses to encoder.encode.
+
+        Args:
+            encoder: Object exposing a SentenceTransformer-compatible encode()
+            texts: List of strings to embed
+
+        Returns:
+            float32 array of shape (len(texts), dim)
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self._vectors.shape[1] if self._vectors.size else 0), dtype=np.float32)
+
+        with self._lock:
+            self._clock += 1
+            return self._encode_locked(encoder, texts, batch_size)
+
+    def _encode_locked(self, encoder, texts, batch_size):
+        keys, rows = self.get_many(texts)
+        missing = np.flatnonzero(rows < 0)
+        self._touch(rows[rows >= 0])
+
+        # Deduplicate misses so repeated texts in one call are encoded once
+        miss_keys = {}
+        for i in missing:
+            miss_keys.setdefault(keys[i], i)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(miss_keys)
+
+        if miss_keys:
+            miss_texts = [texts[i] for i in miss_keys.values()]
+            print(f"[embedding_cache] Encoding {len(miss_texts)} new texts ({len(texts) - len(missing)} cached)")
+            new_vectors = encoder.encode(miss_texts, batch_size=batch_size, convert_to_numpy=True)
+            self.put_many(list(miss_keys.keys()), new_vectors)
+            rows = np.array([self._index[k] for k in keys], dtype=np.int64)
+        else:
+            print(f"[embedding_cache] All {len(texts)} embeddings served from cache")
+
+        return np.ascontiguousarray(self._vectors[rows], dtype=np.float32)
@@ -0,0 +1,129 @@
+"""
+Dynamic micro-batching of query encodes.
+
+Every /askai request needs one query vector. Encoding them one by one runs
+the transformer on batches of one, and concurrent request threads contend
+for the model. EncodeBatcher queues single-query encodes and one worker
+thread runs them through the encoder together:
+
+- a batch opens with the oldest queued query and closes ENCODE_BATCH_WAIT_MS
+  (default 2) after that query arrived, or as soon as ENCODE_BATCH_MAX_SIZE
+  (default 32) queries are queued;
+- queries that arrive while a batch is encoding are already past their
+  window when it finishes, so under load batches form without extra waiting.
+
+Each caller blocks until its own vector is ready and receives exactly what
+encoder.encode(text) would have returned for it (or the batch's exception).
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class _Pending:
+    __slots__ = ("text", "queued_at", "done", "vector", "error")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.queued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.vector = None
+        self.error = None
+
+
+class EncodeBatcher:
+    """
+    The encoder runs on one worker thread named `thread_name`, which
+    profiling.RequestProfiler.follow_thread can sample with the requests.
+
+    Args:
+        encode_fn: Encodes a list of texts into an (n, dim) array
+        max_batch_size: Most queries per encoder call (ENCODE_BATCH_MAX_SIZE)
+        max_wait: Seconds a batch stays open for more queries (ENCODE_BATCH_WAIT_MS / 1000)
+        size_histogram, fill_histogram, queue_histogram: Optional metrics for
+            queries per batch, batch size / max_batch_size and the time each
+            query waited before its batch started encoding
+    """
+
+    thread_name = "encode-batcher"
+
+    def __init__(self, encode_fn, max_batch_size: int = None, max_wait: float = None,
+                 size_histogram=None, fill_histogram=None, queue_histogram=None):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size or int(os.getenv("ENCODE_BATCH_MAX_SIZE", "32"))
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv("ENCODE_BATCH_WAIT_MS", "2")) / 1000
+        self.size_histogram = size_histogram
+        self.fill_histogram = fill_histogram
+        self.queue_histogram = queue_histogram
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._pid = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    def encode(self, text: str):
+        """Vector for one text, encoded together with whatever else is queued"""
+        item = _Pending(text)
+        with self._cond:
+            if self._pid != os.getpid():
+                # First use in this process (threads do not survive fork)
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name=self.thread_name, daemon=True).start()
+            self._queue.append(item)
+            self._cond.notify()
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.vector
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0].queued_at + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch_size))]
+
+    def _run(self):
+        while True:
+            self._encode(self._next_batch())
+
+    def _encode(self, batch: list):
+        started = time.perf_counter()
+        if self.queue_histogram is not None:
+            for item in batch:
+                self.queue_histogram.observe(started - item.queued_at)
+        if self.size_histogram is not None:
+            self.size_histogram.observe(len(batch))
+        if self.fill_histogram is not None:
+            self.fill_histogram.observe(len(batch) / self.max_batch_size)
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            vectors = self.encode_fn([item.text for item in batch])
+            for item, vector in zip(batch, vectors):
+                item.vector = vector
+        except Exception as e:
+            for item in batch:
+                item.error = e
+        finally:
+            for item in batch:
+                item.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "queries": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": len(self._queue),
+        }
@@ -0,0 +1,264 @@
+"""
+Sentence encoder backends behind the SentenceTransformer encode() interface.
+
+ENCODER_BACKEND selects how all-MiniLM-L6-v2 runs on CPU:
+
+- "torch" (default): sentence_transformers on stock PyTorch, as before.
+- "onnx": the transformer exported to ONNX and run by onnxruntime.
+- "onnx-int8": the same graph with dynamic int8 quantization of the
+  weights (onnxruntime.quantization), the fastest on most CPUs.
+- "torchscript": a traced TorchScript module, still on PyTorch but without
+  the Python-level model code.
+
+The exported backends tokenize with the model's fast tokenizer (tokenizers)
+and reproduce its pooling and normalization, so encode() returns the same
+shapes as SentenceTransformer.encode. Exports are cached under
+ENCODER_EXPORT_DIR (default Models/.cache/encoders/<model>/<backend>) and
+created on first use; `python export_encoder.py` builds them ahead of time
+and checks parity against the torch backend (bench_encoder.py measures
+throughput).
+
+Vectors differ slightly between backends (int8 the most), so the embedding
+cache is keyed on cache_model_name(), which includes the backend.
+"""
+import json
+import os
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx-int8", "torchscript")
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+DEFAULT_EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'encoders')
+
+
+def _check_backend(backend: str):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+
+
+def cache_model_name(model_name: str, backend: str = None) -> str:
+    """Embedding cache namespace; the torch backend keeps the plain model name (and existing caches)"""
+    backend = backend or ENCODER_BACKEND
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def export_dir(model_name: str, backend: str) -> str:
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in model_name)
+    return os.path.join(os.getenv("ENCODER_EXPORT_DIR", DEFAULT_EXPORT_DIR), safe_name, backend)
+
+
+def load_encoder(model_name: str, backend: str = None):
+    """Encoder for `model_name` on `backend` (ENCODER_BACKEND), exporting it first if needed"""
+    backend = backend or ENCODER_BACKEND
+    _check_backend(backend)
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    directory = export_dir(model_name, backend)
+    if not os.path.exists(os.path.join(directory, "encoder.json")):
+        print(f"[encoders] No {backend} export of {model_name} yet, exporting to {directory}")
+        export_encoder(model_name, backend)
+    return (TorchScriptEncoder if backend == "torchscript" else OnnxEncoder)(directory)
+
+
+class _ExportedEncoder:
+    """Tokenize, run the exported transformer, then pool and normalize like the SentenceTransformer"""
+
+    def __init__(self, directory: str):
+        from tokenizers import Tokenizer
+
+        self.directory = directory
+        with open(os.path.join(directory, "encoder.json")) as f:
+            self.meta = json.load(f)
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.meta["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.meta["pad_id"], pad_token=self.meta["pad_token"])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta["dim"]
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = np.zeros((len(texts), self.meta["dim"]), dtype=np.float32)
+        # Longest first, so each batch pads to similar lengths (as SentenceTransformer does)
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in rows])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            token_type_ids = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            hidden = self._forward(input_ids, attention_mask, token_type_ids)
+            vectors[rows] = self._pool(hidden, attention_mask)
+        return vectors[0] if single else vectors
+
+    def _pool(self, hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.meta["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.meta["normalize"]:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+    def _forward(self, input_ids, attention_mask, token_type_ids) -> np.ndarray:
+        raise NotImplementedError
+
+
+class OnnxEncoder(_ExportedEncoder):
+    """
+    onnxruntime on CPU; ENCODER_THREADS sets its intra-op threads (0 = one per core).
+
+    The session is created per process: onnxruntime's thread pool does not
+    survive fork, so a worker forked from a preloaded master opens its own.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.model_path = os.path.join(directory, self.meta["model_file"])
+        self._session = None
+        self._pid = None
+
+    def session(self):
+        if self._pid != os.getpid():
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = int(os.getenv("ENCODER_THREADS", "0"))
+            self._session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+            self._input_names = {i.name for i in self._session.get_inputs()}
+            self._pid = os.getpid()
+        return self._session
+
+    def _forward(self, input_ids, attention_mask, token_type_ids) -> np.ndarray:
+        session = self.session()
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask, "token_type_ids": token_type_ids}
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+        return session.run(["last_hidden_state"], feeds)[0]
+
+
+class TorchScriptEncoder(_ExportedEncoder):
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        import torch
+
+        self._torch = torch
+        self.module = torch.jit.load(os.path.join(directory, self.meta["model_file"]), map_location="cpu")
+        self.module.eval()
+
+    def _forward(self, input_ids, attention_mask, token_type_ids) -> np.ndarray:
+        torch = self._torch
+        with torch.inference_mode():
+            hidden = self.module(torch.from_numpy(input_ids), torch.from_numpy(attention_mask),
+                                 torch.from_numpy(token_type_ids))
+        return hidden.numpy()
+
+
+def export_encoder(model_name: str, backend: str, directory: str = None) -> str:
+    """
+    Convert the SentenceTransformer's transformer to `backend` and write it,
+    its tokenizer and its pooling settings (encoder.json) to `directory`.
+
+    Needs torch and sentence_transformers; the ONNX backends also need onnx
+    and onnxruntime.
+    """
+    _check_backend(backend)
+    if backend == "torch":
+        raise ValueError("the torch backend loads the model directly; there is nothing to export")
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    directory = directory or export_dir(model_name, backend)
+    os.makedirs(directory, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    model.eval()
+    transformer = model[0].auto_model
+    tokenizer = model.tokenizer
+    pooling = next((m for m in model if type(m).__name__ == "Pooling"), None)
+    pooling_mode = pooling.get_pooling_mode_str() if pooling is not None else "mean"
+    if pooling_mode not in ("mean", "cls"):
+        raise ValueError(f"unsupported pooling mode '{pooling_mode}' (only mean and cls)")
+
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.inner(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids, return_dict=True).last_hidden_state
+
+    wrapper = LastHiddenState(transformer).eval()
+    sample = tokenizer(["an example sentence for tracing", "a second one"], padding=True, return_tensors="pt")
+    example = (sample["input_ids"], sample["attention_mask"],
+               sample.get("token_type_ids", torch.zeros_like(sample["input_ids"])))
+
+    if backend == "torchscript":
+        model_file = "model.pt"
+        with torch.no_grad():
+            traced = torch.jit.trace(wrapper, example, strict=False)
+        traced.save(os.path.join(directory, model_file))
+    else:
+        model_file = "model.onnx"
+        onnx_path = os.path.join(directory, model_file)
+        torch.onnx.export(
+            wrapper, example, onnx_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"}
+                          for name in ("input_ids", "attention_mask", "token_type_ids", "last_hidden_state")},
+            opset_version=14,
+        )
+        if backend == "onnx-int8":
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            model_file = "model.int8.onnx"
+            quantize_dynamic(onnx_path, os.path.join(directory, model_file), weight_type=QuantType.QInt8)
+            os.remove(onnx_path)
+
+    tokenizer.save_pretrained(directory)
+    meta = {
+        "model_name": model_name,
+        "backend": backend,
+        "model_file": model_file,
+        "dim": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pooling": pooling_mode,
+        "normalize": any(type(m).__name__ == "Normalize" for m in model),
+        "pad_token": tokenizer.pad_token,
+        "pad_id": tokenizer.pad_token_id,
+    }
+    with open(os.path.join(directory, "encoder.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"[encoders] Exported {model_name} ({backend}) to {directory}")
+    return directory
+
+
+def parity(reference: np.ndarray, candidate: np.ndarray, top_k: int = 5) -> dict:
+    """
+    How closely `candidate` vectors reproduce `reference` ones (same texts, same order).
+
+    Reports the per-text cosine between the two vectors, the largest change
+    in any pairwise similarity score, and how often each text's top-k
+    nearest neighbours (among the texts) are unchanged.
+    """
+    def unit(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    reference, candidate = unit(reference), unit(candidate)
+    cosine = np.sum(reference * candidate, axis=1)
+    ref_scores, cand_scores = reference @ reference.T, candidate @ candidate.T
+    k = min(top_k + 1, len(reference))
+    ref_top = np.argsort(-ref_scores, axis=1)[:, :k]
+    cand_top = np.argsort(-cand_scores, axis=1)[:, :k]
+    overlap = np.mean([len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)])
+    return {
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_score_diff": float(np.max(np.abs(ref_scores - cand_scores))),
+        "topk_overlap": float(overlap),
+    }
@@ -0,0 +1,59 @@
+"""
+Export the sentence encoder for the optimized CPU backends and check parity.
+
+Converts all-MiniLM-L6-v2 to ONNX (fp32 and dynamic int8) and TorchScript
+under Models/.cache/encoders (ENCODER_EXPORT_DIR), then encodes a sample of
+trend texts with both torch and the export and compares the vectors and
+similarity scores (encoders.parity). Exits with status 1 when an export
+drifts below --tolerance.
+
+Needs torch and sentence_transformers, plus onnx and onnxruntime for the
+ONNX backends. The server then picks an export with ENCODER_BACKEND.
+
+Usage:
+    python export_encoder.py
+    python export_encoder.py --backends onnx-int8 --force
+"""
+import argparse
+import os
+import shutil
+import sys
+
+from bench_encoder import load_texts
+from encoders import BACKENDS, export_dir, export_encoder, load_encoder, parity
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def main():
+    exported_backends = [b for b in BACKENDS if b != "torch"]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", default=exported_backends, choices=exported_backends)
+    parser.add_argument("--force", action="store_true", help="Re-export even when an export exists")
+    parser.add_argument("--texts", type=int, default=500, help="Texts used for the parity check")
+    parser.add_argument("--tolerance", type=float, default=0.99, help="Minimum cosine to the torch vectors")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    reference = load_encoder(args.model, "torch").encode(texts, batch_size=32, convert_to_numpy=True)
+    failed = False
+    for backend in args.backends:
+        directory = export_dir(args.model, backend)
+        if args.force and os.path.isdir(directory):
+            shutil.rmtree(directory)
+        if not os.path.exists(os.path.join(directory, "encoder.json")):
+            export_encoder(args.model, backend, directory)
+        vectors = load_encoder(args.model, backend).encode(texts, batch_size=32, convert_to_numpy=True)
+        check = parity(reference, vectors)
+        print(f"[export_encoder] {backend}: min cosine {check['min_cosine']:.5f}, "
+              f"mean cosine {check['mean_cosine']:.5f}, max similarity change {check['max_score_diff']:.2e}, "
+              f"top-5 neighbours unchanged {check['topk_overlap']:.3f}")
+        if check["min_cosine"] < args.tolerance:
+            print(f"[export_encoder] {backend} is below the tolerance {args.tolerance}; keep ENCODER_BACKEND=torch")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
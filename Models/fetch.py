@@ -0,0 +1,218 @@
+"""
+Shared concurrent HTTP fetch layer for the scrapers.
+
+- One pooled requests.Session (keep-alive connections are reused across
+  pages and scrape cycles) with retries on connection errors and 5xx.
+- Pages are fetched concurrently on a thread pool, with at most
+  FETCH_PER_HOST_LIMIT requests in flight per host.
+- Every request has a (connect, read) timeout.
+- Conditional GETs: the ETag / Last-Modified of each page is remembered in
+  Models/.cache/http_validators.json, and a 304 Not Modified comes back as a
+  result with `not_modified=True` so the caller can skip re-parsing. The
+  validators of a 200 are only remembered once the caller commits them after
+  storing the page, so a page whose parse or store failed is fetched in full
+  again next cycle instead of coming back as a 304.
+
+Usage:
+    fetcher = Fetcher()
+    results = fetcher.fetch_many(urls, namespace="twitter_scraper")
+    for url, result in results.items():
+        if result.ok and not result.not_modified:
+            store(parse(result.content))
+            fetcher.commit(url, namespace="twitter_scraper")
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_VALIDATORS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '.cache', 'http_validators.json'
+)
+
+USER_AGENT = "Mozilla/5.0 (compatible; SOCaiL-trends-scraper/1.0)"
+
+
+class FetchResult:
+    def __init__(self, url: str, status: int = None, content: bytes = b"", not_modified: bool = False,
+                 elapsed: float = 0.0, error: str = None):
+        self.url = url
+        self.status = status
+        self.content = content
+        self.not_modified = not_modified
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status in (200, 304)
+
+    def __repr__(self):
+        state = "not modified" if self.not_modified else (self.error or f"{len(self.content)} bytes")
+        return f"FetchResult({self.url}, status={self.status}, {state}, {self.elapsed:.3f}s)"
+
+
+class Fetcher:
+    """
+    Args:
+        max_workers: Concurrent fetches across all hosts (FETCH_MAX_WORKERS, default 16)
+        per_host_limit: Concurrent fetches per host (FETCH_PER_HOST_LIMIT, default 8)
+        timeout: (connect, read) seconds (FETCH_CONNECT_TIMEOUT 5 / FETCH_READ_TIMEOUT 20)
+        validators_path: Where ETag / Last-Modified values are kept between runs
+        conditional: Send If-None-Match / If-Modified-Since (FETCH_CONDITIONAL, default 1)
+    """
+
+    def __init__(self, max_workers: int = None, per_host_limit: int = None, timeout=None,
+                 validators_path: str = None, conditional: bool = None, retries: int = 2):
+        self.max_workers = max_workers or int(os.getenv("FETCH_MAX_WORKERS", "16"))
+        self.per_host_limit = per_host_limit or int(os.getenv("FETCH_PER_HOST_LIMIT", "8"))
+        self.timeout = timeout or (
+            float(os.getenv("FETCH_CONNECT_TIMEOUT", "5")),
+            float(os.getenv("FETCH_READ_TIMEOUT", "20")),
+        )
+        self.validators_path = validators_path or os.getenv("FETCH_VALIDATORS_PATH", DEFAULT_VALIDATORS_PATH)
+        self.conditional = conditional if conditional is not None else os.getenv("FETCH_CONDITIONAL", "1") == "1"
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers,
+            pool_maxsize=self.max_workers,
+            max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                              allowed_methods=("GET",)),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fetch")
+        self._host_limits = {}
+        self._lock = threading.Lock()
+        self._validators = self._load_validators()
+        # Validators of fetched pages, until the caller commits them
+        self._pending = {}
+        self.not_modified = 0
+        self.fetched = 0
+        self.failed = 0
+
+    def _load_validators(self) -> dict:
+        try:
+            with open(self.validators_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_validators(self):
+        """Merge ours into the file on disk (other scraper processes share it) and replace atomically"""
+        os.makedirs(os.path.dirname(self.validators_path) or ".", exist_ok=True)
+        with self._lock:
+            merged = self._load_validators()
+            merged.update(self._validators)
+            tmp_path = f"{self.validators_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                # None marks a page that no longer sends validators
+                json.dump({key: value for key, value in merged.items() if value is not None}, f)
+            os.replace(tmp_path, self.validators_path)
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
+
+    def _fetch(self, url: str, namespace: str) -> FetchResult:
+        key = f"{namespace}|{url}"
+        headers = {}
+        if self.conditional:
+            cached = self._validators.get(key) or {}
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        start = time.perf_counter()
+        try:
+            with self._host_limit(url):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            with self._lock:
+                self.failed += 1
+            return FetchResult(url, error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - start)
+        elapsed = time.perf_counter() - start
+
+        if response.status_code == 304:
+            with self._lock:
+                self.not_modified += 1
+            return FetchResult(url, 304, not_modified=True, elapsed=elapsed)
+        if response.status_code != 200:
+            with self._lock:
+                self.failed += 1
+            return FetchResult(url, response.status_code, error=f"HTTP {response.status_code}", elapsed=elapsed)
+
+        validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        with self._lock:
+            self.fetched += 1
+            self._pending[key] = validators if validators["etag"] or validators["last_modified"] else None
+        return FetchResult(url, 200, response.content, elapsed=elapsed)
+
+    def fetch(self, url: str, namespace: str = "default") -> FetchResult:
+        return self.fetch_many([url], namespace)[url]
+
+    def fetch_many(self, urls, namespace: str = "default") -> dict:
+        """
+        Fetch pages concurrently.
+
+        Args:
+            urls: URLs to fetch
+            namespace: Validators are kept per (namespace, url), so two scrapers
+                reading the same page each see its changes
+
+        Returns:
+            {url: FetchResult} in the order of `urls`
+        """
+        urls = list(dict.fromkeys(urls))
+        futures = [self._executor.submit(self._fetch, url, namespace) for url in urls]
+        return {url: future.result() for url, future in zip(urls, futures)}
+
+    def commit(self, url: str, namespace: str = "default"):
+        """
+        Remember the validators of a page fetched with status 200.
+
+        Call it once the page's data is stored: only then may the next fetch
+        of the page come back as a 304 and be skipped.
+        """
+        key = f"{namespace}|{url}"
+        with self._lock:
+            if key not in self._pending:
+                return
+            self._validators[key] = self._pending.pop(key)
+        if self.conditional:
+            self._save_validators()
+
+    def stats(self) -> dict:
+        return {"fetched": self.fetched, "not_modified": self.not_modified, "failed": self.failed}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+
+_shared_fetcher = None
+_shared_lock = threading.Lock()
+
+
+def shared_fetcher() -> Fetcher:
+    """Process-wide Fetcher, so scrapers in one process share the connection pool"""
+    global _shared_fetcher
+    with _shared_lock:
+        if _shared_fetcher is None:
+            _shared_fetcher = Fetcher()
+        return _shared_fetcher
@@ -1,34 +1,56 @@
-from flask import Flask, request, jsonify
+import time
+_process_start = time.perf_counter()
+from flask import Flask, request, jsonify, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
 from google.genai import Client
 from dotenv import load_dotenv
 import os
-import pandas as pd
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from embedding_cache import EmbeddingCache
+from llm_cache import LLMResponseCache
+from singleflight import SingleFlight
+from encode_batcher import EncodeBatcher
+import request_timing
+import metrics
+import hot_log
+import hmac
+from profiling import RequestProfiler
+from trend_momentum import MOMENTUM_WEIGHT
+# pandas and the encoder backend (sentence_transformers / torch / onnxruntime) are imported lazily by initialize_rag
+# so the server can bind its port before the RAG stack is loaded
+
+# Seconds spent in each startup phase, reported on /health
+startup_timings = {"imports": round(time.perf_counter() - _process_start, 3)}
+
+def _record_phase(name: str, started: float):
+    startup_timings[name] = round(time.perf_counter() - started, 3)
+    print(f"[startup] {name}: {startup_timings[name]:.3f}s")
+
 print("FILE EXECUTION STARTED")
+_phase_start = time.perf_counter()
 
 # Path to the .env file in the Backend directory
 backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Backend')
 env_path = os.path.join(backend_dir, '.env')
 print("Looking for .env at:", env_path)
 print("File exists:", os.path.exists(env_path))
-if os.path.exists(env_path):
-    with open(env_path) as f:
-        print("File contents:\n", f.read())
-print("before load")
 
 load_dotenv(dotenv_path=env_path)
 
 gemini_api_key = os.getenv("GEMINI_API_KEY")
-print("Loaded GEMINI_API_KEY:", repr(gemini_api_key))  # Debug print
+print("GEMINI_API_KEY loaded:", bool(gemini_api_key))
 if not gemini_api_key:
     print("ERROR: GEMINI_API_KEY is not set or not loaded from .env! Check your .env file in the Backend directory.")
     exit(1)
+_record_phase("env", _phase_start)
 
 # Initialize the new Google GenAI client
+_phase_start = time.perf_counter()
 genai_client = Client(api_key=gemini_api_key)
+_record_phase("genai_client", _phase_start)
 
 # Use a valid model name with models/ prefix
 # Available models: "models/gemini-2.5-pro", "models/gemini-2.5-flash", "models/gemini-2.0-flash-exp"
@@ -37,169 +59,633 @@ MODEL_NAME = "models/gemini-2.5-flash"  # Fast and efficient model
 app = Flask(__name__)
 CORS(app)  # Enable CORS for cross-origin requests
 
-def generate_text(prompt: str) -> str:
+# Admin-armed request profiler (/admin/profile); idle unless armed
+profiler = RequestProfiler()
+# Routes the profiler may pick up; admin, metrics and health probes are never profiled
+PROFILED_ROUTES = ("askai", "generate-content", "generate-hashtags", "batch")
+
+@app.before_request
+def _begin_request_timing():
+    g.request_started = time.perf_counter()
+    request_timing.begin()
+    if profiler.enabled and endpoint_label() in PROFILED_ROUTES:
+        g.profile_session = profiler.start(endpoint_label())
+
+@app.teardown_request
+def _finish_profile(exc):
+    session = g.pop("profile_session", None)
+    if session is not None:
+        profiler.stop(session)
+
+@app.after_request
+def _add_server_timing(response):
+    """Per-stage durations (encode, retrieval, prompt, llm) in a Server-Timing header"""
+    total = time.perf_counter() - g.request_started
+    metrics.REQUEST_SECONDS.labels(endpoint_label(), response.status_code).observe(total)
+    timings = request_timing.current()
+    if timings is not None:
+        response.headers["Server-Timing"] = request_timing.server_timing_header(timings, total)
+    return response
+
+def endpoint_label() -> str:
+    """Route of the current request for metric labels (LLM calls fanned out by /batch run outside it)"""
+    if has_request_context():
+        return request.url_rule.rule.strip("/") if request.url_rule is not None else "unmatched"
+    return "batch"
+
+def count_error(e: Exception, endpoint: str = None):
+    metrics.ERRORS.labels(endpoint or endpoint_label(), type(e).__name__).inc()
+
+# Local cache of LLM responses, keyed on (model, normalized prompt, trend snapshot version)
+llm_cache = LLMResponseCache() if os.getenv("LLM_CACHE_ENABLED", "1") == "1" else None
+# Concurrent identical prompts share one upstream request
+llm_inflight = SingleFlight()
+
+def generate_text(prompt: str, snapshot_version: str = "") -> str:
     """
-    Generate text using the Gemini model.
+    Generate text using the Gemini model, serving repeats from the response cache.
+    
+    Concurrent callers with an identical prompt wait on a single upstream call
+    and all receive its result.
     
     Args:
         prompt: The input prompt for the model
+        snapshot_version: Version of the trend index the prompt was built from
+            ("" for prompts that do not depend on trend data)
         
     Returns:
         Generated text response
     """
+    with request_timing.stage("llm"):
+        if llm_cache is not None:
+            cached = llm_cache.get(MODEL_NAME, prompt, snapshot_version)
+            if cached is not None:
+                hot_log.debug("generate_text", "Cache hit, length: %d", len(cached))
+                metrics.LLM_CACHE_HITS.labels(endpoint_label()).inc()
+                return cached
+        
+        def call_and_store():
+            result = _call_model(prompt)
+            if llm_cache is not None and result and result.strip():
+                llm_cache.put(MODEL_NAME, prompt, result, snapshot_version)
+            return result
+        
+        key = LLMResponseCache.make_key(MODEL_NAME, prompt, snapshot_version)
+        return llm_inflight.do(key, call_and_store)
+
+def extract_response_text(response) -> str:
+    """Get the text out of a GenerateContentResponse (or a compatible object)"""
+    # The new SDK returns GenerateContentResponse with .text attribute
+    if hasattr(response, 'text'):
+        result = response.text
+        hot_log.debug("generate_text", "Using response.text, length: %d", len(result))
+        return result
+    elif hasattr(response, 'candidates') and response.candidates:
+        # Fallback for different response structures
+        if hasattr(response.candidates[0], 'content'):
+            result = response.candidates[0].content.parts[0].text
+            hot_log.debug("generate_text", "Using candidates path, length: %d", len(result))
+            return result
+    elif isinstance(response, str):
+        hot_log.debug("generate_text", "Response is string, length: %d", len(response))
+        return response
+    else:
+        # Try to convert to string as last resort
+        result = str(response)
+        hot_log.debug("generate_text", "Converted to string, length: %d", len(result))
+        return result
+
+def _call_model(prompt: str) -> str:
+    """Send one prompt to the Gemini model and return the response text"""
+    endpoint = endpoint_label()
     try:
-        print(f"[generate_text] Generating content with model: {MODEL_NAME}")
-        print(f"[generate_text] Prompt length: {len(prompt)}")
+        hot_log.debug("generate_text", "Generating content with model: %s", MODEL_NAME)
+        hot_log.debug("generate_text", "Prompt length: %d", len(prompt))
+        metrics.PROMPT_CHARS.labels(endpoint).observe(len(prompt))
         
         # Use the correct API: client.models.generate_content() directly with model name
+        started = time.perf_counter()
         response = genai_client.models.generate_content(
             model=MODEL_NAME,
             contents=prompt
         )
+        metrics.LLM_SECONDS.labels(MODEL_NAME, endpoint).observe(time.perf_counter() - started)
         
-        print(f"[generate_text] Response received, type: {type(response)}")
-        
-        # The new SDK returns GenerateContentResponse with .text attribute
-        if hasattr(response, 'text'):
-            result = response.text
-            print(f"[generate_text] Using response.text, length: {len(result)}")
-            return result
-        elif hasattr(response, 'candidates') and response.candidates:
-            # Fallback for different response structures
-            if hasattr(response.candidates[0], 'content'):
-                result = response.candidates[0].content.parts[0].text
-                print(f"[generate_text] Using candidates path, length: {len(result)}")
-                return result
-        elif isinstance(response, str):
-            print(f"[generate_text] Response is string, length: {len(response)}")
-            return response
-        else:
-            # Try to convert to string as last resort
-            result = str(response)
-            print(f"[generate_text] Converted to string, length: {len(result)}")
-            return result
+        hot_log.debug("generate_text", "Response received, type: %s", type(response))
+        result = extract_response_text(response)
+        metrics.RESPONSE_CHARS.labels(endpoint).observe(len(result or ""))
+        return result
     except Exception as e:
-        print(f"[generate_text] Error: {type(e).__name__}: {e}")
+        hot_log.error("generate_text", "Error: %s: %s", type(e).__name__, e)
         import traceback
         traceback.print_exc()
         raise
 
+def generate_text_stream(prompt: str, snapshot_version: str = ""):
+    """
+    Stream text from the Gemini model as it is generated.
+    
+    Yields text chunks. A cached response is yielded as a single chunk; a
+    freshly streamed response is stored in the cache once it completes.
+    Streams are not coalesced with concurrent identical prompts.
+    """
+    if llm_cache is not None:
+        cached = llm_cache.get(MODEL_NAME, prompt, snapshot_version)
+        if cached is not None:
+            hot_log.debug("generate_text_stream", "Cache hit, length: %d", len(cached))
+            metrics.LLM_CACHE_HITS.labels(endpoint_label()).inc()
+            yield cached
+            return
+    
+    hot_log.debug("generate_text_stream", "Streaming content with model: %s", MODEL_NAME)
+    endpoint = endpoint_label()
+    metrics.PROMPT_CHARS.labels(endpoint).observe(len(prompt))
+    started = time.perf_counter()
+    parts = []
+    for chunk in genai_client.models.generate_content_stream(model=MODEL_NAME, contents=prompt):
+        text = getattr(chunk, 'text', None)
+        if text:
+            parts.append(text)
+            yield text
+    
+    result = "".join(parts)
+    metrics.LLM_SECONDS.labels(MODEL_NAME, endpoint).observe(time.perf_counter() - started)
+    metrics.RESPONSE_CHARS.labels(endpoint).observe(len(result))
+    hot_log.debug("generate_text_stream", "Stream complete, length: %d", len(result))
+    if llm_cache is not None and result.strip():
+        llm_cache.put(MODEL_NAME, prompt, result, snapshot_version)
+
+def wants_stream(data: dict) -> bool:
+    """A request opts into streaming with {"stream": true}, ?stream=1 or Accept: text/event-stream"""
+    return (
+        bool(data.get("stream"))
+        or request.args.get("stream") in ("1", "true")
+        or "text/event-stream" in request.headers.get("Accept", "")
+    )
+
+def sse_response(prompt: str, snapshot_version: str = "") -> Response:
+    """
+    Relay generate_text_stream as Server-Sent Events.
+    
+    Emits `data: {"delta": ...}` per chunk, then `event: done` with the full
+    content, or `event: error` if generation fails part-way.
+    """
+    def events():
+        parts = []
+        try:
+            for text in generate_text_stream(prompt, snapshot_version):
+                parts.append(text)
+                yield f"data: {json.dumps({'delta': text})}\n\n"
+            content = "".join(parts)
+            if not content.strip():
+                yield f"event: error\ndata: {json.dumps({'error': 'Empty response from model'})}\n\n"
+                return
+            yield f"event: done\ndata: {json.dumps({'content': content})}\n\n"
+        except Exception as e:
+            hot_log.error("sse", "Error while streaming: %s: %s", type(e).__name__, e)
+            count_error(e)
+            yield f"event: error\ndata: {json.dumps({'error': str(e), 'type': type(e).__name__})}\n\n"
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # Initialize RAG system
-print("Initializing RAG system...")
-twitter_df = None
-trend_embeddings = None
-trend_texts = None
+# Currently published TrendIndex snapshot. Readers take one reference to it per
+# request; reloads build a new snapshot and swap this reference in one step.
+trend_index = None
+# Change stats ("added", "reused", "removed") of the most recent initialize_rag call
+last_reload_changes = {}
 encoder = None
+embedding_cache = None
+# Serializes rebuilds; readers never take this lock
+_rebuild_lock = threading.Lock()
+# "pending" -> "loading" -> "ready" | "failed"; /health/ready reports this
+rag_status = "pending"
+
+# Sentence transformer used for both the corpus and queries
+ENCODER_MODEL_NAME = 'all-MiniLM-L6-v2'
+# Multi-process serving: build once, publish to shared_index, workers map it (see gunicorn.conf.py)
+SHARED_INDEX = os.getenv("SHARED_INDEX", "0") == "1"
+
+def find_twitter_csv():
+    """Locate twitter_scraper.csv - try Models/ first, then current directory, then repo root"""
+    csv_path = os.path.join(os.path.dirname(__file__), 'twitter_scraper.csv')
+    if not os.path.exists(csv_path):
+        csv_path = 'twitter_scraper.csv'
+    if not os.path.exists(csv_path):
+        csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'twitter_scraper.csv')
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Twitter CSV file not found. Tried: {csv_path}")
+    return csv_path
 
 def initialize_rag():
-    """Initialize the RAG system with Twitter trends data"""
-    global twitter_df, trend_embeddings, trend_texts, encoder
+    """
+    Build (or incrementally rebuild) the RAG index and publish it atomically.
+
+    Only trends that are not in the live snapshot are encoded. If the rebuild
+    fails, the previously published index stays in service. With
+    SHARED_INDEX=1 the build runs under a cross-process lock, starts from the
+    latest snapshot any process published and publishes its result, which
+    the other workers' watchers then swap in.
+    """
+    global trend_index, encoder, embedding_cache, rag_status, last_reload_changes, _hashtag_recommender
     
-    try:
-        # Load Twitter data - try Models/twitter_scraper.csv first, then current directory
-        csv_path = os.path.join(os.path.dirname(__file__), 'twitter_scraper.csv')
-        if not os.path.exists(csv_path):
-            csv_path = 'twitter_scraper.csv'
-        if not os.path.exists(csv_path):
-            csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'twitter_scraper.csv')
-        
-        print(f"Loading Twitter data from: {csv_path}")
-        if not os.path.exists(csv_path):
-            raise FileNotFoundError(f"Twitter CSV file not found. Tried: {csv_path}")
-        
-        twitter_df = pd.read_csv(csv_path)
-        print(f"Loaded {len(twitter_df)} Twitter trends")
-        
-        # Initialize sentence transformer
-        print("Loading sentence transformer model...")
-        encoder = SentenceTransformer('all-MiniLM-L6-v2')
-        
-        # Create embeddings
-        print("Creating embeddings for Twitter trends...")
-        trend_texts = []
-        for _, row in twitter_df.iterrows():
-            trend = str(row['Trend']) if pd.notna(row['Trend']) else ""
-            count = str(row['Count']) if pd.notna(row['Count']) else "0"
-            trend_text = f"Twitter Trend: {trend} | Tweet Count: {count}"
-            trend_texts.append(trend_text)
-        
-        trend_embeddings = encoder.encode(trend_texts, convert_to_tensor=True)
-        print("RAG system initialized successfully!")
-        
-    except Exception as e:
-        print(f"Error initializing RAG: {e}")
-        twitter_df = None
+    with _rebuild_lock:
+        first_load = trend_index is None
+        if first_load:
+            rag_status = "loading"
+        reload_start = time.perf_counter()
+        try:
+            phase_start = time.perf_counter()
+            from trend_corpus import load_corpus
+            from trend_index import build_index
+            csv_path = find_twitter_csv()
+            print(f"Loading trend corpus (Twitter data from: {csv_path})")
+            corpus_df = load_corpus(csv_path)
+            if first_load:
+                _record_phase("data_load", phase_start)
+            
+            # The encoder is loaded once and reused across reloads
+            if encoder is None:
+                phase_start = time.perf_counter()
+                from encoders import ENCODER_BACKEND, load_encoder
+                print(f"Loading sentence transformer model ({ENCODER_BACKEND} backend)...")
+                encoder = load_encoder(ENCODER_MODEL_NAME)
+                _record_phase("encoder_load", phase_start)
+            if embedding_cache is None:
+                from encoders import cache_model_name
+                # Backends produce slightly different vectors, so each gets its own cache
+                embedding_cache = EmbeddingCache(cache_model_name(ENCODER_MODEL_NAME))
+            
+            phase_start = time.perf_counter()
+            print("Creating embeddings for trends...")
+            if SHARED_INDEX:
+                import shared_index
+            with shared_index.build_lock() if SHARED_INDEX else nullcontext():
+                previous = trend_index
+                if SHARED_INDEX:
+                    # Another worker may have built this corpus already; build_index then returns it as is
+                    previous = shared_index.load_published(skip=_live_snapshot_id()) or previous
+                new_index = build_index(corpus_df, encoder, embedding_cache, previous=previous)
+                if SHARED_INDEX and new_index.snapshot_id is None:
+                    shared_index.publish(new_index)
+            if first_load:
+                _record_phase("index_build", phase_start)
+            
+            # A no-op reload keeps the live snapshot, whose stats describe the build that created it
+            last_reload_changes = new_index.stats if new_index is not trend_index else {
+                "added": 0, "reused": len(new_index), "removed": 0}
+            recommender = build_hashtag_recommender(new_index) if new_index is not trend_index else _hashtag_recommender
+            # Publish: a single reference assignment, atomic for concurrent readers
+            trend_index = new_index
+            _hashtag_recommender = recommender
+            rag_status = "ready"
+            reload_seconds = time.perf_counter() - reload_start
+            metrics.INDEX_RELOAD_SECONDS.labels("ok").observe(reload_seconds)
+            metrics.INDEX_LAST_RELOAD_SECONDS.set(reload_seconds)
+            metrics.INDEX_TRENDS.set(len(new_index))
+            if first_load:
+                startup_timings["ready_after"] = round(time.perf_counter() - _process_start, 3)
+            print(f"RAG system initialized successfully! (index version {new_index.version})")
+            return new_index
+            
+        except Exception as e:
+            print(f"Error initializing RAG: {e}")
+            metrics.INDEX_RELOAD_SECONDS.labels("error").observe(time.perf_counter() - reload_start)
+            last_reload_changes = {}
+            if trend_index is None:
+                rag_status = "failed"
+            return trend_index
+
+def _live_snapshot_id():
+    index = trend_index
+    return index.snapshot_id if index is not None else None
+
+def _adopt_snapshot(index):
+    """Swap in a snapshot another process published (called by the shared_index watcher)"""
+    global trend_index, rag_status, _hashtag_recommender
+    if _live_snapshot_id() == index.snapshot_id:
+        return
+    recommender = build_hashtag_recommender(index)
+    with _rebuild_lock:
+        if _live_snapshot_id() == index.snapshot_id:
+            return
+        trend_index = index
+        _hashtag_recommender = recommender
+        rag_status = "ready"
+        metrics.INDEX_TRENDS.set(len(index))
+    print(f"[shared_index] Worker {os.getpid()} switched to snapshot {index.snapshot_id}")
+
+_index_watcher = None
+
+def start_index_watcher():
+    """
+    Follow snapshots published by other processes (SHARED_INDEX=1 only).
+
+    Threads do not survive fork, so every serving process calls this itself:
+    gunicorn's post_fork hook, gemini_asgi's before_serving, or __main__.
+    """
+    global _index_watcher
+    if not SHARED_INDEX:
+        return
+    if _index_watcher is None:
+        from shared_index import Watcher
+        _index_watcher = Watcher(_live_snapshot_id, _adopt_snapshot)
+    _index_watcher.start()
+
+# Fuse BM25 over trend names with the dense results; exact trend-name queries skip encoding
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+# Dense candidates per requested result that go into rank fusion
+HYBRID_CANDIDATES_FACTOR = int(os.getenv("HYBRID_CANDIDATES_FACTOR", "4"))
+# Queries answered from the lexical postings without running the encoder
+retrieval_stats = {"exact": 0, "encoded": 0}
+# Coalesce concurrent /askai query encodes into one encoder call (see encode_batcher.py)
+ENCODE_BATCHING = os.getenv("ENCODE_BATCHING", "1") == "1"
+query_batcher = EncodeBatcher(
+    lambda texts: encoder.encode(texts, convert_to_numpy=True),
+    size_histogram=metrics.ENCODE_BATCH_SIZE,
+    fill_histogram=metrics.ENCODE_BATCH_FILL,
+    queue_histogram=metrics.ENCODE_QUEUE_SECONDS,
+)
+if ENCODE_BATCHING:
+    # The encoder runs on the batcher thread, so profiled requests alone would only show Event.wait
+    profiler.follow_thread(query_batcher.thread_name)
+
+def encode_query(query: str):
+    """Query vector; batched with concurrent requests' queries when ENCODE_BATCHING is on"""
+    with request_timing.stage("encode", metrics.ENCODE_SECONDS):
+        if ENCODE_BATCHING:
+            return query_batcher.encode(query)
+        return encoder.encode(query, convert_to_numpy=True)
+
+def retrieve_relevant_trends(query: str, top_k: int = 5, index=None, sources=None, source_boost=None):
+    """
+    Retrieve top-k most relevant trends using hybrid (BM25 + semantic) search.
 
-def retrieve_relevant_trends(query: str, top_k: int = 5):
-    """Retrieve top-k most relevant Twitter trends using semantic search"""
-    global twitter_df, trend_embeddings, trend_texts, encoder
+    `sources` restricts results to those sources and `source_boost` maps a
+    source to a bonus added to its similarity. Trend momentum is blended in
+    with weight MOMENTUM_WEIGHT. All of it is applied inside the single
+    scoring pass (see TrendIndex.row_bias). A query that is exactly a trend
+    name (e.g. "#INDvsAUS") is answered from the lexical index without encoding.
+    """
+    # Take one snapshot reference so a concurrent reload cannot change it underneath us
+    if index is None:
+        index = trend_index
     
-    if twitter_df is None or encoder is None:
+    if index is None:
         return []
     
     try:
-        # Encode the query
-        query_embedding = encoder.encode(query, convert_to_tensor=True)
-        
-        # Calculate cosine similarities
-        similarities = cosine_similarity(
-            query_embedding.cpu().numpy().reshape(1, -1),
-            trend_embeddings.cpu().numpy()
-        )[0]
-        
-        # Get top-k indices
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        with request_timing.stage("retrieval"):
+            row_bias = index.row_bias(sources, source_boost, MOMENTUM_WEIGHT)
+            if HYBRID_RETRIEVAL:
+                exact = index.exact_results(query, top_k, row_bias)
+                if exact:
+                    retrieval_stats["exact"] += 1
+                    metrics.RETRIEVAL_QUERIES.labels("exact").inc()
+                    return exact
+        if encoder is None:
+            return []
         
-        # Retrieve relevant trends
-        relevant_trends = []
-        for idx in top_indices:
-            trend_info = {
-                'trend': twitter_df.iloc[idx]['Trend'],
-                'count': twitter_df.iloc[idx]['Count'],
-                'similarity': float(similarities[idx])
-            }
-            relevant_trends.append(trend_info)
+        query_embedding = encode_query(query)
+        retrieval_stats["encoded"] += 1
+        metrics.RETRIEVAL_QUERIES.labels("encoded").inc()
         
-        return relevant_trends
+        # Score against the pre-normalized matrix and select top-k
+        with request_timing.stage("retrieval", metrics.SEARCH_SECONDS):
+            if not HYBRID_RETRIEVAL:
+                top_indices, scores = index.search(query_embedding, top_k, row_bias)
+                return index.results(top_indices, scores, row_bias)
+            top_indices, scores = index.search(query_embedding, top_k * HYBRID_CANDIDATES_FACTOR, row_bias)
+            return index.hybrid_results(query, query_embedding, top_indices, scores, top_k, row_bias)
     except Exception as e:
         print(f"Error retrieving trends: {e}")
+        count_error(e)
         return []
 
-# Initialize RAG on startup
-initialize_rag()
+def retrieve_relevant_trends_batch(queries: list, top_k: int = 5, index=None, source_options=None):
+    """
+    Retrieve top-k trends for many queries with one encode batch and one matrix-matrix product.
 
-@app.route('/generate-hashtags', methods=['POST'])
-def generate_hashtags():
-    data = request.json
-    topic = data.get("prompt", "").strip()
+    `source_options` is an optional list of (sources, source_boost) pairs, one per query.
+    Exact trend-name queries are answered without being encoded.
+    """
+    if index is None:
+        index = trend_index
+    
+    if index is None:
+        return [[] for _ in queries]
+    
+    try:
+        import numpy as np
+        with request_timing.stage("retrieval"):
+            source_options = source_options or [(None, None)] * len(queries)
+            biases = [index.row_bias(s, b, MOMENTUM_WEIGHT) for s, b in source_options]
+            results = [[] for _ in queries]
+            pending = []
+            for q, query in enumerate(queries):
+                exact = index.exact_results(query, top_k, biases[q]) if HYBRID_RETRIEVAL else []
+                if exact:
+                    results[q] = exact
+                else:
+                    pending.append(q)
+        retrieval_stats["exact"] += len(queries) - len(pending)
+        metrics.RETRIEVAL_QUERIES.labels("exact").inc(len(queries) - len(pending))
+        if not pending or encoder is None:
+            return results
+
+        with request_timing.stage("encode", metrics.ENCODE_SECONDS):
+            query_embeddings = encoder.encode([queries[q] for q in pending], convert_to_numpy=True)
+        retrieval_stats["encoded"] += len(pending)
+        metrics.RETRIEVAL_QUERIES.labels("encoded").inc(len(pending))
+        with request_timing.stage("retrieval", metrics.SEARCH_SECONDS):
+            if any(s or b for s, b in source_options):
+                row_bias = np.stack([
+                    biases[q] if biases[q] is not None else np.zeros(len(index), dtype=np.float32) for q in pending
+                ])
+            else:
+                # Same bias for every query: a single (n,) vector broadcasts
+                row_bias = biases[0]
+            candidates = top_k * HYBRID_CANDIDATES_FACTOR if HYBRID_RETRIEVAL else top_k
+            top_indices, scores = index.search_batch(query_embeddings, candidates, row_bias)
+            for j, q in enumerate(pending):
+                bias = None if row_bias is None else (row_bias if row_bias.ndim == 1 else row_bias[j])
+                if HYBRID_RETRIEVAL:
+                    results[q] = index.hybrid_results(queries[q], query_embeddings[j], top_indices[j], scores[j], top_k, bias)
+                else:
+                    results[q] = index.results(top_indices[j], scores[j], bias)
+        return results
+    except Exception as e:
+        print(f"Error retrieving trends for batch: {e}")
+        count_error(e)
+        return [[] for _ in queries]
+
+def _is_reloader_parent() -> bool:
+    """True in the Flask debug reloader's watcher process, which never serves requests"""
+    return __name__ == '__main__' and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+
+def start_rag():
+    """
+    Load the RAG stack on startup.
 
+    With RAG_BACKGROUND_LOAD=1 (default) the encoder and index load on a
+    background thread so the server binds immediately; /generate-content and
+    /generate-hashtags work right away and /askai answers without trend
+    context until /health/ready reports ready. RAG_AUTOSTART=0 leaves loading
+    to the importer (loadtest.py swaps in its own encoder first).
+    """
+    if _is_reloader_parent() or os.getenv("RAG_AUTOSTART", "1") != "1":
+        return
+    if os.getenv("RAG_BACKGROUND_LOAD", "1") == "1":
+        print("Initializing RAG system in the background...")
+        threading.Thread(target=initialize_rag, name="rag-loader", daemon=True).start()
+    else:
+        print("Initializing RAG system...")
+        initialize_rag()
+
+# Initialize RAG on startup
+start_rag()
+
+# Style-changing options for /askai
+STYLE_MAP = {
+    "Make it funnier": "Rewrite the following content to be much funnier, using jokes, puns, and a lighthearted tone. If possible, add a witty punchline.",
+    "Make it sound serious": "Rewrite the following content to sound very serious, formal, and professional.",
+    "Make it concise": "Rewrite the following content to be as concise and brief as possible, without losing the main message.",
+    "Add a call to action": "Rewrite the following content and add a strong, clear call to action at the end.",
+    "Make it more engaging": "Rewrite the following content to be more engaging and interactive, asking questions or encouraging responses.",
+    "Use slang and lingo": "Rewrite the following content using modern slang, internet lingo, and a casual, playful tone."
+}
+
+def normalize_topic(topic: str) -> str:
+    topic = (topic or "").strip()
     if not topic or len(topic) < 3:  # Check for empty or too-short input
         topic = "an engaging and trending topic"
+    return topic
 
-    prompt = (
+def build_hashtags_prompt(topic: str) -> str:
+    return (
         f"Generate hashtags for the topic/trend: '{topic}'. Ensure the hashtags are prevalent and popular. make sure you only 5 of them and make sure they start with hashtags, dont give any description just the hashtags"
     )
 
+# Answer /generate-hashtags from the trend index when it is confident (hashtag_recommender.py).
+# Off by default: the HASHTAG_MIN_SIMILARITY threshold still needs calibrating on the real encoder.
+HASHTAG_FAST_PATH = os.getenv("HASHTAG_FAST_PATH", "0") == "1"
+# Recommender of the live snapshot, built when the snapshot is published (never on the request path)
+_hashtag_recommender = None
+
+def build_hashtag_recommender(index):
+    """HashtagRecommender for a snapshot about to go live, or None when the fast path is off or the build fails"""
+    if not HASHTAG_FAST_PATH or index is None:
+        return None
     try:
-        response_text = generate_text(prompt)
-        
-        # Extract hashtags from response
-        hashtags = [tag.strip() for tag in response_text.split() if tag.strip().startswith('#')]
-        
-        # If no hashtags found, try splitting by lines or other delimiters
-        if not hashtags:
-            hashtags = [tag.strip() for tag in response_text.replace(',', ' ').split() if '#' in tag]
-        
-        # Ensure we have exactly 5 hashtags or less
-        hashtags = hashtags[:5] if len(hashtags) > 5 else hashtags
-        
-        # If still no hashtags, return empty list (frontend can handle this)
-        if not hashtags:
-            hashtags = []
+        from hashtag_recommender import HashtagRecommender
+        start = time.perf_counter()
+        recommender = HashtagRecommender.from_index(index)
+        print(f"[hashtags] Built recommender over {len(recommender)} hashtags in {time.perf_counter() - start:.2f}s")
+        return recommender
+    except Exception as e:
+        print(f"[hashtags] Could not build the hashtag recommender, /generate-hashtags uses the LLM: {e}")
+        return None
+
+def recommend_hashtags(topic: str):
+    """
+    Hashtags for a topic from the local trend index, without an LLM call.
+
+    Returns the response body ({"hashtags", "source": "local", "confidence"}),
+    or None when there is no recommender for the live snapshot or it is not
+    confident enough, in which case the caller asks the LLM.
+    """
+    recommender = _hashtag_recommender
+    if recommender is None or encoder is None:
+        return None
+    try:
+        query_vector = encode_query(topic)
+        with request_timing.stage("retrieval", metrics.SEARCH_SECONDS):
+            results, confident = recommender.recommend(query_vector, top_k=5)
+    except Exception as e:
+        hot_log.warning("generate_hashtags", "Local hashtag recommendation failed: %s", e)
+        count_error(e)
+        return None
+    if not confident:
+        return None
+    return {
+        "hashtags": [r["hashtag"] for r in results],
+        "source": "local",
+        "confidence": round(sum(r["similarity"] for r in results) / len(results), 4),
+    }
+
+def hashtags_from_llm(response_text: str) -> dict:
+    return {"hashtags": extract_hashtags(response_text), "source": "llm"}
+
+def extract_hashtags(response_text: str) -> list:
+    """Pull at most 5 hashtags out of a free-text model response"""
+    hashtags = [tag.strip() for tag in response_text.split() if tag.strip().startswith('#')]
+    
+    # If no hashtags found, try splitting by lines or other delimiters
+    if not hashtags:
+        hashtags = [tag.strip() for tag in response_text.replace(',', ' ').split() if '#' in tag]
+    
+    # Ensure we have exactly 5 hashtags or less (empty list if none; frontend can handle this)
+    return hashtags[:5]
+
+def build_content_prompt(topic: str) -> str:
+    return (
+        f"Generate a professional and detailed content script for social media. The script should focus on the topic: '{topic}'. Ensure the content is creative and suitable for a general audience and dont include hashtags in the generated content."
+    )
+
+def build_askai_prompt(additional_prompt: str, existing_content: str, relevant_trends: list) -> str:
+    """Build the /askai prompt from the question and its retrieved trends"""
+    if relevant_trends:
+        from trend_corpus import format_trend_line
+        # Build context from retrieved trends
+        context_str = "\n".join([format_trend_line(trend_info) for trend_info in relevant_trends])
         
-        return jsonify({"hashtags": hashtags})
+        return f"""You are a social media expert analyzing Twitter and Instagram trends. Based on the following current trends data:
+
+{context_str}
+
+User Question: {additional_prompt}
+
+Existing Content: '{existing_content}'
+
+Provide a helpful, accurate, and insightful answer based on the trends data above. If the question relates to the trends, use the specific trend information. If the question is general or not directly related to the trends, provide a generative answer that's relevant and helpful.
+
+Answer:"""
+    
+    # Fallback if RAG not available
+    return (
+        f"Based on current Twitter trends, answer the user's question. "
+        f"User Question: {additional_prompt}\n"
+        f"Existing Content: '{existing_content}'\n"
+        f"Provide a helpful and insightful answer."
+    )
+
+def build_style_prompt(additional_prompt: str, existing_content: str) -> str:
+    return (
+        f"{STYLE_MAP[additional_prompt]}\n\nContent: '''{existing_content}'''.\nRespond with only the rewritten content."
+    )
+
+@app.route('/generate-hashtags', methods=['POST'])
+def generate_hashtags():
+    data = request.json
+    topic = normalize_topic(data.get("prompt", ""))
+    local = recommend_hashtags(topic)
+    if local is not None:
+        metrics.HASHTAG_ANSWERS.labels("local").inc()
+        return jsonify(local)
+    with request_timing.stage("prompt"):
+        prompt = build_hashtags_prompt(topic)
+
+    try:
+        response_text = generate_text(prompt)
+        metrics.HASHTAG_ANSWERS.labels("llm").inc()
+        return jsonify(hashtags_from_llm(response_text))
     except Exception as e:
-        print(f"Error generating hashtags: {e}")
+        hot_log.error("generate_hashtags", "Error generating hashtags: %s", e)
+        count_error(e)
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -207,24 +693,46 @@ def generate_hashtags():
 @app.route('/generate-content', methods=['POST'])
 def generate_content():
     data = request.json
-    topic = data.get("prompt", "").strip()
+    with request_timing.stage("prompt"):
+        prompt = build_content_prompt(normalize_topic(data.get("prompt", "")))
 
-    if not topic or len(topic) < 3:  # Check for empty or too-short input
-        topic = "an engaging and trending topic"
-
-    prompt = (
-        f"Generate a professional and detailed content script for social media. The script should focus on the topic: '{topic}'. Ensure the content is creative and suitable for a general audience and dont include hashtags in the generated content."
-    )
+    if wants_stream(data):
+        return sse_response(prompt)
 
     try:
         response_text = generate_text(prompt)
         return jsonify({"content": response_text})
     except Exception as e:
-        print(f"Error generating content: {e}")
+        hot_log.error("generate_content", "Error generating content: %s", e)
+        count_error(e)
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+def parse_source_options(data: dict):
+    """
+    Read the optional source filter/boost of an /askai request.
+
+    "sources": ["twitter", "instagram_songs", ...] limits retrieval to those sources;
+    "source_boost": {"instagram_reels": 0.1} adds a bonus to their similarity.
+    Raises ValueError on malformed input.
+    """
+    sources = data.get("sources")
+    source_boost = data.get("source_boost")
+    if sources is not None:
+        if isinstance(sources, str):
+            sources = [sources]
+        if not isinstance(sources, list) or not all(isinstance(s, str) for s in sources):
+            raise ValueError("sources must be a list of source names")
+    if source_boost is not None:
+        if not isinstance(source_boost, dict):
+            raise ValueError("source_boost must be an object of source name -> number")
+        try:
+            source_boost = {str(k): float(v) for k, v in source_boost.items()}
+        except (TypeError, ValueError):
+            raise ValueError("source_boost values must be numbers")
+    return sources or None, source_boost or None
+
 @app.route('/askai', methods=['POST'])
 def ask_ai():
     try:
@@ -240,88 +748,262 @@ def ask_ai():
 
         if not additional_prompt:
             return jsonify({"error": "Prompt is required"}), 400
+        try:
+            sources, source_boost = parse_source_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        print(f"[askai] Received prompt: {additional_prompt[:100]}...")
-
-        # Style-changing options
-        style_map = {
-            "Make it funnier": "Rewrite the following content to be much funnier, using jokes, puns, and a lighthearted tone. If possible, add a witty punchline.",
-            "Make it sound serious": "Rewrite the following content to sound very serious, formal, and professional.",
-            "Make it concise": "Rewrite the following content to be as concise and brief as possible, without losing the main message.",
-            "Add a call to action": "Rewrite the following content and add a strong, clear call to action at the end.",
-            "Make it more engaging": "Rewrite the following content to be more engaging and interactive, asking questions or encouraging responses.",
-            "Use slang and lingo": "Rewrite the following content using modern slang, internet lingo, and a casual, playful tone."
-        }
+        hot_log.info("askai", "Received prompt: %s...", additional_prompt[:100])
 
         # Check if it's a style change request
-        if additional_prompt in style_map:
-            prompt = (
-                f"{style_map[additional_prompt]}\n\nContent: '''{existing_content}'''.\nRespond with only the rewritten content."
-            )
+        snapshot_version = ""
+        if additional_prompt in STYLE_MAP:
+            with request_timing.stage("prompt"):
+                prompt = build_style_prompt(additional_prompt, existing_content)
         else:
             # Use RAG to retrieve relevant trends
-            relevant_trends = retrieve_relevant_trends(additional_prompt, top_k=5)
-            
+            index = trend_index
+            relevant_trends = retrieve_relevant_trends(
+                additional_prompt, top_k=5, index=index, sources=sources, source_boost=source_boost
+            )
+            with request_timing.stage("prompt"):
+                prompt = build_askai_prompt(additional_prompt, existing_content, relevant_trends)
             if relevant_trends:
-                # Build context from retrieved trends
-                context_str = "\n".join([
-                    f"- {trend_info['trend']} (Tweet Count: {trend_info['count']})"
-                    for trend_info in relevant_trends
-                ])
-                
-                prompt = f"""You are a social media expert analyzing Twitter trends. Based on the following current Twitter trends data:
+                snapshot_version = index.version
 
-{context_str}
-
-User Question: {additional_prompt}
-
-Existing Content: '{existing_content}'
-
-Provide a helpful, accurate, and insightful answer based on the Twitter trends data above. If the question relates to the trends, use the specific trend information. If the question is general or not directly related to the trends, provide a generative answer that's relevant and helpful.
-
-Answer:"""
-            else:
-                # Fallback if RAG not available
-                prompt = (
-                    f"Based on current Twitter trends, answer the user's question. "
-                    f"User Question: {additional_prompt}\n"
-                    f"Existing Content: '{existing_content}'\n"
-                    f"Provide a helpful and insightful answer."
-                )
+        if wants_stream(data):
+            return sse_response(prompt, snapshot_version)
 
         try:
-            response_text = generate_text(prompt)
+            response_text = generate_text(prompt, snapshot_version)
             if not response_text or not response_text.strip():
                 return jsonify({"error": "Empty response from model"}), 500
-            print(f"[askai] Generated response length: {len(response_text)}")
+            hot_log.debug("askai", "Generated response length: %d", len(response_text))
             return jsonify({"content": response_text})
         except Exception as e:
-            print(f"[askai] Error generating text: {e}")
+            hot_log.error("askai", "Error generating text: %s", e)
+            count_error(e)
             import traceback
             traceback.print_exc()
             return jsonify({"error": str(e), "type": type(e).__name__}), 500
     except Exception as e:
-        print(f"[askai] Error in ask_ai endpoint: {e}")
+        hot_log.error("askai", "Error in ask_ai endpoint: %s", e)
+        count_error(e)
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e), "type": type(e).__name__}), 500
 
+# Upper bounds for /batch: items per request and concurrent upstream LLM calls
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "64"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_LLM_CONCURRENCY, thread_name_prefix="batch-llm")
+
+def _run_batch_item(kind: str, prompt: str, snapshot_version: str) -> dict:
+    """Run one LLM call for /batch and shape it like the single-item endpoint's response"""
+    try:
+        response_text = generate_text(prompt, snapshot_version)
+        if kind == "generate-hashtags":
+            metrics.HASHTAG_ANSWERS.labels("llm").inc()
+            return hashtags_from_llm(response_text)
+        if kind == "askai" and (not response_text or not response_text.strip()):
+            return {"error": "Empty response from model"}
+        return {"content": response_text}
+    except Exception as e:
+        hot_log.error("batch", "Error generating %s: %s", kind, e)
+        count_error(e, "batch")
+        return {"error": str(e), "type": type(e).__name__}
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """
+    Run many /askai, /generate-content and /generate-hashtags items in one request.
+
+    Body: {"items": [{"type": "askai" | "generate-content" | "generate-hashtags",
+                      "prompt": "...", "content": "...",
+                      "sources": [...], "source_boost": {...}}, ...]}
+
+    All RAG queries are encoded in one batch and scored with one matrix-matrix
+    product; LLM calls are fanned out concurrently. Results come back in item
+    order, each shaped like the matching single-item endpoint's response.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"At most {BATCH_MAX_ITEMS} items per batch"}), 400
+
+    prompts = [None] * len(items)
+    versions = [""] * len(items)
+    results = [None] * len(items)
+    rag_items = []
+
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[i] = {"error": "Item must be an object"}
+            continue
+        kind = item.get("type", "askai")
+        if kind == "generate-hashtags":
+            topic = normalize_topic(item.get("prompt", ""))
+            results[i] = recommend_hashtags(topic)
+            if results[i] is not None:
+                metrics.HASHTAG_ANSWERS.labels("local").inc()
+            else:
+                prompts[i] = build_hashtags_prompt(topic)
+        elif kind == "generate-content":
+            prompts[i] = build_content_prompt(normalize_topic(item.get("prompt", "")))
+        elif kind == "askai":
+            additional_prompt = (item.get("prompt") or "").strip()
+            existing_content = (item.get("content") or "").strip()
+            if not additional_prompt:
+                results[i] = {"error": "Prompt is required"}
+            elif additional_prompt in STYLE_MAP:
+                prompts[i] = build_style_prompt(additional_prompt, existing_content)
+            else:
+                try:
+                    rag_items.append((i, additional_prompt, existing_content, parse_source_options(item)))
+                except ValueError as e:
+                    results[i] = {"error": str(e)}
+        else:
+            results[i] = {"error": f"Unknown item type: {kind}"}
+
+    # One encode batch + one matrix-matrix product for every RAG query
+    if rag_items:
+        index = trend_index
+        batch_trends = retrieve_relevant_trends_batch(
+            [q for _, q, _, _ in rag_items], top_k=5, index=index,
+            source_options=[options for _, _, _, options in rag_items]
+        )
+        for (i, additional_prompt, existing_content, _), relevant_trends in zip(rag_items, batch_trends):
+            prompts[i] = build_askai_prompt(additional_prompt, existing_content, relevant_trends)
+            if relevant_trends:
+                versions[i] = index.version
+
+    # LLM calls run on the batch pool; their wall time is the request's llm stage
+    with request_timing.stage("llm"):
+        futures = {
+            i: _batch_executor.submit(_run_batch_item, items[i].get("type", "askai"), prompt, versions[i])
+            for i, prompt in enumerate(prompts) if prompt is not None
+        }
+        for i, future in futures.items():
+            results[i] = future.result()
+
+    hot_log.info("batch", "Completed %d items (%d with RAG)", len(items), len(rag_items))
+    return jsonify({"results": results})
+
+def index_summary(index) -> dict:
+    """Size and version of a snapshot, as reported by /health and /reload-data (Flask and ASGI)"""
+    return {
+        "trends_count": len(index) if index is not None else 0,
+        "trend_clusters": len(index.clusters) if index is not None and index.clusters is not None else None,
+        "index_version": index.version if index is not None else None,
+    }
+
+def embedding_cache_stats() -> dict:
+    cache = embedding_cache
+    return {
+        "entries": len(cache) if cache is not None else 0,
+        "hits": cache.hits if cache is not None else 0,
+        "misses": cache.misses if cache is not None else 0
+    }
+
 @app.route('/reload-data', methods=['POST'])
 def reload_data():
-    """Reload Twitter data and rebuild embeddings"""
+    """Reload the trend corpus and incrementally rebuild embeddings"""
     try:
-        initialize_rag()
-        return jsonify({"message": "Data reloaded successfully", "trends_count": len(twitter_df) if twitter_df is not None else 0})
+        index = initialize_rag()
+        return jsonify({
+            "message": "Data reloaded successfully",
+            **index_summary(index),
+            "changes": last_reload_changes
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Token for /admin/* endpoints; admin endpoints are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def is_admin() -> bool:
+    """X-Admin-Token or "Authorization: Bearer <token>" matches ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        return False
+    supplied = request.headers.get("X-Admin-Token", "")
+    authorization = request.headers.get("Authorization", "")
+    if not supplied and authorization.startswith("Bearer "):
+        supplied = authorization[len("Bearer "):]
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    """
+    Arm, inspect or disarm request profiling (requires ADMIN_TOKEN).
+
+    POST {"requests": 5} profiles the next 5 requests;
+    POST {"threshold_ms": 800, "duration_s": 600, "max_traces": 20} saves
+    requests slower than 800 ms for the next 10 minutes. Optional:
+    "profiler": "sample" (folded stacks, default) | "cprofile" (.prof), and
+    "endpoints": ["askai", ...]. GET reports state and saved traces; DELETE disarms.
+
+    With ENCODE_BATCHING (default) query encoding runs on the encode-batcher
+    thread. "sample" traces include its stacks under an "[encode-batcher]"
+    root frame; "cprofile" traces cannot, and show the encode stage as the
+    request waiting (Event.wait): profile with ENCODE_BATCHING=0 to see the
+    encoder in a cProfile trace.
+    """
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == 'DELETE':
+        return jsonify(profiler.disarm())
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            state = profiler.arm(
+                requests=data.get("requests"),
+                threshold_ms=data.get("threshold_ms"),
+                duration_s=float(data.get("duration_s", 300)),
+                max_traces=int(data.get("max_traces", 20)),
+                profiler=data.get("profiler", "sample"),
+                endpoints=data.get("endpoints"),
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+        print(f"[profile] Armed: {state['mode']}, profiler={state['profiler']}")
+        return jsonify(state)
+    return jsonify({**profiler.state(), "traces": profiler.traces()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text-format metrics"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "alive"})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness: the RAG index is loaded and /askai can use trend context"""
+    ready = trend_index is not None
+    return jsonify({"ready": ready, "rag_status": rag_status}), 200 if ready else 503
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    index = trend_index
     return jsonify({
         "status": "healthy",
-        "rag_initialized": twitter_df is not None,
-        "trends_count": len(twitter_df) if twitter_df is not None else 0,
+        "live": True,
+        "ready": index is not None,
+        "rag_status": rag_status,
+        "startup_timings": startup_timings,
+        "rag_initialized": index is not None,
+        **index_summary(index),
+        "embedding_cache": embedding_cache_stats(),
+        "llm_cache": llm_cache.stats() if llm_cache is not None else None,
+        "llm_inflight": llm_inflight.stats(),
+        "retrieval": retrieval_stats,
+        "encode_batching": query_batcher.stats() if ENCODE_BATCHING else None,
         "model": MODEL_NAME
     })
 
@@ -330,6 +1012,8 @@ if __name__ == '__main__':
     print(f"\n{'='*60}")
     print(f"Starting Gemini RAG Service on port 5001")
     print(f"Model: {MODEL_NAME}")
-    print(f"RAG System: {'Initialized' if twitter_df is not None else 'Not initialized'}")
+    print(f"RAG System: {rag_status}")
     print(f"{'='*60}\n")
+    if not _is_reloader_parent():
+        start_index_watcher()
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,339 @@
+"""
+Async (ASGI) serving mode for the Gemini RAG service.
+
+Serves the same routes as gemini.py (/askai, /generate-content,
+/generate-hashtags, /reload-data, /health) on an event loop instead of one OS
+thread per request:
+
+- LLM calls go through the async GenAI client (genai_client.aio), capped by
+  MAX_UPSTREAM_CONCURRENCY concurrent upstream requests.
+- CPU-bound work (query encoding + retrieval, index rebuilds) runs on a
+  bounded thread pool of ENCODE_WORKERS threads.
+- Identical in-flight prompts are coalesced and the SQLite response cache is
+  shared with the threaded server.
+
+Run with:
+    python gemini_asgi.py
+or:
+    uvicorn gemini_asgi:app --host 0.0.0.0 --port 5001
+"""
+import asyncio
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, request, jsonify, Response, g, has_request_context
+from quart_cors import cors
+
+import gemini
+import hot_log
+import metrics
+import request_timing
+from llm_cache import LLMResponseCache
+from singleflight import AsyncSingleFlight
+
+# Cap on concurrent requests to the Gemini API across all in-flight HTTP requests
+MAX_UPSTREAM_CONCURRENCY = int(os.getenv("MAX_UPSTREAM_CONCURRENCY", "64"))
+# Threads for CPU-bound work; encoding is compute-heavy, so keep this small. With
+# ENCODE_BATCHING the model runs on the batcher's own thread and these threads mostly
+# wait for their query's vector, so more of them means fuller encode batches
+ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "8" if gemini.ENCODE_BATCHING else "2"))
+
+app = cors(Quart(__name__))
+
+encode_executor = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
+llm_inflight = AsyncSingleFlight()
+_upstream_semaphore = None
+
+
+def upstream_semaphore() -> asyncio.Semaphore:
+    # Created lazily so it binds to the server's running event loop
+    global _upstream_semaphore
+    if _upstream_semaphore is None:
+        _upstream_semaphore = asyncio.Semaphore(MAX_UPSTREAM_CONCURRENCY)
+    return _upstream_semaphore
+
+
+async def run_blocking(fn, *args):
+    """Run a CPU-bound or blocking call on the bounded encode executor"""
+    # Carry the request's context over, so stage timings recorded in fn land in this request
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(encode_executor, context.run, fn, *args)
+
+
+@app.before_serving
+async def start_index_watcher():
+    # Runs in every worker process (uvicorn --workers / hypercorn -w) with SHARED_INDEX=1
+    gemini.start_index_watcher()
+
+
+@app.before_request
+async def begin_request_timing():
+    g.request_started = time.perf_counter()
+    request_timing.begin()
+
+
+@app.after_request
+async def add_server_timing(response):
+    total = time.perf_counter() - g.request_started
+    metrics.REQUEST_SECONDS.labels(endpoint_label(), response.status_code).observe(total)
+    timings = request_timing.current()
+    if timings is not None:
+        response.headers["Server-Timing"] = request_timing.server_timing_header(timings, total)
+    return response
+
+
+def endpoint_label() -> str:
+    if has_request_context():
+        return request.url_rule.rule.strip("/") if request.url_rule is not None else "unmatched"
+    return "background"
+
+
+def count_error(e: Exception):
+    metrics.ERRORS.labels(endpoint_label(), type(e).__name__).inc()
+
+
+async def cache_get(prompt: str, snapshot_version: str):
+    if gemini.llm_cache is None:
+        return None
+    return await run_blocking(gemini.llm_cache.get, gemini.MODEL_NAME, prompt, snapshot_version)
+
+
+async def cache_put(prompt: str, result: str, snapshot_version: str):
+    if gemini.llm_cache is not None and result and result.strip():
+        await run_blocking(gemini.llm_cache.put, gemini.MODEL_NAME, prompt, result, snapshot_version)
+
+
+async def generate_text(prompt: str, snapshot_version: str = "") -> str:
+    """Async counterpart of gemini.generate_text"""
+    with request_timing.stage("llm"):
+        endpoint = endpoint_label()
+        cached = await cache_get(prompt, snapshot_version)
+        if cached is not None:
+            metrics.LLM_CACHE_HITS.labels(endpoint).inc()
+            return cached
+
+        async def call_and_store():
+            metrics.PROMPT_CHARS.labels(endpoint).observe(len(prompt))
+            async with upstream_semaphore():
+                started = time.perf_counter()
+                response = await gemini.genai_client.aio.models.generate_content(
+                    model=gemini.MODEL_NAME,
+                    contents=prompt
+                )
+                metrics.LLM_SECONDS.labels(gemini.MODEL_NAME, endpoint).observe(time.perf_counter() - started)
+            result = gemini.extract_response_text(response)
+            metrics.RESPONSE_CHARS.labels(endpoint).observe(len(result or ""))
+            await cache_put(prompt, result, snapshot_version)
+            return result
+
+        key = LLMResponseCache.make_key(gemini.MODEL_NAME, prompt, snapshot_version)
+        return await llm_inflight.do(key, call_and_store)
+
+
+async def generate_text_stream(prompt: str, snapshot_version: str = "", endpoint: str = None):
+    """Async counterpart of gemini.generate_text_stream"""
+    # SSE bodies are produced after the handler returns, so the route is passed in
+    endpoint = endpoint or endpoint_label()
+    cached = await cache_get(prompt, snapshot_version)
+    if cached is not None:
+        metrics.LLM_CACHE_HITS.labels(endpoint).inc()
+        yield cached
+        return
+
+    parts = []
+    metrics.PROMPT_CHARS.labels(endpoint).observe(len(prompt))
+    async with upstream_semaphore():
+        started = time.perf_counter()
+        stream = await gemini.genai_client.aio.models.generate_content_stream(
+            model=gemini.MODEL_NAME,
+            contents=prompt
+        )
+        async for chunk in stream:
+            text = getattr(chunk, 'text', None)
+            if text:
+                parts.append(text)
+                yield text
+        metrics.LLM_SECONDS.labels(gemini.MODEL_NAME, endpoint).observe(time.perf_counter() - started)
+    metrics.RESPONSE_CHARS.labels(endpoint).observe(len("".join(parts)))
+    await cache_put(prompt, "".join(parts), snapshot_version)
+
+
+def sse_response(prompt: str, snapshot_version: str = "") -> Response:
+    """Same event format as gemini.sse_response"""
+    endpoint = endpoint_label()
+
+    async def events():
+        parts = []
+        try:
+            async for text in generate_text_stream(prompt, snapshot_version, endpoint):
+                parts.append(text)
+                yield f"data: {json.dumps({'delta': text})}\n\n".encode()
+            content = "".join(parts)
+            if not content.strip():
+                yield f"event: error\ndata: {json.dumps({'error': 'Empty response from model'})}\n\n".encode()
+                return
+            yield f"event: done\ndata: {json.dumps({'content': content})}\n\n".encode()
+        except Exception as e:
+            hot_log.error("sse", "Error while streaming: %s: %s", type(e).__name__, e)
+            metrics.ERRORS.labels(endpoint, type(e).__name__).inc()
+            yield f"event: error\ndata: {json.dumps({'error': str(e), 'type': type(e).__name__})}\n\n".encode()
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.timeout = None
+    return response
+
+
+def wants_stream(data: dict) -> bool:
+    return (
+        bool(data.get("stream"))
+        or request.args.get("stream") in ("1", "true")
+        or "text/event-stream" in request.headers.get("Accept", "")
+    )
+
+
+@app.route('/generate-hashtags', methods=['POST'])
+async def generate_hashtags():
+    data = await request.get_json(silent=True) or {}
+    topic = gemini.normalize_topic(data.get("prompt", ""))
+    local = await run_blocking(gemini.recommend_hashtags, topic)
+    if local is not None:
+        metrics.HASHTAG_ANSWERS.labels("local").inc()
+        return jsonify(local)
+    prompt = gemini.build_hashtags_prompt(topic)
+
+    try:
+        response_text = await generate_text(prompt)
+        metrics.HASHTAG_ANSWERS.labels("llm").inc()
+        return jsonify(gemini.hashtags_from_llm(response_text))
+    except Exception as e:
+        hot_log.error("generate_hashtags", "Error generating hashtags: %s", e)
+        count_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/generate-content', methods=['POST'])
+async def generate_content():
+    data = await request.get_json(silent=True) or {}
+    prompt = gemini.build_content_prompt(gemini.normalize_topic(data.get("prompt", "")))
+
+    if wants_stream(data):
+        return sse_response(prompt)
+
+    try:
+        response_text = await generate_text(prompt)
+        return jsonify({"content": response_text})
+    except Exception as e:
+        hot_log.error("generate_content", "Error generating content: %s", e)
+        count_error(e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/askai', methods=['POST'])
+async def ask_ai():
+    data = await request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Request body is required"}), 400
+
+    additional_prompt = (data.get("prompt") or "").strip()
+    existing_content = (data.get("content") or "").strip()
+    if not additional_prompt:
+        return jsonify({"error": "Prompt is required"}), 400
+    try:
+        sources, source_boost = gemini.parse_source_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        snapshot_version = ""
+        if additional_prompt in gemini.STYLE_MAP:
+            prompt = gemini.build_style_prompt(additional_prompt, existing_content)
+        else:
+            index = gemini.trend_index
+            relevant_trends = await run_blocking(
+                gemini.retrieve_relevant_trends, additional_prompt, 5, index, sources, source_boost
+            )
+            with request_timing.stage("prompt"):
+                prompt = gemini.build_askai_prompt(additional_prompt, existing_content, relevant_trends)
+            if relevant_trends:
+                snapshot_version = index.version
+
+        if wants_stream(data):
+            return sse_response(prompt, snapshot_version)
+
+        response_text = await generate_text(prompt, snapshot_version)
+        if not response_text or not response_text.strip():
+            return jsonify({"error": "Empty response from model"}), 500
+        return jsonify({"content": response_text})
+    except Exception as e:
+        hot_log.error("askai", "Error in ask_ai endpoint: %s", e)
+        count_error(e)
+        return jsonify({"error": str(e), "type": type(e).__name__}), 500
+
+
+@app.route('/reload-data', methods=['POST'])
+async def reload_data():
+    """Incremental rebuild runs off the event loop; requests keep using the old index meanwhile"""
+    try:
+        index = await run_blocking(gemini.initialize_rag)
+        return jsonify({
+            "message": "Data reloaded successfully",
+            **gemini.index_summary(index),
+            "changes": gemini.last_reload_changes
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/health/live', methods=['GET'])
+async def liveness():
+    return jsonify({"status": "alive"})
+
+
+@app.route('/health/ready', methods=['GET'])
+async def readiness():
+    ready = gemini.trend_index is not None
+    return jsonify({"ready": ready, "rag_status": gemini.rag_status}), 200 if ready else 503
+
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    index = gemini.trend_index
+    return jsonify({
+        "status": "healthy",
+        "server": "asgi",
+        "live": True,
+        "ready": index is not None,
+        "rag_status": gemini.rag_status,
+        "startup_timings": gemini.startup_timings,
+        "rag_initialized": index is not None,
+        **gemini.index_summary(index),
+        "embedding_cache": gemini.embedding_cache_stats(),
+        "llm_cache": gemini.llm_cache.stats() if gemini.llm_cache is not None else None,
+        "llm_inflight": llm_inflight.stats(),
+        "retrieval": gemini.retrieval_stats,
+        "upstream_concurrency_limit": MAX_UPSTREAM_CONCURRENCY,
+        "encode_workers": ENCODE_WORKERS,
+        "encode_batching": gemini.query_batcher.stats() if gemini.ENCODE_BATCHING else None,
+        "model": gemini.MODEL_NAME
+    })
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print(f"\n{'='*60}")
+    print(f"Starting Gemini RAG Service (ASGI) on port 5001")
+    print(f"Model: {gemini.MODEL_NAME}")
+    print(f"Upstream concurrency limit: {MAX_UPSTREAM_CONCURRENCY}, encode workers: {ENCODE_WORKERS}")
+    print(f"{'='*60}\n")
+    uvicorn.run(app, host='0.0.0.0', port=5001)
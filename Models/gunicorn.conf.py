@@ -0,0 +1,40 @@
+"""
+Multi-process serving for gemini.py:
+
+    pip install gunicorn
+    cd Models
+    gunicorn -c gunicorn.conf.py gemini:app
+
+preload_app loads the sentence encoder and builds the trend index once, in
+the master, before the workers fork; they share those pages copy-on-write
+instead of each importing torch and encoding the corpus. SHARED_INDEX=1
+then publishes every (re)build to shared_index, which each worker maps
+read-only: a /reload-data on any worker swaps all of them within
+SHARED_INDEX_POLL_S.
+
+Metrics (/metrics) and the admin profiler are per worker process.
+"""
+import os
+
+# Before gemini is imported by preload_app: load synchronously in the master,
+# background threads do not survive fork
+os.environ.setdefault("SHARED_INDEX", "1")
+os.environ.setdefault("RAG_BACKGROUND_LOAD", "0")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 4))))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = True
+# LLM calls and streamed answers can take a while
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    import sys
+    import gemini
+
+    if "torch" in sys.modules:
+        # Query encoding is per request; N workers x all-core thread pools only contend
+        sys.modules["torch"].set_num_threads(int(os.getenv("TORCH_THREADS_PER_WORKER", "1")))
+    gemini.start_index_watcher()
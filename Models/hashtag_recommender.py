@@ -0,0 +1,160 @@
+"""
+LLM-free hashtag recommendations from the trend index (/generate-hashtags).
+
+Candidates are the Twitter trends of a TrendIndex snapshot (live scrape and
+archive): hashtags as they are, short phrase trends as their hashtag form
+("Manmohan Singh" -> #ManmohanSingh). For a topic vector every candidate
+scores
+
+    similarity + HASHTAG_COUNT_WEIGHT * popularity + HASHTAG_COOCCURRENCE_WEIGHT * co-occurrence
+
+- similarity: cosine between the topic and the trend's embedding
+- popularity: log tweet count, scaled to [0, 1]
+- co-occurrence: how often the candidate trended in the same trends24 card
+  (trend_store snapshot and slot, last HASHTAG_COOCCURRENCE_DAYS days) as the
+  topic's closest trends, scaled to [0, 1]; 0 when there is no history store
+
+A recommendation is confident when at least HASHTAG_MIN_RESULTS of the
+returned tags have a similarity of HASHTAG_MIN_SIMILARITY or more; below
+that the caller asks the LLM instead.
+"""
+import os
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+COUNT_WEIGHT = float(os.getenv("HASHTAG_COUNT_WEIGHT", "0.1"))
+COOCCURRENCE_WEIGHT = float(os.getenv("HASHTAG_COOCCURRENCE_WEIGHT", "0.1"))
+MIN_SIMILARITY = float(os.getenv("HASHTAG_MIN_SIMILARITY", "0.45"))
+MIN_RESULTS = int(os.getenv("HASHTAG_MIN_RESULTS", "3"))
+COOCCURRENCE_DAYS = float(os.getenv("HASHTAG_COOCCURRENCE_DAYS", "7"))
+# Trend sources whose names are usable as hashtags
+HASHTAG_SOURCES = ("twitter", "twitter_archive")
+# Longer phrase trends make unreadable hashtags
+MAX_PHRASE_WORDS = 3
+# Closest trends whose co-trending neighbours get the co-occurrence bonus
+SEED_TRENDS = 10
+
+
+def to_hashtag(trend: str):
+    """The hashtag form of a trend name, or None when it does not make a usable one"""
+    trend = str(trend).strip()
+    if trend.startswith("#"):
+        return trend if len(trend) > 1 and " " not in trend else None
+    # Drop punctuation, symbols and separators but keep combining marks (Devanagari, Tamil, ...)
+    words = ["".join(c for c in word if not unicodedata.category(c).startswith(("P", "S", "Z", "C")))
+             for word in trend.split()]
+    words = [word for word in words if word]
+    if not words or len(words) > MAX_PHRASE_WORDS:
+        return None
+    return "#" + "".join(word[:1].upper() + word[1:] for word in words)
+
+
+class HashtagRecommender:
+    """
+    Hashtag candidates of one TrendIndex snapshot; build a new one per snapshot.
+
+    Args:
+        index: The TrendIndex the candidates and their embeddings come from
+        cards: Optional list of trend-name lists that trended together (see from_index)
+    """
+
+    def __init__(self, index, cards=None):
+        self.index = index
+        best = {}
+        counts = pd.to_numeric(pd.Series(index.count_values), errors="coerce").fillna(0).astype(np.int64).tolist()
+        for row, (trend, count, source) in enumerate(zip(index.trend_values, counts, index.source_values)):
+            if source not in HASHTAG_SOURCES:
+                continue
+            tag = to_hashtag(trend)
+            if tag is None:
+                continue
+            key = tag.lower()
+            # The same tag from the live scrape and the archive: keep the row with more tweets
+            if key not in best or count > best[key][2]:
+                best[key] = (row, tag, count)
+
+        entries = list(best.values())
+        self.tags = [tag for _, tag, _ in entries]
+        self.column_by_key = {tag.lower(): column for column, tag in enumerate(self.tags)}
+        rows = np.array([row for row, _, _ in entries], dtype=np.int64)
+        counts = np.array([count for _, _, count in entries], dtype=np.float64)
+        self.counts = counts.astype(np.int64)
+        self.embeddings = np.ascontiguousarray(index.embeddings[rows], dtype=np.float32) if len(rows) else \
+            np.zeros((0, 0), dtype=np.float32)
+        top = np.log1p(counts.max()) if len(counts) and counts.max() > 0 else 1.0
+        self.popularity = (np.log1p(counts) / top).astype(np.float32)
+        self.incidence = self._incidence(cards or [])
+
+    def _incidence(self, cards):
+        """(cards, candidates) 0/1 matrix of which candidates trended in which card"""
+        incidence = np.zeros((len(cards), len(self.tags)), dtype=np.float32)
+        for i, names in enumerate(cards):
+            for name in names:
+                tag = to_hashtag(name)
+                column = self.column_by_key.get(tag.lower()) if tag is not None else None
+                if column is not None:
+                    incidence[i, column] = 1.0
+        incidence = incidence[incidence.sum(axis=1) > 1]
+        return incidence if len(incidence) else None
+
+    @classmethod
+    def from_index(cls, index, store_path: str = None):
+        """Recommender for `index`, with co-occurrence from the trend history store when it exists"""
+        from trend_store import DEFAULT_STORE_PATH, TrendStore
+
+        store_path = store_path or os.getenv("TREND_STORE_PATH", DEFAULT_STORE_PATH)
+        cards = []
+        if COOCCURRENCE_WEIGHT and os.path.exists(store_path):
+            store = TrendStore(store_path)
+            try:
+                now = int(time.time())
+                grouped = {}
+                for scraped_at, trend, _, slot, _ in store.range(now - int(COOCCURRENCE_DAYS * 86400), now):
+                    grouped.setdefault((scraped_at, slot), []).append(trend)
+                cards = list(grouped.values())
+            finally:
+                store.close()
+        return cls(index, cards)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def recommend(self, query_vector: np.ndarray, top_k: int = 5):
+        """
+        Top hashtags for a topic vector.
+
+        Returns:
+            (results, confident): results are {"hashtag", "similarity", "count", "score"}
+            dicts, best first; confident says whether they are good enough to skip the LLM
+        """
+        if not self.tags:
+            return [], False
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarity = self.embeddings @ query
+        score = similarity + COUNT_WEIGHT * self.popularity
+
+        if self.incidence is not None and COOCCURRENCE_WEIGHT:
+            seeds = np.argsort(-similarity)[:SEED_TRENDS]
+            weights = np.zeros(len(self.tags), dtype=np.float32)
+            weights[seeds] = np.maximum(similarity[seeds], 0.0)
+            cooccurrence = self.incidence.T @ (self.incidence @ weights)
+            # A seed co-trending with itself is not evidence
+            cooccurrence -= self.incidence.sum(axis=0) * weights
+            peak = cooccurrence.max()
+            if peak > 0:
+                score = score + COOCCURRENCE_WEIGHT * (cooccurrence / peak)
+
+        k = min(top_k, len(self.tags))
+        top = np.argpartition(-score, k - 1)[:k]
+        top = top[np.argsort(-score[top])]
+        results = [
+            {"hashtag": self.tags[c], "similarity": float(similarity[c]), "count": int(self.counts[c]),
+             "score": float(score[c])}
+            for c in top
+        ]
+        confident = int(np.sum(similarity[top] >= MIN_SIMILARITY)) >= min(MIN_RESULTS, k)
+        return results, confident
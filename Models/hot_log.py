@@ -0,0 +1,62 @@
+"""
+Leveled, sampled logging for the request hot path.
+
+By default (LOG_MODE=print) messages are printed exactly as before,
+"[tag] message", so local runs look unchanged. LOG_MODE=logging routes them
+through the `logging` module instead:
+
+- LOG_LEVEL (default INFO) drops debug messages without formatting them.
+- LOG_SAMPLE_RATE (default 1.0) keeps that fraction of debug/info messages;
+  warnings and errors are always logged.
+
+Messages take %-style arguments that are only formatted when emitted:
+
+    hot_log.debug("generate_text", "Prompt length: %d", len(prompt))
+"""
+import logging
+import os
+import random
+
+LOG_MODE = os.getenv("LOG_MODE", "print")
+LOG_LEVEL = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+_loggers = {}
+
+if LOG_MODE == "logging":
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("gemini").setLevel(LOG_LEVEL)
+
+
+def _logger(tag: str) -> logging.Logger:
+    logger = _loggers.get(tag)
+    if logger is None:
+        logger = _loggers[tag] = logging.getLogger(f"gemini.{tag}")
+    return logger
+
+
+def log(level: int, tag: str, message: str, *args):
+    if LOG_MODE != "logging":
+        print(f"[{tag}] {message % args if args else message}")
+        return
+    if level < LOG_LEVEL:
+        return
+    if level < logging.WARNING and LOG_SAMPLE_RATE < 1.0 and random.random() >= LOG_SAMPLE_RATE:
+        return
+    _logger(tag).log(level, message, *args)
+
+
+def debug(tag: str, message: str, *args):
+    log(logging.DEBUG, tag, message, *args)
+
+
+def info(tag: str, message: str, *args):
+    log(logging.INFO, tag, message, *args)
+
+
+def warning(tag: str, message: str, *args):
+    log(logging.WARNING, tag, message, *args)
+
+
+def error(tag: str, message: str, *args):
+    log(logging.ERROR, tag, message, *args)
@@ -1,65 +1,35 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-import json
+from fetch import shared_fetcher
+from page_parsers import convert_to_numeric, get_parser
+from trend_store import TrendStore
 
 url = "https://socialbu.com/blog/trending-songs-on-instagram-reels/"
-response = requests.get(url)
-soup = BeautifulSoup(response.content, "html.parser")
-songs_data = []
 
-def convert_to_numeric(value):
-    try:
-        value = value.upper()
-        if 'K' in value:
-            return int(float(value.replace('K', '').replace(',', '')) * 1000)
-        elif 'M' in value:
-            return int(float(value.replace('M', '').replace(',', '')) * 1000000)
-        else:
-            return int(value.replace(',', ''))
-    except ValueError:
-        return None
-
-song_sections = soup.find_all("li")
-for i in range(0, len(song_sections), 2):
-    song_info = song_sections[i].find("a")
-    if song_info:
-        song_text = song_info.get_text(strip=True)
-        song_link = song_info['href']
-
-        if 'instagram.com' not in song_link:
-            continue
-
-        if ' - ' in song_text:
-            song_name, artist_name = song_text.split(' - ', 1)
-        else:
-            song_name = song_text
-            artist_name = "Unknown"
+def parse_trending_songs(content):
+    """Song dicts (name, artist, reels count, link, description, likes) from the socialbu page"""
+    return get_parser().trending_songs(content)
 
-        if i + 1 < len(song_sections):
-            reels_count_text = song_sections[i + 1].get_text(strip=True)
-            reels_count_text = reels_count_text.replace(',', '').replace('# of Reels:', '').strip()
-            reels_count = convert_to_numeric(reels_count_text)
-
-            if reels_count is None:
-                continue
-        else:
-            reels_count = 0
-        paragraph = song_sections[i].find_next("p")
-        description = paragraph.get_text(strip=True) if paragraph else ""
-        likes_element = paragraph.find_next("strong") if paragraph else None
-        likes = likes_element.get_text(strip=True) if likes_element else "N/A"
-
-        songs_data.append({
-            "song_name": song_name,
-            "artist_name": artist_name,
-            "reels_count": reels_count,
-            "song_link": song_link,
-            "description": description,
-            "likes": likes
-        })
+def scrape_trending_songs(fetcher=None):
+    """Fetch, parse and store the trending Reels songs; skipped when the page is unchanged"""
+    fetcher = fetcher or shared_fetcher()
+    response = fetcher.fetch(url, namespace="instagram_trending_songs")
+    if response.not_modified:
+        print("Trending songs page unchanged since last scrape, skipped")
+        return None
+    if not response.ok:
+        print(f"Failed to retrieve the webpage. {response.error}")
+        return None
 
-df = pd.DataFrame(songs_data)
-df = df.sort_values(by="reels_count", ascending=False)
-df.to_csv("instagram_trending_songs.csv", index=False)
-print("Data saved successfully in CSV and JSON formats.")
\ No newline at end of file
+    df = pd.DataFrame(parse_trending_songs(response.content))
+    df = df.sort_values(by="reels_count", ascending=False) if not df.empty else df
+    df.to_csv("instagram_trending_songs.csv", index=False)
+    if not df.empty:
+        store = TrendStore()
+        store.append_snapshot(zip(df["song_name"], df["reels_count"]), source="instagram_songs")
+        store.close()
+    fetcher.commit(url, namespace="instagram_trending_songs")
+    print("Data saved successfully in CSV and JSON formats.")
+    return df
+
+if __name__ == "__main__":
+    scrape_trending_songs()
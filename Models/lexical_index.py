@@ -0,0 +1,158 @@
+"""
+In-memory inverted index with BM25 scoring over trend names.
+
+Hashtags such as #INDvsAUS, #SquidGame or #शिवजी_की_समर्थता are matched
+poorly by MiniLM embeddings but exactly by token, so retrieval fuses BM25
+results with the dense ones (reciprocal-rank fusion), and a query that is
+exactly a trend name is answered from the postings without encoding.
+
+Tokenization: NFKC normalization and casefolding, splitting on Unicode
+punctuation/symbols/whitespace (including '_'), so combining marks in
+scripts like Devanagari stay inside their word. Latin tokens are also
+segmented on case and digit boundaries ("SquidGame" -> squid, game) while
+the whole token is kept as well.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+# Latin camel-case / acronym / digit segments. "INDvsAUS" is ambiguous
+# (IN + Dvs or IND + vs), so both readings are indexed.
+_SEGMENT_RES = (
+    re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+"),
+    re.compile(r"[A-Z]{2,}(?=[a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+"),
+)
+
+
+@lru_cache(maxsize=65536)
+def _is_separator(ch: str) -> bool:
+    # Punctuation (incl. '_'), symbols, separators and control characters
+    return unicodedata.category(ch)[0] in "PSZC"
+
+
+def _split(text: str) -> list:
+    words, current = [], []
+    for ch in text:
+        if _is_separator(ch):
+            if current:
+                words.append("".join(current))
+                current = []
+        else:
+            current.append(ch)
+    if current:
+        words.append("".join(current))
+    return words
+
+
+def tokenize(text: str) -> list:
+    """Normalized tokens of a trend name or query, with hashtag segments"""
+    tokens = []
+    for word in _split(unicodedata.normalize("NFKC", str(text))):
+        folded = word.casefold()
+        tokens.append(folded)
+        segments = []
+        for pattern in _SEGMENT_RES:
+            for segment in pattern.findall(word):
+                segment = segment.casefold()
+                if segment != folded and segment not in segments:
+                    segments.append(segment)
+        tokens.extend(segments)
+    return tokens
+
+
+def match_key(text: str) -> str:
+    """Key for exact matching: '#IND vs AUS' and 'indvsaus' both -> 'indvsaus'"""
+    return "".join(_split(unicodedata.normalize("NFKC", str(text)))).casefold()
+
+
+class LexicalIndex:
+    """
+    BM25 over a list of documents (trend names), stored as CSR postings.
+
+    Args:
+        documents: One string per row; row ids match the TrendIndex rows
+        k1, b: BM25 parameters
+    """
+
+    def __init__(self, documents, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        vocabulary = {}
+        doc_ids, term_ids = [], []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        self.exact = {}
+        for row, document in enumerate(documents):
+            tokens = tokenize(document)
+            lengths[row] = len(tokens)
+            for token in tokens:
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                doc_ids.append(row)
+            key = match_key(document)
+            if key:
+                self.exact.setdefault(key, []).append(row)
+
+        self.vocabulary = vocabulary
+        self.num_docs = len(documents)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        # Collapse repeated (term, doc) pairs into term frequencies, grouped by term
+        pairs = np.unique(term_ids * max(self.num_docs, 1) + doc_ids, return_counts=True)
+        pair_ids, tf = pairs
+        terms = pair_ids // max(self.num_docs, 1)
+        self.postings = (pair_ids % max(self.num_docs, 1)).astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(vocabulary)))]).astype(np.int64)
+
+        df = np.diff(self.offsets).astype(np.float32)
+        self.idf = np.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = float(lengths.mean()) if self.num_docs else 1.0
+        # Precompute the BM25 term weight of every posting
+        norm = self.k1 * (1 - self.b + self.b * lengths[self.postings] / max(avg_length, 1e-6))
+        tf = tf.astype(np.float32)
+        self.weights = (np.repeat(self.idf, np.diff(self.offsets)) * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def __len__(self):
+        return self.num_docs
+
+    def exact_matches(self, query: str) -> list:
+        """Rows whose whole name equals the query up to case, '#', spacing and punctuation"""
+        return list(self.exact.get(match_key(query), ()))
+
+    def search(self, query: str, top_k: int, exclude: np.ndarray = None):
+        """
+        BM25 top-k for one query.
+
+        Args:
+            query: Free text
+            top_k: Number of results
+            exclude: Optional boolean mask of rows that must not be returned
+
+        Returns:
+            (rows, scores) sorted by descending score; empty when no token matches
+        """
+        term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not term_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        spans = [np.arange(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        positions = np.concatenate(spans)
+        rows, inverse = np.unique(self.postings[positions], return_inverse=True)
+        scores = np.bincount(inverse, weights=self.weights[positions]).astype(np.float32)
+        if exclude is not None:
+            keep = ~exclude[rows]
+            rows, scores = rows[keep], scores[keep]
+        k = min(top_k, len(rows))
+        if k < len(rows):
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60) -> dict:
+    """{row: sum over rankings of 1 / (k + rank)} for ranked row lists (rank starts at 1)"""
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return fused
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'llm_responses.sqlite3')
+# Eviction trims the cache to this fraction of max_entries, so the next one is many inserts away
+EVICT_TO = 0.9
+# Re-count the table at least this often: other processes insert into the same file
+RECOUNT_EVERY = int(os.getenv("LLM_CACHE_RECOUNT_EVERY", "256"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so trivially different spacings share a cache entry"""
+    return " ".join(prompt.split())
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of LLM responses with TTL and size-bounded LRU eviction.
+
+    Entries are keyed on (model, normalized prompt, trend-snapshot version), so
+    answers built from an older trend index are never served for a newer one.
+
+    The entry count is kept as a running estimate (inserts since the last
+    COUNT(*)) rather than counted on every insert. The table is re-counted,
+    and trimmed to EVICT_TO of max_entries if over the cap, when the
+    estimate passes max_entries or every RECOUNT_EVERY inserts, which also
+    picks up rows written by other worker processes.
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: int = None, max_entries: int = None):
+        self.path = path or os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("LLM_CACHE_TTL_SECONDS", "3600"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._connect()
+        if hasattr(os, "register_at_fork"):
+            # A SQLite connection must not cross fork (gunicorn preload_app): reopen in the child
+            os.register_at_fork(after_in_child=self._connect)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses(expires_at)")
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        self._puts_since_count = 0
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    @staticmethod
+    def make_key(model: str, prompt: str, snapshot_version: str = "") -> str:
+        raw = "\x00".join([model, normalize_prompt(prompt), snapshot_version or ""])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str, snapshot_version: str = ""):
+        """Return the cached response text, or None on a miss or expired entry"""
+        key = self.make_key(model, prompt, snapshot_version)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] < now:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, prompt: str, response: str, snapshot_version: str = ""):
+        key = self.make_key(model, prompt, snapshot_version)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, now, now + self.ttl_seconds, now),
+            )
+            # Over-counts replaced keys, which only brings the next re-count forward
+            self._entries += 1
+            self._puts_since_count += 1
+            if self._entries > self.max_entries or self._puts_since_count >= RECOUNT_EVERY:
+                self._entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                self._puts_since_count = 0
+                if self._entries > self.max_entries:
+                    self._evict(now)
+
+    def _evict(self, now: float):
+        """Drop expired entries first, then least-recently-used ones down to EVICT_TO of max_entries"""
+        expired = self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,)).rowcount
+        self._entries -= expired
+        excess = self._entries - int(self.max_entries * EVICT_TO)
+        lru = 0
+        if excess > 0:
+            lru = self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                (excess,),
+            ).rowcount
+            self._entries -= lru
+        self.evictions += expired + lru
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,344 @@
+"""
+Offline end-to-end load test for the Gemini RAG service (gemini.py).
+
+Starts gemini.py's Flask app in a child process with a fake GenAI client
+(fixed latency + jitter, fixed response size, no network) and drives
+/askai, /generate-content and /generate-hashtags at each concurrency level.
+For every (endpoint, concurrency) it reports throughput and p50/p95/p99
+client latency, and the server-side breakdown from the Server-Timing header:
+encode, retrieval, prompt build and LLM wait (mean per request), plus
+"other" (routing, JSON, logging; total minus the stages).
+
+The encoder is all-MiniLM-L6-v2 loaded from the local Hugging Face cache
+(HF_HUB_OFFLINE=1, nothing is downloaded). --encoder hash swaps in a
+deterministic hashed bag-of-words encoder with the same interface, for
+machines without the model or to take the encoder out of the measurement.
+The LLM response cache is off unless --llm-cache is given, so every request
+reaches the fake client.
+
+Usage:
+    python loadtest.py
+    python loadtest.py --concurrency 1 8 32 --requests 200 --llm-latency 0.8 --response-chars 2000
+    python loadtest.py --endpoints askai --encoder hash --json results.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from request_timing import STAGES, parse_server_timing
+
+ENDPOINTS = ("askai", "generate-content", "generate-hashtags")
+
+QUESTION_TEMPLATES = (
+    "What is going on with {trend}?",
+    "Write a post about {trend} for my audience",
+    "Why is {trend} trending today?",
+    "Give me a caption idea around {trend}",
+    "{trend}",
+)
+
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents, **kwargs):
+        time.sleep(self._client.delay())
+        return _FakeResponse(self._client.reply(contents))
+
+    def generate_content_stream(self, model, contents, **kwargs):
+        text = self._client.reply(contents)
+        chunks = max(1, self._client.stream_chunks)
+        step = max(1, len(text) // chunks)
+        for start in range(0, len(text), step):
+            time.sleep(self._client.delay() / chunks)
+            yield _FakeResponse(text[start:start + step])
+
+
+class _FakeAsyncModels:
+    def __init__(self, client):
+        self._client = client
+
+    async def generate_content(self, model, contents, **kwargs):
+        await asyncio.sleep(self._client.delay())
+        return _FakeResponse(self._client.reply(contents))
+
+    async def generate_content_stream(self, model, contents, **kwargs):
+        text = self._client.reply(contents)
+
+        async def chunks():
+            yield _FakeResponse(text)
+        await asyncio.sleep(self._client.delay())
+        return chunks()
+
+
+class _FakeAio:
+    def __init__(self, client):
+        self.models = _FakeAsyncModels(client)
+
+
+class FakeGenAIClient:
+    """
+    Stands in for google.genai.Client: same models.generate_content(_stream)
+    and aio.models surface, answering after `latency` +- `jitter` seconds with
+    a `response_chars`-long text that starts with five hashtags.
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.05, response_chars: int = 800,
+                 stream_chunks: int = 8, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.response_chars = response_chars
+        self.stream_chunks = stream_chunks
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.aio = _FakeAio(self)
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def reply(self, prompt: str) -> str:
+        digest = hashlib.sha1(str(prompt).encode("utf-8")).hexdigest()
+        text = " ".join(f"#tag{digest[i:i + 6]}" for i in range(0, 30, 6)) + "\n"
+        filler = "This is a synthetic response used for load testing. "
+        return (text + filler * (self.response_chars // len(filler) + 1))[:max(self.response_chars, len(text))]
+
+
+class HashEncoder:
+    """
+    Deterministic stand-in for SentenceTransformer.encode: hashed bag of
+    lowercased words and character trigrams, L2-normalized. Texts sharing
+    words get similar vectors, so retrieval still behaves sensibly.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = re.findall(r"\w+", str(text).lower())
+        features = words + [w[i:i + 3] for w in words for i in range(max(len(w) - 2, 1))]
+        for feature in features:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        vectors = np.stack([self._vector(s) for s in ([sentences] if single else sentences)])
+        return vectors[0] if single else vectors
+
+
+# ---------------------------------------------------------------------------
+# Server (child process)
+# ---------------------------------------------------------------------------
+
+def serve(args):
+    os.environ.setdefault("GEMINI_API_KEY", "loadtest")
+    os.environ["RAG_AUTOSTART"] = "0"
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    if not args.llm_cache:
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+    if args.encoder == "hash":
+        # Hash vectors must not end up in the model's embedding cache
+        os.environ["EMBEDDING_CACHE_DIR"] = tempfile.mkdtemp(prefix="loadtest-embeddings-")
+
+    import gemini
+    from werkzeug.serving import make_server
+
+    gemini.genai_client = FakeGenAIClient(args.llm_latency, args.llm_jitter, args.response_chars)
+    if args.encoder == "hash":
+        gemini.encoder = HashEncoder()
+    gemini.initialize_rag()
+
+    server = make_server("127.0.0.1", args.port, gemini.app, threaded=True)
+    print(f"[loadtest] serving on 127.0.0.1:{args.port} (rag_status={gemini.rag_status})", file=sys.stderr, flush=True)
+    server.serve_forever()
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    command = [
+        sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+        "--encoder", args.encoder, "--llm-latency", str(args.llm_latency),
+        "--llm-jitter", str(args.llm_jitter), "--response-chars", str(args.response_chars),
+    ]
+    if args.llm_cache:
+        command.append("--llm-cache")
+    output = None if args.verbose else subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=output, stderr=output)
+
+
+def wait_ready(base: str, process: subprocess.Popen, timeout: float):
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gemini.py exited during startup (run with --verbose to see why)")
+        try:
+            response = requests.get(f"{base}/health/ready", timeout=1)
+            if response.status_code == 200:
+                return
+            if response.json().get("rag_status") == "failed":
+                raise RuntimeError("RAG failed to load; without a cached all-MiniLM-L6-v2 use --encoder hash")
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Service not ready after {timeout:.0f}s")
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+def load_trend_names(limit: int = 500) -> list:
+    """Trend names to build realistic queries from (twitter_scraper.csv, else synthetic)"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in (os.path.join(here, "twitter_scraper.csv"), os.path.join(os.path.dirname(here), "twitter_scraper.csv")):
+        try:
+            import pandas as pd
+            return pd.read_csv(path)["Trend"].dropna().astype(str).head(limit).tolist()
+        except (OSError, KeyError, ValueError):
+            continue
+    return [f"#trend{i}" for i in range(limit)]
+
+
+def make_payloads(endpoint: str, trends: list, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        trend = rng.choice(trends)
+        if endpoint == "askai":
+            question = rng.choice(QUESTION_TEMPLATES).format(trend=trend)
+            payloads.append({"prompt": question, "content": f"Draft post #{i}"})
+        else:
+            payloads.append({"prompt": f"{trend} {i}"})
+    return payloads
+
+
+def run_level(base: str, endpoint: str, payloads: list, concurrency: int) -> dict:
+    import requests
+    local = threading.local()
+
+    def one(payload):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{base}/{endpoint}", json=payload, timeout=120)
+            ok = response.status_code == 200
+            timings = parse_server_timing(response.headers.get("Server-Timing"))
+        except requests.RequestException:
+            ok, timings = False, {}
+        return time.perf_counter() - started, ok, timings
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, payloads))
+    wall = time.perf_counter() - started
+
+    latencies = np.array([s[0] for s in samples if s[1]])
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "errors": sum(not s[1] for s in samples),
+        "throughput": len(latencies) / wall if wall > 0 else 0.0,
+    }
+    for p in (50, 95, 99):
+        result[f"p{p}"] = float(np.percentile(latencies, p)) if len(latencies) else float("nan")
+    stage_totals = {name: 0.0 for name in STAGES}
+    server_total = 0.0
+    timed = [s[2] for s in samples if s[1] and s[2]]
+    for timings in timed:
+        for name in STAGES:
+            stage_totals[name] += timings.get(name, 0.0)
+        server_total += timings.get("total", 0.0)
+    n = max(len(timed), 1)
+    result["stages"] = {name: total / n for name, total in stage_totals.items()}
+    result["stages"]["other"] = max(server_total / n - sum(result["stages"].values()), 0.0)
+    return result
+
+
+def print_result(result: dict):
+    ms = lambda seconds: f"{seconds * 1000:8.1f}"
+    stages = result["stages"]
+    print(f"{result['endpoint']:<18} {result['concurrency']:>4} {result['requests']:>6} {result['errors']:>4} "
+          f"{result['throughput']:>8.1f} {ms(result['p50'])} {ms(result['p95'])} {ms(result['p99'])}  "
+          + " ".join(ms(stages[name]) for name in (*STAGES, "other")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="Requests per (endpoint, concurrency)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM seconds per call")
+    parser.add_argument("--llm-jitter", type=float, default=0.05)
+    parser.add_argument("--response-chars", type=int, default=800, help="Fake LLM response size")
+    parser.add_argument("--encoder", choices=("model", "hash"), default="model")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache on")
+    parser.add_argument("--port", type=int, default=5077)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the service's own output")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    base = f"http://127.0.0.1:{args.port}"
+    process = start_server(args, args.port)
+    try:
+        wait_ready(base, process, args.startup_timeout)
+        trends = load_trend_names()
+        print(f"encoder={args.encoder}, fake LLM {args.llm_latency * 1000:.0f}+-{args.llm_jitter * 1000:.0f} ms, "
+              f"{args.response_chars} chars, LLM cache {'on' if args.llm_cache else 'off'}\n")
+        print(f"{'endpoint':<18} {'conc':>4} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8}  " + " ".join(f"{name:>8}" for name in (*STAGES, "other")))
+        results = []
+        for endpoint in args.endpoints:
+            # Warm up connections and lazily initialised paths
+            run_level(base, endpoint, make_payloads(endpoint, trends, 4, seed=-1), 2)
+            for level, concurrency in enumerate(args.concurrency):
+                payloads = make_payloads(endpoint, trends, args.requests, seed=level)
+                result = run_level(base, endpoint, payloads, concurrency)
+                results.append(result)
+                print_result(result)
+        print("\nStage columns are mean server-side ms per request (Server-Timing).")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"config": vars(args), "results": results}, f, indent=2)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+In-process metrics for the Gemini RAG service, exposed on /metrics in the
+Prometheus text format (version 0.0.4).
+
+Counters, gauges and histograms with labels, thread-safe and dependency
+free. Hot-path cost is one lock and a bisect per observation.
+
+    LLM_SECONDS.labels(model, "askai").observe(0.84)
+    ERRORS.labels("askai", "TimeoutError").inc()
+    print(render())
+
+Values live in the memory of the process that recorded them. Under gunicorn
+(gunicorn.conf.py) every worker has its own registry and /metrics answers
+with the counters of whichever worker served the scrape, not a total across
+workers: scrape with a single worker, or treat the series as per-process
+samples rather than totals.
+"""
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self._value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value: float):
+        with self._lock:
+            self._value = float(value)
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._upper = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self._upper, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def render(self, name, labelnames, values):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines, cumulative = [], 0
+        for upper, count in zip((*self._upper, float("inf")), counts):
+            cumulative += count
+            le = f'le="{_format_value(upper)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Service metrics --------------------------------------------------------
+
+REQUEST_SECONDS = Histogram(
+    "gemini_request_duration_seconds", "HTTP request duration", ("endpoint", "status"))
+ENCODE_SECONDS = Histogram(
+    "gemini_query_encode_seconds", "Time to encode one query or one batch of queries")
+ENCODE_BATCH_SIZE = Histogram(
+    "gemini_encode_batch_size", "Queries per micro-batched encoder call", (), (1, 2, 4, 8, 16, 32, 64, 128))
+ENCODE_BATCH_FILL = Histogram(
+    "gemini_encode_batch_fill_ratio", "Micro-batch size as a fraction of ENCODE_BATCH_MAX_SIZE", (),
+    (0.05, 0.1, 0.25, 0.5, 0.75, 1.0))
+ENCODE_QUEUE_SECONDS = Histogram(
+    "gemini_encode_queue_seconds", "Time a query waited for its encode micro-batch to start")
+SEARCH_SECONDS = Histogram(
+    "gemini_similarity_topk_seconds", "Similarity scoring and top-k selection per query or batch")
+RETRIEVAL_QUERIES = Counter(
+    "gemini_retrieval_queries_total", "Retrieval queries by path (exact lexical match or encoded)", ("path",))
+LLM_SECONDS = Histogram(
+    "gemini_llm_request_duration_seconds", "Upstream LLM call latency", ("model", "endpoint"))
+PROMPT_CHARS = Histogram(
+    "gemini_llm_prompt_chars", "Prompt size sent upstream, in characters", ("endpoint",), SIZE_BUCKETS)
+RESPONSE_CHARS = Histogram(
+    "gemini_llm_response_chars", "LLM response size, in characters", ("endpoint",), SIZE_BUCKETS)
+LLM_CACHE_HITS = Counter(
+    "gemini_llm_cache_hits_total", "LLM responses served from the local cache", ("endpoint",))
+HASHTAG_ANSWERS = Counter(
+    "gemini_hashtag_answers_total", "/generate-hashtags answers by path (local trend index or LLM)", ("path",))
+ERRORS = Counter(
+    "gemini_errors_total", "Errors by endpoint and exception type", ("endpoint", "type"))
+INDEX_TRENDS = Gauge(
+    "gemini_index_trends", "Trends in the published RAG index")
+INDEX_RELOAD_SECONDS = Histogram(
+    "gemini_index_reload_duration_seconds", "Duration of RAG index (re)builds", ("result",),
+    (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+INDEX_LAST_RELOAD_SECONDS = Gauge(
+    "gemini_index_last_reload_duration_seconds", "Duration of the most recent successful index build")
@@ -0,0 +1,284 @@
+"""
+Pluggable HTML parsing for the scrapers.
+
+Each backend turns a fetched page into the same rows:
+
+    trends24(content)                -> [(trend, count, slot, rank), ...]
+    reels_section(content, heading)  -> [[name, links, explanation], ...] or None
+    trending_songs(content)          -> [{song_name, artist_name, reels_count, ...}, ...]
+
+"bs4" is the reference implementation (BeautifulSoup + html.parser, the
+original scraper code). "lxml" builds the tree in C and jumps straight to
+the needed nodes with XPath; its output is checked against bs4 by
+bench_parse.py. Choose with SCRAPER_PARSER (default "lxml", falling back to
+"bs4" when lxml is not installed).
+"""
+import os
+import re
+import threading
+
+# trends24 list items read "<name><count>", e.g. "#INDvsAUS25K"
+TREND_COUNT_RE = re.compile(r'^(.*?)(\d+(?:[KM]?)$)')
+
+CURRENT_REELS_HEADING = re.compile(r'current-instagram-reels-trends-.*')
+PAST_REELS_HEADING = "past-instagram-reels-trends"
+
+
+def convert_count(text):
+    match = re.search(r'(\d+(?:\.\d+)?)([KM]?)', text)
+    if match:
+        number = float(match.group(1))
+        multiplier = match.group(2)
+        if multiplier == 'K':
+            return int(number * 1_000)
+        elif multiplier == 'M':
+            return int(number * 1_000_000)
+        else:
+            return int(number)
+    return 0
+
+
+def convert_to_numeric(value):
+    try:
+        value = value.upper()
+        if 'K' in value:
+            return int(float(value.replace('K', '').replace(',', '')) * 1000)
+        elif 'M' in value:
+            return int(float(value.replace('M', '').replace(',', '')) * 1000000)
+        else:
+            return int(value.replace(',', ''))
+    except ValueError:
+        return None
+
+
+def split_trend_text(trend_text: str):
+    match = TREND_COUNT_RE.match(trend_text)
+    if match:
+        return match.group(1).strip(), convert_count(match.group(2))
+    return trend_text.strip(), 0
+
+
+def song_row(song_text: str, song_link: str, reels_count_text, description: str, likes: str):
+    """Shared tail of the songs parsers; None when the row is skipped"""
+    if 'instagram.com' not in song_link:
+        return None
+
+    if ' - ' in song_text:
+        song_name, artist_name = song_text.split(' - ', 1)
+    else:
+        song_name = song_text
+        artist_name = "Unknown"
+
+    if reels_count_text is not None:
+        reels_count_text = reels_count_text.replace(',', '').replace('# of Reels:', '').strip()
+        reels_count = convert_to_numeric(reels_count_text)
+
+        if reels_count is None:
+            return None
+    else:
+        reels_count = 0
+
+    return {
+        "song_name": song_name,
+        "artist_name": artist_name,
+        "reels_count": reels_count,
+        "song_link": song_link,
+        "description": description,
+        "likes": likes
+    }
+
+
+def _heading_matches(element_id, heading) -> bool:
+    if element_id is None:
+        return False
+    if isinstance(heading, str):
+        return element_id == heading
+    return heading.search(element_id) is not None
+
+
+class BS4Parser:
+    """Reference backend: BeautifulSoup with the stdlib html.parser"""
+
+    name = "bs4"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = lambda content: BeautifulSoup(content, 'html.parser')
+
+    def trends24(self, content) -> list:
+        soup = self._soup(content)
+        # Each card is one hour (slot 0 = now)
+        points = []
+        for slot, trend_list in enumerate(soup.find_all('ol', class_='trend-card__list')):
+            for rank, trend in enumerate(trend_list.find_all('li')):
+                trend_name, trend_count = split_trend_text(trend.get_text(strip=True))
+                points.append((trend_name, trend_count, slot, rank))
+        return points
+
+    @staticmethod
+    def _trend_info(p_tag):
+        strong = p_tag.find('strong')
+        if strong:
+            trend_name = strong.get_text(strip=True)
+            links = strong.find_all('a', href=True)
+            hrefs = [link['href'] for link in links]
+            explanation = p_tag.get_text(strip=True).replace(trend_name, '', 1).strip()
+            return [trend_name, ','.join(hrefs), explanation]
+        return None
+
+    def reels_section(self, content, heading):
+        soup = self._soup(content)
+        section = soup.find('h2', id=heading)
+        if not section:
+            return None
+        trends = []
+        for sibling in section.find_next_siblings():
+            if sibling.name == 'h2':  # Stop when we hit the next h2
+                break
+            if sibling.name == 'p':
+                trend_info = self._trend_info(sibling)
+                if trend_info:
+                    trends.append(trend_info)
+        return trends
+
+    def trending_songs(self, content) -> list:
+        soup = self._soup(content)
+        songs_data = []
+        song_sections = soup.find_all("li")
+        for i in range(0, len(song_sections), 2):
+            song_info = song_sections[i].find("a")
+            if not song_info:
+                continue
+            song_link = song_info['href']
+            if 'instagram.com' not in song_link:
+                continue
+            reels_count_text = song_sections[i + 1].get_text(strip=True) if i + 1 < len(song_sections) else None
+            paragraph = song_sections[i].find_next("p")
+            description = paragraph.get_text(strip=True) if paragraph else ""
+            likes_element = paragraph.find_next("strong") if paragraph else None
+            likes = likes_element.get_text(strip=True) if likes_element else "N/A"
+            row = song_row(song_info.get_text(strip=True), song_link, reels_count_text, description, likes)
+            if row is not None:
+                songs_data.append(row)
+        return songs_data
+
+
+class LxmlParser:
+    """
+    Fast backend: lxml's HTML parser plus XPath to the needed nodes.
+
+    Text is joined the way bs4's get_text(strip=True) does it: every text
+    node stripped, empty ones dropped, concatenated without a separator.
+
+    Bytes are decoded with the encoding bs4 would pick (UnicodeDammit: BOM,
+    <meta charset>, then UTF-8 / detection); left to itself libxml2 reads a
+    page without a declared charset as Latin-1 and mangles non-ASCII trends.
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        from bs4 import UnicodeDammit
+        from lxml import etree, html
+        self._html = html
+        self._dammit = UnicodeDammit
+        # lxml parser objects must not be shared between threads
+        self._local = threading.local()
+        self._card_lists = etree.XPath(
+            '//ol[contains(concat(" ", normalize-space(@class), " "), " trend-card__list ")]'
+        )
+        self._next_p = etree.XPath('(descendant::p | following::p)[1]')
+        self._next_strong = etree.XPath('(descendant::strong | following::strong)[1]')
+
+    def _tree(self, content):
+        if isinstance(content, str):
+            return self._html.document_fromstring(content)
+        encoding = self._dammit(content, is_html=True).original_encoding
+        parsers = self._local.__dict__.setdefault("parsers", {})
+        if encoding not in parsers:
+            parsers[encoding] = self._html.HTMLParser(encoding=encoding)
+        return self._html.document_fromstring(content, parser=parsers[encoding])
+
+    @staticmethod
+    def _text(element) -> str:
+        # itertext skips comment / processing-instruction text, as bs4 does
+        return "".join(part.strip() for part in element.itertext() if part.strip())
+
+    def trends24(self, content) -> list:
+        tree = self._tree(content)
+        points = []
+        for slot, trend_list in enumerate(self._card_lists(tree)):
+            for rank, trend in enumerate(trend_list.iter('li')):
+                trend_name, trend_count = split_trend_text(self._text(trend))
+                points.append((trend_name, trend_count, slot, rank))
+        return points
+
+    def _trend_info(self, p_tag):
+        strong = next(p_tag.iter('strong'), None)
+        if strong is None:
+            return None
+        trend_name = self._text(strong)
+        hrefs = [link.get('href') for link in strong.iter('a') if link.get('href') is not None]
+        explanation = self._text(p_tag).replace(trend_name, '', 1).strip()
+        return [trend_name, ','.join(hrefs), explanation]
+
+    def reels_section(self, content, heading):
+        tree = self._tree(content)
+        section = next((h2 for h2 in tree.iter('h2') if _heading_matches(h2.get('id'), heading)), None)
+        if section is None:
+            return None
+        trends = []
+        for sibling in section.itersiblings():
+            if not isinstance(sibling.tag, str):
+                continue
+            if sibling.tag == 'h2':  # Stop when we hit the next h2
+                break
+            if sibling.tag == 'p':
+                trend_info = self._trend_info(sibling)
+                if trend_info:
+                    trends.append(trend_info)
+        return trends
+
+    def trending_songs(self, content) -> list:
+        tree = self._tree(content)
+        songs_data = []
+        song_sections = list(tree.iter('li'))
+        for i in range(0, len(song_sections), 2):
+            song_info = next(song_sections[i].iter('a'), None)
+            if song_info is None:
+                continue
+            song_link = song_info.get('href')
+            if song_link is None:
+                raise KeyError('href')
+            if 'instagram.com' not in song_link:
+                continue
+            reels_count_text = self._text(song_sections[i + 1]) if i + 1 < len(song_sections) else None
+            paragraphs = self._next_p(song_sections[i])
+            paragraph = paragraphs[0] if paragraphs else None
+            description = self._text(paragraph) if paragraph is not None else ""
+            likes_elements = self._next_strong(paragraph) if paragraph is not None else []
+            likes = self._text(likes_elements[0]) if likes_elements else "N/A"
+            row = song_row(self._text(song_info), song_link, reels_count_text, description, likes)
+            if row is not None:
+                songs_data.append(row)
+        return songs_data
+
+
+PARSERS = {"bs4": BS4Parser, "lxml": LxmlParser}
+_instances = {}
+
+
+def get_parser(name: str = None):
+    """Parser backend by name (default SCRAPER_PARSER); lxml falls back to bs4 when missing"""
+    name = name or os.getenv("SCRAPER_PARSER", "lxml")
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser backend '{name}'. Choose one of: {', '.join(PARSERS)}")
+    if name not in _instances:
+        try:
+            _instances[name] = PARSERS[name]()
+        except ImportError:
+            if name == "bs4":
+                raise
+            print(f"[page_parsers] {name} is not installed, using bs4")
+            return get_parser("bs4")
+    return _instances[name]
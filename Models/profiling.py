@@ -0,0 +1,257 @@
+"""
+On-demand profiling of live requests (admin only, see /admin/profile in gemini.py).
+
+Arm it for either:
+
+- the next N requests ("requests": N), every one of which is saved, or
+- every request for a while ("threshold_ms": T, "duration_s": S), where only
+  requests slower than T ms are saved (at most "max_traces").
+
+Two profilers:
+
+- "sample" (default): a background thread reads the stacks of the profiled
+  request threads every PROFILE_SAMPLE_INTERVAL_MS (default 5) through
+  sys._current_frames(). Overhead is small enough for threshold mode. It
+  writes <trace>.folded, one "frame;frame;frame count" line per stack, which
+  flamegraph.pl, speedscope or inferno render directly.
+- "cprofile": deterministic cProfile of the request thread, written as
+  <trace>.prof (pstats; snakeviz / flameprof / gprof2dot render it).
+  It only sees the request thread: work handed to a followed thread (see
+  below) shows up as the request waiting on it.
+  Exact call counts, but it slows the profiled requests down noticeably.
+  One request at a time: on Python 3.12+ cProfile is built on the
+  process-wide sys.monitoring, which refuses a second active profiler, so
+  requests arriving while one is profiled are skipped.
+
+Threads that do work on behalf of requests, like the encode batcher that
+runs the sentence encoder, can be followed (follow_thread): while any
+request is sampled, their stacks are sampled too and added to its trace
+under a "[thread name]" root frame.
+
+Traces go to PROFILE_DIR (default Models/.cache/profiles). When disarmed the
+request hooks only check one boolean.
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'profiles')
+PROFILERS = ("sample", "cprofile")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name.replace(";", ":")
+
+
+def _folded_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler:
+    """
+    Samples the stacks of registered threads while at least one is registered.
+
+    Followed threads (by name) are sampled along with them, and each of
+    their stacks is counted in every registered thread's trace.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.followed = set()
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, thread_id: int):
+        with self._lock:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._stacks.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stacks:
+                    self._thread = None
+                    return
+                frames = sys._current_frames()
+                shared = [
+                    f"[{thread.name}];{_folded_stack(frames[thread.ident])}"
+                    for thread in threading.enumerate()
+                    if thread.name in self.followed and thread.ident in frames
+                ] if self.followed else []
+                for thread_id, stacks in self._stacks.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_folded_stack(frame)] += 1
+                    for stack in shared:
+                        stacks[stack] += 1
+            time.sleep(self.interval)
+
+
+class _Session:
+    __slots__ = ("label", "profiler", "thread_id", "started")
+
+    def __init__(self, label: str, profiler, thread_id: int):
+        self.label = label
+        self.profiler = profiler
+        self.thread_id = thread_id
+        self.started = time.perf_counter()
+
+
+class RequestProfiler:
+    """
+    Args:
+        directory: Where traces are written (PROFILE_DIR)
+        sample_interval: Seconds between stack samples (PROFILE_SAMPLE_INTERVAL_MS)
+    """
+
+    def __init__(self, directory: str = None, sample_interval: float = None):
+        self.directory = directory or os.getenv("PROFILE_DIR", DEFAULT_PROFILE_DIR)
+        interval_ms = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+        self._sampler = _Sampler(sample_interval or interval_ms / 1000)
+        self._lock = threading.Lock()
+        # Checked on every request without the lock; everything else only matters when True
+        self.enabled = False
+        self.profiler = "sample"
+        self.remaining = 0
+        self.threshold = None
+        self.expires_at = None
+        self.max_traces = 0
+        self.endpoints = None
+        self.saved = []
+        self._cprofile_active = False
+
+    def follow_thread(self, name: str):
+        """Sample the thread(s) called `name` with every sampled request"""
+        self._sampler.followed.add(name)
+
+    def arm(self, requests: int = None, threshold_ms: float = None, duration_s: float = 300,
+            max_traces: int = 20, profiler: str = "sample", endpoints=None) -> dict:
+        """Profile the next `requests` requests, or requests slower than `threshold_ms` for `duration_s`"""
+        if profiler not in PROFILERS:
+            raise ValueError(f"profiler must be one of: {', '.join(PROFILERS)}")
+        if (requests is None) == (threshold_ms is None):
+            raise ValueError("give exactly one of requests or threshold_ms")
+        with self._lock:
+            self.profiler = profiler
+            self.endpoints = set(endpoints) if endpoints else None
+            if requests is not None:
+                self.remaining, self.threshold, self.max_traces = int(requests), None, int(requests)
+                self.expires_at = None
+            else:
+                self.remaining, self.threshold, self.max_traces = 0, float(threshold_ms) / 1000, int(max_traces)
+                self.expires_at = time.time() + float(duration_s)
+            self.saved = []
+            self.enabled = self.max_traces > 0
+        return self.state()
+
+    def disarm(self) -> dict:
+        with self._lock:
+            self.enabled = False
+        return self.state()
+
+    def state(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "profiler": self.profiler,
+            "mode": "threshold" if self.threshold is not None else "next_requests",
+            "remaining": self.remaining if self.threshold is None else None,
+            "threshold_ms": self.threshold * 1000 if self.threshold is not None else None,
+            "expires_in_s": round(self.expires_at - time.time(), 1) if self.enabled and self.expires_at else None,
+            "max_traces": self.max_traces,
+            "endpoints": sorted(self.endpoints) if self.endpoints else None,
+            "saved": list(self.saved),
+            "directory": self.directory,
+        }
+
+    def start(self, label: str):
+        """Begin profiling the current request; None when it is not selected"""
+        with self._lock:
+            if not self.enabled:
+                return None
+            if self.expires_at is not None and time.time() > self.expires_at:
+                self.enabled = False
+                return None
+            if self.endpoints is not None and label not in self.endpoints:
+                return None
+            if self.threshold is None and self.remaining <= 0:
+                return None
+            use_cprofile = self.profiler == "cprofile"
+            if use_cprofile:
+                if self._cprofile_active:
+                    return None
+                self._cprofile_active = True
+            if self.threshold is None:
+                self.remaining -= 1
+                if self.remaining == 0:
+                    self.enabled = False
+        thread_id = threading.get_ident()
+        if use_cprofile:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Another profiling tool (debugger, coverage) holds sys.monitoring
+                print(f"[profile] Skipping {label}: {e}")
+                with self._lock:
+                    self._cprofile_active = False
+                return None
+            return _Session(label, profile, thread_id)
+        self._sampler.add(thread_id)
+        return _Session(label, None, thread_id)
+
+    def stop(self, session: _Session):
+        """Finish a session and save its trace if it qualifies"""
+        if session.profiler is not None:
+            session.profiler.disable()
+            with self._lock:
+                self._cprofile_active = False
+            stacks = None
+        else:
+            stacks = self._sampler.remove(session.thread_id)
+        elapsed = time.perf_counter() - session.started
+
+        with self._lock:
+            if self.threshold is not None:
+                if elapsed < self.threshold or len(self.saved) >= self.max_traces:
+                    return None
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}_" \
+                   f"{re.sub(r'[^A-Za-z0-9_-]+', '_', session.label)}_{elapsed * 1000:.0f}ms"
+            self.saved.append(name)
+            if self.threshold is not None and len(self.saved) >= self.max_traces:
+                self.enabled = False
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        if session.profiler is not None:
+            session.profiler.dump_stats(path + ".prof")
+            path += ".prof"
+        else:
+            with open(path + ".folded", "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            path += ".folded"
+        print(f"[profile] {session.label} took {elapsed * 1000:.0f} ms, trace saved to {path}")
+        return path
+
+    def traces(self) -> list:
+        try:
+            return sorted(f for f in os.listdir(self.directory) if f.endswith((".prof", ".folded")))
+        except OSError:
+            return []
@@ -0,0 +1,75 @@
+"""
+Per-request stage timings, reported in a Server-Timing response header.
+
+A request opens a timing scope with begin(); code on the hot path wraps its
+stages in `with stage("encode"):`. Time accumulates per stage name, so a
+stage entered twice (e.g. retrieval before and after the encode) is summed.
+Outside a request scope stage() only reads the clock twice.
+
+The scope is a ContextVar holding a mutable dict, so work handed to another
+thread with contextvars.copy_context().run() reports into the same request.
+
+    Server-Timing: encode;dur=4.81, retrieval;dur=0.62, prompt;dur=0.04, llm;dur=201.3, total;dur=207.2
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+# Stages of the RAG hot path, in the order they run
+STAGES = ("encode", "retrieval", "prompt", "llm")
+
+_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def begin() -> dict:
+    """Start a timing scope for the current request and return its {stage: seconds} dict"""
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+def current() -> dict:
+    """{stage: seconds} of the current request, or None outside a timing scope"""
+    return _timings.get()
+
+
+def record(name: str, seconds: float):
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str, histogram=None):
+    """Time a block into the request's `name` stage (and into `histogram`, if given)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        record(name, elapsed)
+        if histogram is not None:
+            histogram.observe(elapsed)
+
+
+def server_timing_header(timings: dict, total: float = None) -> str:
+    """Server-Timing value with durations in milliseconds"""
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def parse_server_timing(value: str) -> dict:
+    """{name: seconds} from a Server-Timing header value (the inverse of server_timing_header)"""
+    timings = {}
+    for part in (value or "").split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, duration = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    timings[name] = float(duration) / 1000
+                except ValueError:
+                    pass
+    return timings
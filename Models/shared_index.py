@@ -0,0 +1,209 @@
+"""
+Trend index shared by several worker processes (SHARED_INDEX=1).
+
+One process builds a snapshot and publishes it to SHARED_INDEX_DIR (default
+Models/.cache/shared_index):
+
+    <dir>/<snapshot id>/trends.pkl        dataframe, texts, build stats and cluster variants
+    <dir>/<snapshot id>/embeddings.npy    L2-normalized float32 embeddings
+    <dir>/<snapshot id>/clusters.*.npy    trend clusters: labels, centroids, canonical rows, counts
+    <dir>/<snapshot id>/ivf.*.npy         IVF centroids and list storage (TREND_INDEX_BACKEND=ivf)
+    <dir>/<snapshot id>/index.hnsw.bin    HNSW graph (TREND_INDEX_BACKEND=hnsw)
+    <dir>/CURRENT                         id of the live snapshot (atomic rename)
+
+Every worker memory-maps the .npy files read-only, so all of them share one
+copy of the embeddings, cluster centroids and IVF lists through the page
+cache; the flat backend searches the mapped matrix directly. With a
+quantized TREND_INDEX_BACKEND (fp16/int8) no embeddings.npy is written: the
+saved vector index already holds the float32 vectors and is mapped the same
+way.
+
+What stays per worker: the unpickled dataframe and texts, the BM25 lexical
+index and the per-row columns derived from them (all proportional to the
+trend names, not to rows x embedding dim), and with the hnsw backend the
+whole graph, since hnswlib loads an index into process memory and cannot
+search a memory map. Use flat, ivf or a quantized backend when memory per
+worker matters.
+
+Replacing CURRENT is the reload signal. A watcher thread in each worker
+polls it (SHARED_INDEX_POLL_S, default 1) and swaps the new snapshot in, so
+all workers move to a reload within about one poll interval. Builds take an
+flock on <dir>/.lock, so only one process encodes at a time; the others
+find the result already published.
+"""
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from trend_clusters import TrendClusters
+from trend_index import TrendIndex
+from vector_index import QUANTIZED_BACKENDS, FlatIndex, HNSWIndex, IVFIndex, map_npy
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process build lock
+    fcntl = None
+
+SHARED_INDEX_DIR = os.getenv(
+    "SHARED_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'shared_index')
+)
+POLL_SECONDS = float(os.getenv("SHARED_INDEX_POLL_S", "1.0"))
+# Published snapshots kept on disk besides CURRENT; workers still mapping an
+# older one keep its pages until they swap (POSIX unlink semantics)
+KEEP_SNAPSHOTS = 3
+
+
+def _current_path() -> str:
+    return os.path.join(SHARED_INDEX_DIR, "CURRENT")
+
+
+@contextmanager
+def build_lock():
+    """Exclusive across processes for the duration of a build and publish"""
+    os.makedirs(SHARED_INDEX_DIR, exist_ok=True)
+    with open(os.path.join(SHARED_INDEX_DIR, ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def published_id():
+    """Id of the live published snapshot, or None"""
+    try:
+        with open(_current_path()) as f:
+            return json.load(f)["id"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def publish(index: TrendIndex) -> str:
+    """Write `index` as a new snapshot and point CURRENT at it"""
+    snapshot_id = f"{time.time_ns()}-{index.version}"
+    directory = os.path.join(SHARED_INDEX_DIR, snapshot_id)
+    os.makedirs(directory)
+    backend = index.vector_index.backend
+    variants = index.clusters.variants if index.clusters is not None else None
+    with open(os.path.join(directory, "trends.pkl"), "wb") as f:
+        pickle.dump({"df": index.df, "texts": list(index.texts), "stats": index.stats, "backend": backend,
+                     "cluster_variants": variants, "nprobe": getattr(index.vector_index, "nprobe", None)},
+                    f, protocol=pickle.HIGHEST_PROTOCOL)
+    if backend not in QUANTIZED_BACKENDS:
+        np.save(os.path.join(directory, "embeddings.npy"), np.asarray(index.embeddings))
+    if index.clusters is not None:
+        index.clusters.save_npy(directory)
+    if backend == "ivf":
+        index.vector_index.save_npy(directory)
+    elif backend == "hnsw":
+        index.vector_index.save(os.path.join(directory, "index.hnsw.bin"))
+
+    tmp_path = f"{_current_path()}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"id": snapshot_id, "version": index.version, "pid": os.getpid(), "published_at": time.time()}, f)
+    os.replace(tmp_path, _current_path())
+    index.snapshot_id = snapshot_id
+    _prune(keep={snapshot_id})
+    print(f"[shared_index] Published snapshot {snapshot_id} ({len(index)} trends)")
+    return snapshot_id
+
+
+def load(snapshot_id: str) -> TrendIndex:
+    """Open a published snapshot; its arrays are memory-mapped, not copied"""
+    directory = os.path.join(SHARED_INDEX_DIR, snapshot_id)
+    with open(os.path.join(directory, "trends.pkl"), "rb") as f:
+        data = pickle.load(f)
+    backend = data["backend"]
+    embeddings_path = os.path.join(directory, "embeddings.npy")
+    embeddings = map_npy(embeddings_path) if os.path.exists(embeddings_path) else None
+    # Workers take the publisher's clustering and search index instead of building them again
+    clusters = None
+    if data.get("cluster_variants") is not None:
+        clusters = TrendClusters.map(directory, data["cluster_variants"])
+    vector_index = None
+    if backend == "flat":
+        vector_index = FlatIndex(embeddings.shape[1]).build(clusters.centroids if clusters is not None else embeddings)
+    elif backend == "ivf":
+        vector_index = IVFIndex.map(directory, nprobe=data.get("nprobe"))
+    elif backend == "hnsw":
+        vector_index = HNSWIndex.load(os.path.join(directory, "index.hnsw.bin"))
+    index = TrendIndex(data["df"], data["texts"], embeddings, data["stats"], backend=backend, normalized=True,
+                       clustering=clusters is not None, clusters=clusters, vector_index=vector_index)
+    index.snapshot_id = snapshot_id
+    return index
+
+
+def load_published(skip: str = None):
+    """The published snapshot unless it is `skip` (the caller's live one); None if absent or unreadable"""
+    snapshot_id = published_id()
+    if snapshot_id is None or snapshot_id == skip:
+        return None
+    try:
+        return load(snapshot_id)
+    except Exception as e:
+        print(f"[shared_index] Ignoring unreadable snapshot {snapshot_id}: {e}")
+        return None
+
+
+def _prune(keep: set):
+    try:
+        names = [name for name in os.listdir(SHARED_INDEX_DIR)
+                 if os.path.isdir(os.path.join(SHARED_INDEX_DIR, name)) and name not in keep]
+    except OSError:
+        return
+    names.sort(reverse=True)  # ids start with a nanosecond timestamp
+    for stale in names[KEEP_SNAPSHOTS - len(keep):]:
+        shutil.rmtree(os.path.join(SHARED_INDEX_DIR, stale), ignore_errors=True)
+
+
+class Watcher:
+    """
+    Polls CURRENT and hands newly published snapshots to `on_snapshot`.
+
+    Args:
+        live_id: Returns the snapshot id this process is serving
+        on_snapshot: Called with the loaded TrendIndex of a new snapshot
+    """
+
+    def __init__(self, live_id, on_snapshot, interval: float = None):
+        self.live_id = live_id
+        self.on_snapshot = on_snapshot
+        self.interval = interval or POLL_SECONDS
+        self._pid = None
+        self._mtime = None
+
+    def start(self):
+        """Start polling in this process; threads do not survive fork, so each worker calls this"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name="shared-index-watcher", daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[shared_index] Watcher error: {e}")
+
+    def check(self):
+        try:
+            mtime = os.stat(_current_path()).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        index = load_published(skip=self.live_id())
+        if index is not None:
+            self.on_snapshot(index)
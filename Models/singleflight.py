@@ -0,0 +1,120 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight block until it finishes and receive the same
+    result or exception.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.collapsed = 0
+        self.max_waiters = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.collapsed += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._calls)
+        total = self.leaders + self.collapsed
+        return {
+            "upstream_calls": self.leaders,
+            "collapsed_calls": self.collapsed,
+            "collapse_rate": round(self.collapsed / total, 4) if total else 0.0,
+            "max_waiters": self.max_waiters,
+            "in_flight": in_flight,
+        }
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight for coroutines on one event loop.
+
+    The call runs as its own task that the leader and the followers all await
+    through asyncio.shield, so a cancelled caller (e.g. a disconnected client,
+    leader included) never cancels the call the others are waiting on.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.collapsed = 0
+        self.max_waiters = 0
+        self._waiters = {}
+
+    async def do(self, key, coro_fn):
+        task = self._calls.get(key)
+        if task is not None:
+            self.collapsed += 1
+            self._waiters[key] += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(coro_fn())
+        self._calls[key] = task
+        self._waiters[key] = 0
+        self.leaders += 1
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            # Mark retrieved so an exception nobody waits on is not logged as unhandled
+            task.exception()
+
+    def stats(self) -> dict:
+        total = self.leaders + self.collapsed
+        return {
+            "upstream_calls": self.leaders,
+            "collapsed_calls": self.collapsed,
+            "collapse_rate": round(self.collapsed / total, 4) if total else 0.0,
+            "max_waiters": self.max_waiters,
+            "in_flight": len(self._calls),
+        }
@@ -9,7 +9,6 @@ MODULES = [
     "pandas",
     "numpy",
     "sentence_transformers",
-    "sklearn.metrics.pairwise",
 ]
 
 
@@ -39,7 +38,7 @@ if __name__ == "__main__":
         print(
             "\nOne or more imports FAILED.\n"
             "Install the missing packages, for example (from the project root):\n"
-            "    pip install flask flask-cors google-genai python-dotenv pandas numpy sentence-transformers scikit-learn\n"
+            "    pip install flask flask-cors google-genai python-dotenv pandas numpy sentence-transformers\n"
         )
         sys.exit(1)
 
@@ -0,0 +1,146 @@
+"""embedding_cache.EmbeddingCache: persistence, the LRU cap and the legacy .npz format"""
+import json
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+from embedding_cache import EmbeddingCache
+
+DIM = 4
+
+
+class CountingEncoder:
+    """Deterministic vectors per text; records what it was asked to encode"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=64, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.array([self.vector(t) for t in texts], dtype=np.float32)
+
+    @staticmethod
+    def vector(text):
+        return np.random.default_rng(zlib.crc32(text.encode("utf-8"))).normal(size=DIM).astype(np.float32)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "embeddings")
+
+
+def _texts(n, prefix="trend"):
+    return [f"{prefix} {i}" for i in range(n)]
+
+
+def test_encodes_only_misses(cache_dir):
+    encoder = CountingEncoder()
+    cache = EmbeddingCache("model", cache_dir=cache_dir)
+    first = cache.encode(encoder, ["a", "b", "a"])
+    second = cache.encode(encoder, ["b", "c"])
+    assert encoder.calls == [["a", "b"], ["c"]]
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(first[1], second[0])
+    # A text repeated within one call is encoded once and counted as one miss
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_round_trip_and_incremental_saves(cache_dir):
+    encoder = CountingEncoder()
+    cache = EmbeddingCache("model", cache_dir=cache_dir)
+    expected = cache.encode(encoder, _texts(5))
+    cache.save()
+    cache.encode(encoder, _texts(3, "new"))
+    cache.save()
+
+    reloaded = EmbeddingCache("model", cache_dir=cache_dir)
+    assert len(reloaded) == 8
+    encoder.calls.clear()
+    np.testing.assert_array_equal(reloaded.encode(encoder, _texts(5)), expected)
+    assert encoder.calls == []
+    with open(os.path.join(reloaded.directory, "meta.json")) as f:
+        assert json.load(f)["rows"] == 8
+    assert os.path.getsize(os.path.join(reloaded.directory, "vectors.f32")) == 8 * DIM * 4
+
+
+def test_models_do_not_share_entries(cache_dir):
+    encoder = CountingEncoder()
+    EmbeddingCache("model-a", cache_dir=cache_dir).encode(encoder, ["a"])
+    cache = EmbeddingCache("model-b", cache_dir=cache_dir)
+    cache.encode(encoder, ["a"])
+    assert encoder.calls == [["a"], ["a"]]
+
+
+def test_rows_past_the_committed_count_are_ignored(cache_dir):
+    cache = EmbeddingCache("model", cache_dir=cache_dir)
+    cache.encode(CountingEncoder(), _texts(4))
+    cache.save()
+    # An interrupted append: bytes written after the rows meta.json commits
+    with open(os.path.join(cache.directory, "vectors.f32"), "ab") as f:
+        f.write(b"\x00" * 10)
+    with open(os.path.join(cache.directory, "keys.bin"), "ab") as f:
+        f.write(b"\x01" * 7)
+
+    reloaded = EmbeddingCache("model", cache_dir=cache_dir)
+    assert len(reloaded) == 4
+    reloaded.encode(CountingEncoder(), ["later"])
+    reloaded.save()
+    assert len(EmbeddingCache("model", cache_dir=cache_dir)) == 5
+
+
+def test_cap_is_enforced_on_save_keeping_recent_entries(cache_dir):
+    encoder = CountingEncoder()
+    cache = EmbeddingCache("model", cache_dir=cache_dir, max_entries=5)
+    cache.encode(encoder, _texts(5))
+    cache.save()
+    cache.encode(encoder, _texts(4, "new"))
+    cache.touch(["trend 0"])
+    # Not compacted until the next save
+    assert len(cache) == 9
+
+    cache.save()
+    assert len(cache) == 5
+    reloaded = EmbeddingCache("model", cache_dir=cache_dir, max_entries=5)
+    encoder.calls.clear()
+    reloaded.encode(encoder, ["trend 0", "new 0", "new 3", "trend 1", "trend 4"])
+    # The touched and the newest entries survive; the least recently used are gone
+    assert encoder.calls == [["trend 1", "trend 4"]]
+
+
+def test_no_compaction_within_the_slack(cache_dir):
+    cache = EmbeddingCache("model", cache_dir=cache_dir, max_entries=8)
+    cache.encode(CountingEncoder(), _texts(8))
+    cache.save()
+    # Up to COMPACT_SLACK past the cap, saves only append
+    cache.encode(CountingEncoder(), _texts(2, "new"))
+    cache.save()
+    assert len(EmbeddingCache("model", cache_dir=cache_dir, max_entries=8)) == 10
+
+
+def test_legacy_npz_is_migrated(cache_dir):
+    encoder = CountingEncoder()
+    legacy = EmbeddingCache("model", cache_dir=cache_dir)
+    texts = _texts(3)
+    keys = np.array([legacy.key_for(t) for t in texts], dtype="S20")
+    vectors = np.array([encoder.vector(t) for t in texts], dtype=np.float32)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(legacy.legacy_path, keys=keys, vectors=vectors)
+
+    cache = EmbeddingCache("model", cache_dir=cache_dir)
+    assert len(cache) == 3
+    np.testing.assert_array_equal(cache.encode(encoder, texts), vectors)
+    assert encoder.calls == []
+    cache.save()
+    assert not os.path.exists(cache.legacy_path)
+    assert len(EmbeddingCache("model", cache_dir=cache_dir)) == 3
+
+
+def test_unreadable_cache_starts_empty(cache_dir):
+    cache = EmbeddingCache("model", cache_dir=cache_dir)
+    cache.encode(CountingEncoder(), _texts(2))
+    cache.save()
+    with open(os.path.join(cache.directory, "meta.json"), "w") as f:
+        f.write("{not json")
+    assert len(EmbeddingCache("model", cache_dir=cache_dir)) == 0
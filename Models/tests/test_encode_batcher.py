@@ -0,0 +1,94 @@
+"""encode_batcher.EncodeBatcher: batching across threads, errors and the batch cut-offs"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from encode_batcher import EncodeBatcher
+
+
+class GatedEncoder:
+    """Records each batch; the first batch blocks until `release` is set"""
+
+    def __init__(self, error: Exception = None):
+        self.batches = []
+        self.release = threading.Event()
+        self.error = error
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if len(self.batches) == 1:
+            self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text))] for text in texts]
+
+
+def _encode_while_busy(batcher, encoder, texts):
+    """
+    Submit texts[0], then the rest while its batch is still encoding.
+
+    Returns the futures of batcher.encode for every text.
+    """
+    pool = ThreadPoolExecutor(max_workers=len(texts))
+    futures = [pool.submit(batcher.encode, texts[0])]
+    while not encoder.batches:
+        time.sleep(0.001)
+    futures += [pool.submit(batcher.encode, text) for text in texts[1:]]
+    while len(batcher._queue) < len(texts) - 1:
+        time.sleep(0.001)
+    encoder.release.set()
+    pool.shutdown(wait=True)
+    return futures
+
+
+def test_queries_from_many_threads_share_a_batch():
+    encoder = GatedEncoder()
+    batcher = EncodeBatcher(encoder, max_batch_size=32, max_wait=0.001)
+    texts = ["a", "bb", "ccc", "dddd", "eeeee", "ffffff"]
+    futures = _encode_while_busy(batcher, encoder, texts)
+    # Each caller gets its own vector back
+    assert [f.result() for f in futures] == [[float(len(t))] for t in texts]
+    assert [len(batch) for batch in encoder.batches] == [1, 5]
+    stats = batcher.stats()
+    assert (stats["batches"], stats["queries"], stats["largest_batch"]) == (2, 6, 5)
+
+
+def test_max_batch_size_splits_the_queue():
+    encoder = GatedEncoder()
+    batcher = EncodeBatcher(encoder, max_batch_size=3, max_wait=0.001)
+    futures = _encode_while_busy(batcher, encoder, [f"q{i}" for i in range(8)])
+    assert all(f.result() == [2.0] for f in futures)
+    assert [len(batch) for batch in encoder.batches] == [1, 3, 3, 1]
+
+
+def test_error_reaches_every_query_in_the_batch():
+    encoder = GatedEncoder(error=RuntimeError("model crashed"))
+    batcher = EncodeBatcher(encoder, max_batch_size=32, max_wait=0.001)
+    futures = _encode_while_busy(batcher, encoder, ["a", "b", "c", "d"])
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result()
+    # The worker thread survives a failed batch
+    encoder.error = None
+    assert batcher.encode("again") == [5.0]
+
+
+def test_lone_query_waits_for_its_window():
+    batcher = EncodeBatcher(lambda texts: [[0.0]] * len(texts), max_batch_size=32, max_wait=0.1)
+    started = time.perf_counter()
+    batcher.encode("alone")
+    assert time.perf_counter() - started >= 0.1
+
+
+def test_full_batch_does_not_wait_for_the_window():
+    encoder = GatedEncoder()
+    encoder.release.set()
+    batcher = EncodeBatcher(encoder, max_batch_size=2, max_wait=5.0)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(batcher.encode, ["x", "yy"]))
+    assert results == [[1.0], [2.0]]
+    assert time.perf_counter() - started < 2.5
+    assert [len(batch) for batch in encoder.batches] == [2]
@@ -0,0 +1,117 @@
+"""Conditional GETs of fetch.Fetcher against a local stub server"""
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetch import Fetcher
+
+
+class StubSite:
+    """Serves `pages` with an ETag and Last-Modified and answers matching validators with 304"""
+
+    def __init__(self):
+        self.pages = {"/page/": b"<html>v1</html>"}
+        self.last_modified = "Mon, 05 Jan 2026 10:00:00 GMT"
+        self.requests = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = site.pages[self.path]
+                etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                site.requests.append(dict(self.headers))
+                status = 304 if self.headers.get("If-None-Match") == etag else 200
+                self.send_response(status)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", site.last_modified)
+                self.send_header("Content-Length", str(len(body) if status == 200 else 0))
+                self.end_headers()
+                if status == 200:
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/page/"
+
+
+@pytest.fixture
+def site():
+    stub = StubSite()
+    yield stub
+    stub.server.shutdown()
+
+
+@pytest.fixture
+def make_fetcher(tmp_path):
+    fetchers = []
+
+    def make():
+        fetcher = Fetcher(max_workers=2, validators_path=str(tmp_path / "validators.json"), retries=0)
+        fetchers.append(fetcher)
+        return fetcher
+
+    yield make
+    for fetcher in fetchers:
+        fetcher.close()
+
+
+def test_second_fetch_after_commit_is_not_modified(site, make_fetcher):
+    fetcher = make_fetcher()
+    first = fetcher.fetch(site.url, namespace="test")
+    assert first.status == 200 and first.content == b"<html>v1</html>"
+    fetcher.commit(site.url, namespace="test")
+
+    second = fetcher.fetch(site.url, namespace="test")
+    assert second.ok and second.not_modified and second.status == 304
+    assert site.requests[-1]["If-None-Match"] == '"' + hashlib.sha1(b"<html>v1</html>").hexdigest()[:16] + '"'
+    assert site.requests[-1]["If-Modified-Since"] == site.last_modified
+    assert fetcher.stats() == {"fetched": 1, "not_modified": 1, "failed": 0}
+
+
+def test_uncommitted_page_is_fetched_again(site, make_fetcher):
+    fetcher = make_fetcher()
+    assert fetcher.fetch(site.url, namespace="test").status == 200
+    # The caller failed to store the page and did not commit
+
+    again = fetcher.fetch(site.url, namespace="test")
+    assert again.status == 200 and not again.not_modified
+    assert again.content == b"<html>v1</html>"
+    assert "If-None-Match" not in site.requests[-1]
+
+
+def test_changed_page_is_refetched(site, make_fetcher):
+    fetcher = make_fetcher()
+    fetcher.fetch(site.url, namespace="test")
+    fetcher.commit(site.url, namespace="test")
+
+    site.pages["/page/"] = b"<html>v2</html>"
+    changed = fetcher.fetch(site.url, namespace="test")
+    assert changed.status == 200 and changed.content == b"<html>v2</html>"
+    fetcher.commit(site.url, namespace="test")
+
+    assert fetcher.fetch(site.url, namespace="test").not_modified
+
+
+def test_committed_validators_survive_restart(site, make_fetcher):
+    fetcher = make_fetcher()
+    fetcher.fetch(site.url, namespace="test")
+    fetcher.commit(site.url, namespace="test")
+
+    restarted = make_fetcher()
+    assert restarted.fetch(site.url, namespace="test").not_modified
+    # Validators are kept per namespace
+    assert restarted.fetch(site.url, namespace="other").status == 200
+
+
+def test_commit_without_fetch_is_a_no_op(site, make_fetcher, tmp_path):
+    fetcher = make_fetcher()
+    fetcher.commit(site.url, namespace="test")
+    assert not (tmp_path / "validators.json").exists()
+    assert fetcher.fetch(site.url, namespace="test").status == 200
@@ -0,0 +1,96 @@
+"""llm_cache.LLMResponseCache: hits, key normalization, TTL and the size cap"""
+import itertools
+import sqlite3
+import time
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "responses.sqlite3")
+
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def test_hit_and_miss(db_path):
+    cache = LLMResponseCache(db_path, ttl_seconds=60, max_entries=10)
+    assert cache.get("gemini", "what is trending?", "v1") is None
+    cache.put("gemini", "what is trending?", "cricket", "v1")
+    assert cache.get("gemini", "what is trending?", "v1") == "cricket"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_key_includes_model_and_snapshot_version(db_path):
+    cache = LLMResponseCache(db_path, ttl_seconds=60, max_entries=10)
+    cache.put("gemini", "prompt", "answer", "v1")
+    assert cache.get("gemini", "prompt", "v2") is None
+    assert cache.get("other-model", "prompt", "v1") is None
+
+
+def test_whitespace_is_normalized(db_path):
+    cache = LLMResponseCache(db_path, ttl_seconds=60, max_entries=10)
+    cache.put("gemini", "top  trends\n in India", "answer")
+    assert cache.get("gemini", "  top trends in\tIndia ") == "answer"
+    assert cache.get("gemini", "top trends in india") is None
+
+
+def test_expired_entries_miss(db_path, monkeypatch):
+    cache = LLMResponseCache(db_path, ttl_seconds=10, max_entries=10)
+    now = time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now)
+    cache.put("gemini", "prompt", "answer")
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 11)
+    assert cache.get("gemini", "prompt") is None
+
+
+def test_entries_persist_across_instances(db_path):
+    LLMResponseCache(db_path, ttl_seconds=60, max_entries=10).put("gemini", "prompt", "answer")
+    cache = LLMResponseCache(db_path, ttl_seconds=60, max_entries=10)
+    assert cache.stats()["entries"] == 1
+    assert cache.get("gemini", "prompt") == "answer"
+
+
+def test_size_cap_evicts_least_recently_used(db_path, monkeypatch):
+    # A clock that always advances, so access times never tie
+    clock = itertools.count(time.time())
+    monkeypatch.setattr(llm_cache.time, "time", lambda: next(clock))
+    cache = LLMResponseCache(db_path, ttl_seconds=60, max_entries=10)
+    for i in range(10):
+        cache.put("gemini", f"prompt {i}", f"answer {i}")
+    # Keep the oldest entry warm so the LRU eviction skips it
+    assert cache.get("gemini", "prompt 0") == "answer 0"
+    cache.put("gemini", "prompt 10", "answer 10")
+    # Over the cap: trimmed to EVICT_TO of max_entries, least recently used first
+    assert _rows(db_path) == cache.stats()["entries"] == int(10 * llm_cache.EVICT_TO)
+    assert cache.stats()["evictions"] == 11 - int(10 * llm_cache.EVICT_TO)
+    assert cache.get("gemini", "prompt 0") == "answer 0"
+    assert cache.get("gemini", "prompt 10") == "answer 10"
+    assert cache.get("gemini", "prompt 1") is None
+
+
+def test_size_cap_holds_under_many_inserts(db_path):
+    cache = LLMResponseCache(db_path, ttl_seconds=60, max_entries=20)
+    for i in range(500):
+        cache.put("gemini", f"prompt {i}", "answer")
+        assert _rows(db_path) <= 20
+
+
+def test_expired_entries_are_evicted_first(db_path, monkeypatch):
+    cache = LLMResponseCache(db_path, ttl_seconds=10, max_entries=4)
+    now = time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now)
+    for i in range(3):
+        cache.put("gemini", f"old {i}", "answer")
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 11)
+    cache.put("gemini", "new 0", "answer")
+    cache.put("gemini", "new 1", "answer")
+    assert cache.stats()["evictions"] == 3
+    assert _rows(db_path) == 2
@@ -0,0 +1,32 @@
+"""The lxml parser backend returns exactly what the bs4 reference returns"""
+import pytest
+
+from bench_parse import KINDS, non_ascii_fixtures, parse_page, synthetic_fixtures
+from page_parsers import get_parser
+
+pytest.importorskip("lxml")
+
+
+def _pages(fixtures):
+    return [(kind, i, page) for kind in KINDS for i, page in enumerate(fixtures[kind])]
+
+
+@pytest.mark.parametrize("kind, i, page", _pages(synthetic_fixtures(regions=2)))
+def test_lxml_matches_bs4(kind, i, page):
+    assert parse_page(get_parser("lxml"), kind, page) == parse_page(get_parser("bs4"), kind, page)
+
+
+@pytest.mark.parametrize("kind, i, page", _pages(non_ascii_fixtures()))
+def test_non_ascii_pages_decode_the_same(kind, i, page):
+    assert parse_page(get_parser("lxml"), kind, page) == parse_page(get_parser("bs4"), kind, page)
+
+
+def test_utf8_page_without_charset_keeps_names():
+    utf8_page = non_ascii_fixtures()["trends24"][0]
+    names = [row[0] for row in get_parser("lxml").trends24(utf8_page)]
+    assert names == ["#शिवजी_की_समर्थता", "Café Müller", "Año Nuevo 🎉", "#ТрендДня"]
+
+
+def test_declared_charset_is_honoured():
+    latin_page = non_ascii_fixtures()["trends24"][1]
+    assert get_parser("lxml").trends24(latin_page) == [("Café Müller", 12000, 0, 0), ("Año Nuevo", 3000, 0, 1)]
@@ -0,0 +1,63 @@
+"""cProfile sessions and followed threads of profiling.RequestProfiler"""
+import threading
+import time
+
+import profiling
+from encode_batcher import EncodeBatcher
+from profiling import RequestProfiler
+
+
+def _start_in_thread(profiler, label):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("session", profiler.start(label)))
+    thread.start()
+    thread.join()
+    return result["session"]
+
+
+def test_one_cprofile_session_at_a_time(tmp_path):
+    profiler = RequestProfiler(directory=str(tmp_path))
+    profiler.arm(requests=3, profiler="cprofile")
+    first = profiler.start("askai")
+    assert first is not None
+    # A concurrent request is skipped and does not use up one of the armed requests
+    assert _start_in_thread(profiler, "askai") is None
+    assert profiler.state()["remaining"] == 2
+    assert profiler.stop(first).endswith(".prof")
+    second = profiler.start("askai")
+    assert second is not None
+    profiler.stop(second)
+
+
+def test_enable_error_skips_the_request(tmp_path, monkeypatch):
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, "Profile", BusyProfile)
+    profiler = RequestProfiler(directory=str(tmp_path))
+    profiler.arm(threshold_ms=0, duration_s=60, profiler="cprofile")
+    assert profiler.start("askai") is None
+    # The slot is released, so a later request can be profiled again
+    monkeypatch.undo()
+    session = profiler.start("askai")
+    assert session is not None
+    profiler.stop(session)
+
+
+def test_sampled_trace_includes_followed_thread(tmp_path):
+    def slow_encode(texts):
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+        return [[0.0]] * len(texts)
+
+    batcher = EncodeBatcher(slow_encode, max_wait=0)
+    profiler = RequestProfiler(directory=str(tmp_path), sample_interval=0.002)
+    profiler.follow_thread(batcher.thread_name)
+    profiler.arm(requests=1)
+    session = profiler.start("askai")
+    batcher.encode("query")
+    with open(profiler.stop(session), encoding="utf-8") as f:
+        stacks = f.read()
+    assert any(line.startswith("[encode-batcher];") and "slow_encode" in line for line in stacks.splitlines())
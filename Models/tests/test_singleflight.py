@@ -0,0 +1,144 @@
+"""singleflight.SingleFlight and AsyncSingleFlight"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def _run_concurrently(flight, key, fn, release, callers):
+    """
+    Futures of `callers` threads calling flight.do(key, fn) at once.
+
+    fn must block on `release`, which is set once every follower is waiting.
+    """
+    pool = ThreadPoolExecutor(max_workers=callers)
+    futures = [pool.submit(flight.do, key, fn)]
+    while flight.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    futures += [pool.submit(flight.do, key, fn) for _ in range(callers - 1)]
+    while flight.collapsed < callers - 1:
+        time.sleep(0.001)
+    release.set()
+    pool.shutdown(wait=True)
+    return futures
+
+
+def test_concurrent_calls_collapse_into_one():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait()
+        return "answer"
+
+    futures = _run_concurrently(flight, "key", fn, release, callers=5)
+    assert [f.result() for f in futures] == ["answer"] * 5
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert (stats["upstream_calls"], stats["collapsed_calls"], stats["max_waiters"]) == (1, 4, 4)
+    assert stats["in_flight"] == 0
+
+
+def test_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait()
+        raise TimeoutError("upstream timed out")
+
+    futures = _run_concurrently(flight, "key", fn, release, callers=3)
+    for future in futures:
+        with pytest.raises(TimeoutError, match="upstream timed out"):
+            future.result()
+    # The failed call is not cached: the next caller runs fn again
+    assert flight.do("key", lambda: "retried") == "retried"
+
+
+def test_different_keys_do_not_collapse():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("b", lambda: 2) == 2
+    assert flight.stats()["upstream_calls"] == 2
+
+
+def test_async_concurrent_calls_collapse_into_one():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fn) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["answer"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["collapsed_calls"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_exception_reaches_every_waiter():
+    flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise TimeoutError("upstream timed out")
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", fn) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, TimeoutError) for r in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_cancelled_leader_does_not_cancel_followers():
+    flight = AsyncSingleFlight()
+    started = []
+
+    async def fn():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("key", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        # e.g. the leader's client disconnected
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "answer"
+    assert len(started) == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_cancelled_follower_does_not_cancel_leader():
+    flight = AsyncSingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do("key", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", fn))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == "answer"
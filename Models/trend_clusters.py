@@ -0,0 +1,182 @@
+"""
+Near-duplicate clustering of trend embeddings.
+
+The corpus is full of variants of one story ("Manmohan Singh", "Dr. Singh",
+"Dr Singh") and of the same trend repeated across hourly cards, so top-k
+retrieval over rows tends to spend every slot on one story. Rows whose
+embeddings are within TREND_CLUSTER_THRESHOLD cosine similarity of a cluster
+are grouped into it, and retrieval searches the cluster centroids instead.
+Each cluster has a canonical trend (its most-tweeted member), an aggregated
+count (the best count of every distinct trend name, summed) and its other
+names as variants.
+
+Assignment is threshold-based leader clustering, vectorized in chunks: a
+chunk of rows is scored against all centroids with one matrix product and
+joins the best cluster above the threshold; the rest form new clusters
+among themselves (one vectorized pass per new leader). Clusters never mix
+sources, so source filters and boosts apply to whole clusters.
+
+Rebuilds are incremental: rows that were in the previous snapshot keep
+their cluster and only new rows are assigned.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from vector_index import map_npy
+
+CLUSTER_THRESHOLD = float(os.getenv("TREND_CLUSTER_THRESHOLD", "0.88"))
+# Rows assigned per matrix product
+ASSIGN_CHUNK = 2048
+# Other names of a cluster kept for prompt context
+MAX_VARIANTS = 3
+# Arrays written by save_npy, one .npy file each so they can be memory-mapped
+NPY_ARRAYS = ("labels", "sizes", "centroids", "canonical_rows", "counts")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+
+def assign_clusters(embeddings: np.ndarray, source_codes: np.ndarray, threshold: float = None,
+                    prior_labels: np.ndarray = None) -> np.ndarray:
+    """
+    Cluster label per row.
+
+    Args:
+        embeddings: (n, dim) L2-normalized float32 row vectors
+        source_codes: (n,) source code per row; clusters never span sources
+        threshold: Minimum cosine similarity to join a cluster
+        prior_labels: Optional (n,) labels from the previous snapshot, -1 for new rows
+
+    Returns:
+        int64 labels in [0, number of clusters)
+    """
+    threshold = CLUSTER_THRESHOLD if threshold is None else threshold
+    n, dim = embeddings.shape
+    labels = np.full(n, -1, dtype=np.int64)
+    if prior_labels is not None:
+        labels[:] = prior_labels
+    kept = labels >= 0
+    num = 0
+    if kept.any():
+        # Compact the ids of clusters that lost all their rows
+        _, labels[kept] = np.unique(labels[kept], return_inverse=True)
+        num = int(labels[kept].max()) + 1
+    sums = np.zeros((num, dim), dtype=np.float32)
+    np.add.at(sums, labels[kept], embeddings[kept])
+    cluster_source = np.zeros(num, dtype=np.int64)
+    cluster_source[labels[kept]] = source_codes[kept]
+    centroids = _normalize(sums)
+
+    pending = np.flatnonzero(labels < 0)
+    for start in range(0, len(pending), ASSIGN_CHUNK):
+        rows = pending[start:start + ASSIGN_CHUNK]
+        vectors = np.asarray(embeddings[rows], dtype=np.float32)
+        sources = source_codes[rows]
+        if num:
+            sims = vectors @ centroids.T
+            sims[sources[:, None] != cluster_source[None, :]] = -np.inf
+            best = np.argmax(sims, axis=1)
+            hit = sims[np.arange(len(rows)), best] >= threshold
+            labels[rows[hit]] = best[hit]
+            rows, vectors, sources = rows[~hit], vectors[~hit], sources[~hit]
+
+        # The rest lead new clusters, taking every unassigned row of the chunk close to them
+        sims = vectors @ vectors.T
+        sims[sources[:, None] != sources[None, :]] = -np.inf
+        unassigned = np.ones(len(rows), dtype=bool)
+        first_new = num
+        for i in range(len(rows)):
+            if not unassigned[i]:
+                continue
+            members = unassigned & (sims[i] >= threshold)
+            members[i] = True
+            labels[rows[members]] = num
+            unassigned[members] = False
+            num += 1
+
+        # Fold the chunk into the centroids the next chunk is scored against
+        chunk = pending[start:start + ASSIGN_CHUNK]
+        sums = np.vstack([sums, np.zeros((num - first_new, dim), dtype=np.float32)])
+        np.add.at(sums, labels[chunk], np.asarray(embeddings[chunk], dtype=np.float32))
+        cluster_source = np.concatenate([cluster_source, np.zeros(num - first_new, dtype=np.int64)])
+        cluster_source[labels[chunk]] = source_codes[chunk]
+        centroids = _normalize(sums)
+    return labels
+
+
+class TrendClusters:
+    """
+    Clusters of one TrendIndex snapshot.
+
+    Attributes:
+        labels: (n,) cluster of each row
+        centroids: (clusters, dim) L2-normalized mean of each cluster's rows
+        canonical_rows: (clusters,) the member row shown for each cluster
+        counts: (clusters,) aggregated count of each cluster
+        variants: {cluster: (other trend names, ...)} for clusters with more than one name
+    """
+
+    def __init__(self, embeddings: np.ndarray, labels: np.ndarray, trends, counts):
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.labels.setflags(write=False)
+        num = int(self.labels.max()) + 1 if len(self.labels) else 0
+        order = np.argsort(self.labels, kind="stable")
+        sizes = np.bincount(self.labels, minlength=num)
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.sizes = sizes
+        self.centroids = _normalize(np.add.reduceat(np.asarray(embeddings, dtype=np.float32)[order], starts, axis=0)) \
+            if num else np.zeros((0, embeddings.shape[1]), dtype=np.float32)
+
+        counts = pd.to_numeric(pd.Series(counts), errors="coerce").fillna(0).to_numpy()
+        names = pd.Series(trends).fillna("").astype(str)
+        by_count = np.lexsort((-counts, self.labels))
+        self.canonical_rows = by_count[starts] if num else np.zeros(0, dtype=np.int64)
+
+        # A name repeated across hourly cards counts once, with its best count
+        members = pd.DataFrame({"cluster": self.labels, "key": names.str.casefold(), "name": names,
+                                "count": counts}).iloc[by_count]
+        distinct = members.drop_duplicates(["cluster", "key"])
+        self.counts = distinct.groupby("cluster")["count"].sum().reindex(range(num), fill_value=0).to_numpy()
+        multi = distinct[distinct.groupby("cluster")["key"].transform("size") > 1]
+        self.variants = {
+            cluster: tuple(group["name"].iloc[1:MAX_VARIANTS + 1])
+            for cluster, group in multi.groupby("cluster", sort=False)
+        }
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, source_codes: np.ndarray, trends, counts, prior_labels=None,
+              threshold: float = None):
+        """Cluster the rows (see assign_clusters) and summarize the clusters"""
+        labels = assign_clusters(embeddings, source_codes, threshold, prior_labels)
+        return cls(embeddings, labels, trends, counts)
+
+    def save_npy(self, directory: str):
+        """Write the arrays as <directory>/clusters.<name>.npy; variants are left to the caller"""
+        for name in NPY_ARRAYS:
+            np.save(os.path.join(directory, f"clusters.{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def map(cls, directory: str, variants: dict):
+        """Clusters over read-only memory maps of the arrays written by save_npy"""
+        clusters = cls.__new__(cls)
+        for name in NPY_ARRAYS:
+            setattr(clusters, name, map_npy(os.path.join(directory, f"clusters.{name}.npy")))
+        clusters.variants = variants
+        return clusters
+
+    def __len__(self):
+        return len(self.centroids)
+
+    def canonical(self, rows) -> np.ndarray:
+        """Canonical row of each row's cluster; -1 (ANN padding) stays -1"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return np.where(rows >= 0, self.canonical_rows[self.labels[np.maximum(rows, 0)]], -1)
+
+    def bias(self, row_bias: np.ndarray):
+        """Per-cluster view of a per-row bias: the canonical row's value"""
+        return row_bias[..., self.canonical_rows] if row_bias is not None else None
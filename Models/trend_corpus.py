@@ -0,0 +1,215 @@
+"""
+Unified multi-source trend corpus.
+
+Loads every trend dataset the scrapers produce into one DataFrame with the
+columns the RAG index needs:
+
+    Trend      display name
+    Count      popularity (tweets / reels), 0 when the source has none
+    source     one of SOURCES
+    timestamp  unix seconds when the data was scraped (snapshot time from the
+               history store, otherwise the file modification time)
+    text       the string that gets embedded
+    momentum   trend_momentum score (Twitter rows only, 0 elsewhere)
+
+Twitter rows keep the exact text format used since the first RAG version,
+so their cached embeddings stay valid.
+"""
+import json
+import os
+import re
+
+import pandas as pd
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(MODELS_DIR)
+
+SOURCES = (
+    "twitter",
+    "twitter_archive",
+    "instagram_reels",
+    "instagram_reels_archive",
+    "instagram_songs",
+)
+
+# Human-readable labels used in prompt context
+SOURCE_LABELS = {
+    "twitter": "Tweet Count",
+    "twitter_archive": "Tweet Count, archived",
+    "instagram_reels": "Instagram Reels trend",
+    "instagram_reels_archive": "Instagram Reels trend, archived",
+    "instagram_songs": "Instagram Reels using this song",
+}
+
+COLUMNS = ["Trend", "Count", "source", "timestamp", "text"]
+
+
+def _find(filename: str):
+    for directory in (MODELS_DIR, os.getcwd(), REPO_DIR):
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _mtime(path: str) -> int:
+    return int(os.path.getmtime(path))
+
+
+def _clean_reels_name(name: str) -> str:
+    """'"Maturing" Trend* |Example:' -> '"Maturing" Trend'"""
+    name = re.sub(r"\s*\|?\s*:?\s*Example:.*$", "", str(name))
+    return name.replace("*", "").strip()
+
+
+def _frame(trends, counts, source: str, timestamp: int, texts) -> pd.DataFrame:
+    df = pd.DataFrame({"Trend": trends, "Count": counts, "text": texts})
+    df["source"] = source
+    df["timestamp"] = timestamp
+    return df[COLUMNS]
+
+
+def load_twitter_csv(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    trends = df['Trend'].astype(str).where(df['Trend'].notna(), "")
+    counts = df['Count'].astype(str).where(df['Count'].notna(), "0")
+    texts = "Twitter Trend: " + trends + " | Tweet Count: " + counts
+    return _frame(df['Trend'], df['Count'], "twitter", _mtime(path), texts)
+
+
+def load_twitter_store(store) -> pd.DataFrame:
+    """Only the newest Twitter snapshot is read from the history store (trend_store.TrendStore)"""
+    scraped_at, rows = store.latest("twitter")
+    trends = [row[0] for row in rows]
+    counts = [row[1] for row in rows]
+    texts = [f"Twitter Trend: {t} | Tweet Count: {c}" for t, c in zip(trends, counts)]
+    return _frame(trends, counts, "twitter", scraped_at, texts)
+
+
+def _newest_twitter_frame(twitter_csv: str) -> pd.DataFrame:
+    """Latest Twitter data from the history store, or the CSV when it is newer (or the store is missing)"""
+    from trend_store import TrendStore, DEFAULT_STORE_PATH
+
+    from trend_momentum import lookup_momentum
+
+    store_path = os.getenv("TREND_STORE_PATH", DEFAULT_STORE_PATH)
+    if not os.path.exists(store_path):
+        return load_twitter_csv(twitter_csv)
+    store = TrendStore(store_path)
+    try:
+        latest = store.latest_time("twitter")
+        if latest is not None and latest >= _mtime(twitter_csv):
+            df = load_twitter_store(store)
+        else:
+            df = load_twitter_csv(twitter_csv)
+        trends = df['Trend'].astype(str).to_numpy(dtype=object)
+        df['momentum'] = lookup_momentum(store, trends, int(df['timestamp'].iat[0]) if len(df) else 0)
+        return df
+    finally:
+        store.close()
+
+
+def load_twitter_archive(path: str) -> pd.DataFrame:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    trends = list(data.keys())
+    counts = [int(v) if v is not None else 0 for v in data.values()]
+    texts = [f"Twitter Trend (archived): {t} | Tweet Count: {c}" for t, c in zip(trends, counts)]
+    return _frame(trends, counts, "twitter_archive", _mtime(path), texts)
+
+
+def load_reels_csv(path: str, source: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    # latest_insta_trends.csv has used both 'Trend_Name' and 'Trend Name' headers
+    name_column = 'Trend Name' if 'Trend Name' in df.columns else 'Trend_Name'
+    names = df[name_column].map(_clean_reels_name)
+    explanations = df['Explanation'].fillna("").astype(str)
+    keep = (names != "") & (names != "NOTE:")
+    names, explanations = names[keep], explanations[keep]
+    texts = "Instagram Reels Trend: " + names + " | " + explanations
+    return _frame(names.tolist(), 0, source, _mtime(path), texts.tolist())
+
+
+def load_reels_json(path: str, known_names: set) -> pd.DataFrame:
+    """instadata_*.json maps trend name -> example links; only names not already loaded are added"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    names = [n for n in (_clean_reels_name(k) for k in data) if n and n not in known_names]
+    texts = [f"Instagram Reels Trend: {n}" for n in names]
+    return _frame(names, 0, "instagram_reels", _mtime(path), texts)
+
+
+def load_songs_csv(path: str) -> pd.DataFrame:
+    df = pd.read_csv(path)
+    names = df['song_name'].fillna("").astype(str).str.strip()
+    artists = df['artist_name'].fillna("Unknown").astype(str)
+    counts = pd.to_numeric(df['reels_count'], errors="coerce").fillna(0).astype(int)
+    texts = "Instagram Trending Song: " + names + " by " + artists + " | Reels: " + counts.astype(str)
+    return _frame(names, counts, "instagram_songs", _mtime(path), texts)
+
+
+def format_trend_line(trend_info: dict) -> str:
+    """Render one retrieved trend as a line of LLM prompt context"""
+    source = trend_info.get('source', 'twitter')
+    # Other names of the same clustered story (trend_clusters)
+    variants = trend_info.get('variants')
+    also = f", also trending as {', '.join(map(str, variants))}" if variants else ""
+    if source in ("instagram_reels", "instagram_reels_archive"):
+        return f"- {trend_info['trend']} ({SOURCE_LABELS[source]}{also})"
+    return f"- {trend_info['trend']} ({SOURCE_LABELS.get(source, 'Tweet Count')}: {trend_info['count']}{also})"
+
+
+def load_corpus(twitter_csv: str, sources=None) -> pd.DataFrame:
+    """
+    Load all available trend sources into one DataFrame.
+
+    Args:
+        twitter_csv: Path to the live twitter_scraper.csv; the newest snapshot in
+            the trend history store is used instead when it is at least as recent
+        sources: Iterable of source names to include (default: all of SOURCES,
+            or the comma-separated TREND_SOURCES environment variable)
+
+    Returns:
+        DataFrame with COLUMNS, Twitter rows first
+    """
+    if sources is None:
+        sources = [s.strip() for s in os.getenv("TREND_SOURCES", ",".join(SOURCES)).split(",") if s.strip()]
+    sources = set(sources)
+
+    frames = []
+    if "twitter" in sources:
+        frames.append(_newest_twitter_frame(twitter_csv))
+
+    optional = []
+    if "twitter_archive" in sources:
+        optional.append(("Twitter-data_28_12.json", load_twitter_archive))
+    if "instagram_reels" in sources:
+        optional.append(("latest_insta_trends.csv", lambda p: load_reels_csv(p, "instagram_reels")))
+    if "instagram_reels_archive" in sources:
+        optional.append(("archived_insta_trends.csv", lambda p: load_reels_csv(p, "instagram_reels_archive")))
+    if "instagram_songs" in sources:
+        optional.append(("instagram_trending_songs.csv", load_songs_csv))
+
+    for filename, loader in optional:
+        path = _find(filename)
+        if path is None:
+            continue
+        try:
+            frames.append(loader(path))
+        except Exception as e:
+            print(f"[trend_corpus] Skipping {filename}: {e}")
+
+    if "instagram_reels" in sources:
+        path = _find("instadata_17_09.json")
+        if path is not None:
+            known = set().union(*(set(f["Trend"]) for f in frames if len(f) and f["source"].iat[0] == "instagram_reels"))
+            try:
+                frames.append(load_reels_json(path, known))
+            except Exception as e:
+                print(f"[trend_corpus] Skipping instadata_17_09.json: {e}")
+
+    corpus = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+    corpus["momentum"] = corpus["momentum"].fillna(0.0) if "momentum" in corpus.columns else 0.0
+    counts = corpus["source"].value_counts().to_dict()
+    print(f"[trend_corpus] Loaded {len(corpus)} trends: {counts}")
+    return corpus
@@ -0,0 +1,434 @@
+import hashlib
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from trend_clusters import TrendClusters
+from vector_index import QUANTIZED_BACKENDS, create_index, index_filename, is_saved, load_index
+
+_generation_counter = itertools.count(1)
+
+# Nearest-neighbour backend for retrieval: "flat" (exact, default), "ivf", "hnsw",
+# or "fp16" / "int8" (quantized, memory-mapped, float32 re-rank)
+INDEX_BACKEND = os.getenv("TREND_INDEX_BACKEND", "flat")
+# Search near-duplicate clusters of trends instead of rows (see trend_clusters);
+# not used with the quantized backends, which do not hold the embeddings in memory
+CLUSTERING = os.getenv("TREND_CLUSTERING", "1") == "1"
+# Reciprocal-rank fusion constant for hybrid (BM25 + dense) retrieval
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Where built ANN indexes are persisted, keyed by corpus version
+VECTOR_INDEX_DIR = os.getenv(
+    "VECTOR_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'vector_index')
+)
+
+
+def build_trend_texts(df: pd.DataFrame) -> list:
+    """Render each trend row as the text that gets embedded"""
+    if 'text' in df.columns:
+        # Multi-source corpora (trend_corpus.load_corpus) carry per-source texts
+        return df['text'].tolist()
+    trends = df['Trend'].astype(str).where(df['Trend'].notna(), "")
+    counts = df['Count'].astype(str).where(df['Count'].notna(), "0")
+    return ("Twitter Trend: " + trends + " | Tweet Count: " + counts).tolist()
+
+
+def corpus_version(texts) -> str:
+    """Content fingerprint: identical corpora get the same version across restarts"""
+    return hashlib.sha1("\n".join(texts).encode("utf-8")).hexdigest()[:12]
+
+
+def saved_index_path(backend: str, version: str) -> str:
+    return os.path.join(VECTOR_INDEX_DIR, index_filename(backend, version))
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows as contiguous float32 so a dot product is cosine similarity"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+
+def _prune_saved_indexes(backend: str, keep: int = 3):
+    """Keep only the most recently written persisted indexes of a backend"""
+    suffix = index_filename(backend, "")
+    paths = [
+        os.path.join(VECTOR_INDEX_DIR, name) for name in os.listdir(VECTOR_INDEX_DIR) if name.endswith(suffix)
+    ]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for stale in paths[keep:]:
+        for path in (stale, stale + ".json", stale + ".scales.npy", stale + ".f32.npy"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class TrendIndex:
+    """
+    Immutable snapshot of the trend corpus and its embeddings.
+
+    A new TrendIndex is built for every reload and published by swapping a
+    single reference, so readers that grabbed the previous snapshot keep a
+    consistent view of the dataframe, texts and embeddings until they finish.
+
+    Embeddings are stored L2-normalized as one contiguous float32 matrix, and
+    the columns needed for results are materialized as NumPy arrays. Search
+    goes through a vector_index backend: exact flat search by default (a
+    single matrix-vector product plus an argpartition), or an ANN index for
+    large retained corpora. A BM25 LexicalIndex over the trend names is built
+    alongside for hybrid retrieval and exact hashtag matches.
+
+    With a quantized backend ("fp16" / "int8") `embeddings` becomes the
+    backend's memory-mapped float32 file, so the snapshot holds no float32
+    matrix in memory; `embeddings` may then be None when a saved index for
+    this corpus version exists (see build_index).
+
+    normalized=True takes `embeddings` as already L2-normalized float32 and
+    keeps the array as given, e.g. a memory map shared between processes.
+
+    With clustering (TREND_CLUSTERING, default on) near-duplicate trends are
+    grouped into TrendClusters and the vector index holds one centroid per
+    cluster. Search still returns row indices, the canonical row of each
+    cluster, and results carry the cluster's aggregated count and variants.
+    `previous` lets unchanged rows keep their clusters.
+
+    `clusters` and `vector_index` take the clustering and search backend of
+    a published snapshot as they are (see shared_index), instead of
+    building them.
+    """
+
+    def __init__(self, df: pd.DataFrame, texts: list, embeddings: np.ndarray, stats: dict = None,
+                 backend: str = None, quantizer_from=None, normalized: bool = False, clustering: bool = None,
+                 previous=None, clusters: TrendClusters = None, vector_index=None):
+        self.df = df
+        self.texts = tuple(texts)
+        if embeddings is not None and not normalized:
+            embeddings = normalize_rows(embeddings)
+        self.embeddings = _readonly(embeddings) if embeddings is not None else None
+        self.trend_values = _readonly(df['Trend'].to_numpy())
+        self.count_values = _readonly(df['Count'].to_numpy())
+        sources = df['source'] if 'source' in df.columns else pd.Series("twitter", index=df.index)
+        source_categories = pd.Categorical(sources)
+        self.source_names = tuple(source_categories.categories)
+        self.source_codes = _readonly(np.asarray(source_categories.codes, dtype=np.int32))
+        self.source_values = _readonly(sources.to_numpy())
+        timestamps = df['timestamp'] if 'timestamp' in df.columns else pd.Series(0, index=df.index)
+        self.timestamp_values = _readonly(timestamps.to_numpy(dtype=np.int64))
+        momentum = df['momentum'] if 'momentum' in df.columns else pd.Series(0.0, index=df.index)
+        self.momentum_values = _readonly(momentum.to_numpy(dtype=np.float32))
+        self.row_by_text = {text: i for i, text in enumerate(self.texts)}
+        # Vectors, and so saved vector indexes, depend on the texts only
+        self.texts_version = corpus_version(self.texts)
+        # Momentum changes the ranking, so it is part of the snapshot version (LLM cache key, shared_index)
+        self.version = self.texts_version
+        if self.momentum_values.any():
+            digest = hashlib.sha1(self.texts_version.encode("utf-8") + self.momentum_values.tobytes())
+            self.version = digest.hexdigest()[:12]
+        self.generation = next(_generation_counter)
+        self.stats = stats or {}
+        # Set once the snapshot is published to, or loaded from, shared_index
+        self.snapshot_id = None
+        backend = backend or INDEX_BACKEND
+        clustering = CLUSTERING if clustering is None else clustering
+        self.clusters = clusters
+        if clusters is None and clustering and backend not in QUANTIZED_BACKENDS and len(self.texts):
+            self.clusters = self._clusters(previous)
+        self.vector_index = vector_index or self._vector_index(backend, quantizer_from)
+        if backend in QUANTIZED_BACKENDS:
+            # Re-rank vectors live in the mmap'd file; drop the in-memory float32 copy
+            self.embeddings = _readonly(self.vector_index.full_precision)
+        self.lexical_index = LexicalIndex(df['Trend'].fillna("").astype(str).tolist())
+
+    def _clusters(self, previous):
+        prior = None
+        if previous is not None and previous.clusters is not None:
+            prior = np.array([
+                previous.clusters.labels[row] if row is not None else -1
+                for row in map(previous.row_by_text.get, self.texts)
+            ], dtype=np.int64)
+        clusters = TrendClusters.build(self.embeddings, self.source_codes, self.trend_values, self.count_values, prior)
+        print(f"[trend_index] Clustered {len(self.texts)} trends into {len(clusters)} clusters")
+        return clusters
+
+    def _vector_index(self, backend: str, quantizer_from):
+        """Build the search backend, loading a persisted ANN index for this version when present"""
+        vectors = self.clusters.centroids if self.clusters is not None else self.embeddings
+        if backend == "flat":
+            return create_index("flat", vectors.shape[1]).build(vectors)
+
+        name = self.texts_version
+        if self.clusters is not None:
+            # Centroids depend on the clustering history too, not only on the texts
+            name = "c" + hashlib.sha1(vectors.tobytes()).hexdigest()[:12]
+        path = saved_index_path(backend, name)
+        if is_saved(path, backend):
+            try:
+                index = load_index(path, backend)
+                print(f"[trend_index] Loaded {backend} index for version {self.texts_version}")
+                return index
+            except Exception as e:
+                if self.embeddings is None:
+                    raise
+                print(f"[trend_index] Rebuilding unreadable {backend} index {path}: {e}")
+
+        index = create_index(backend, vectors.shape[1])
+        if backend == "ivf" and getattr(quantizer_from, "centroids", None) is not None:
+            # Reuse the live snapshot's coarse quantizer; assignment alone is cheap
+            index.centroids = quantizer_from.centroids
+            index.nlist = len(quantizer_from.centroids)
+        index.build(vectors)
+        os.makedirs(VECTOR_INDEX_DIR, exist_ok=True)
+        index.save(path)
+        _prune_saved_indexes(backend)
+        return index
+
+    def __len__(self):
+        return len(self.texts)
+
+    def source_bias(self, sources=None, source_boost: dict = None):
+        """
+        Per-row additive score for source filtering and boosting.
+
+        Args:
+            sources: Only rows from these sources are eligible (None = all)
+            source_boost: {source: bonus} added to the cosine similarity
+
+        Returns:
+            float32 array of shape (len(self),), or None when there is nothing to apply
+        """
+        if not sources and not source_boost:
+            return None
+        per_source = np.zeros(len(self.source_names), dtype=np.float32)
+        for i, name in enumerate(self.source_names):
+            if sources and name not in sources:
+                per_source[i] = -np.inf
+            elif source_boost and name in source_boost:
+                per_source[i] = float(source_boost[name])
+        return per_source[self.source_codes]
+
+    def row_bias(self, sources=None, source_boost: dict = None, momentum_weight: float = 0.0):
+        """
+        Combined per-row bias for one query: source filter/boost plus
+        momentum_weight * momentum (see trend_momentum).
+
+        Returns:
+            float32 array of shape (len(self),), or None when there is nothing to apply
+        """
+        bias = self.source_bias(sources, source_boost)
+        if momentum_weight and self.momentum_values.any():
+            momentum = momentum_weight * self.momentum_values
+            bias = momentum if bias is None else bias + momentum
+        return bias
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, row_bias: np.ndarray = None):
+        """
+        Top-k cosine search for one query.
+
+        Args:
+            query_embedding: Query vector (need not be normalized)
+            top_k: Number of results
+
+        Returns:
+            (indices, scores) sorted by descending score
+        """
+        indices, scores = self.search_batch(query_embedding.reshape(1, -1), top_k, row_bias)
+        return indices[0], scores[0]
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5, row_bias: np.ndarray = None):
+        """
+        Top-k cosine search for many queries with one matrix-matrix product.
+
+        Args:
+            query_embeddings: (num_queries, dim) array
+            top_k: Number of results per query
+            row_bias: Optional additive per-row score, shape (n,) or (num_queries, n);
+                -inf excludes a row (see source_bias)
+
+        Returns:
+            (indices, scores), each of shape (num_queries, k), sorted by descending
+            score. ANN backends may pad with index -1 when fewer rows were probed.
+            With clustering the indices are the canonical rows of the best clusters.
+        """
+        if self.clusters is None:
+            return self.vector_index.search(normalize_rows(query_embeddings), top_k, row_bias)
+        ids, scores = self.vector_index.search(normalize_rows(query_embeddings), top_k, self.clusters.bias(row_bias))
+        return np.where(ids >= 0, self.clusters.canonical_rows[np.maximum(ids, 0)], -1), scores
+
+    def _row_dicts(self, rows, similarities, scores) -> list:
+        rows = np.asarray(rows, dtype=np.int64)
+        trends = self.trend_values[rows].tolist()
+        counts = self.count_values[rows].tolist()
+        sources = self.source_values[rows].tolist()
+        momentum = self.momentum_values[rows].tolist()
+        results = [
+            {'trend': trend, 'count': count, 'source': source, 'similarity': similarity,
+             'momentum': m, 'score': float(score)}
+            for trend, count, source, similarity, m, score in zip(trends, counts, sources, similarities, momentum, scores)
+        ]
+        if self.clusters is not None:
+            for result, cluster in zip(results, self.clusters.labels[rows].tolist()):
+                result['count'] = int(self.clusters.counts[cluster])
+                result['variants'] = list(self.clusters.variants.get(cluster, ()))
+        return results
+
+    def _distinct(self, rows) -> list:
+        """With clustering, each row's canonical row, keeping the first of every cluster"""
+        if self.clusters is None:
+            return list(rows)
+        return list(dict.fromkeys(self.clusters.canonical(rows).tolist()))
+
+    def _similarities(self, rows, query_embedding: np.ndarray) -> list:
+        query_vector = normalize_rows(query_embedding.reshape(1, -1))[0]
+        if self.clusters is not None:
+            return (self.clusters.centroids[self.clusters.labels[rows]] @ query_vector).tolist()
+        return (self.embeddings[rows] @ query_vector).tolist()
+
+    def _lexical_exclude(self, row_bias: np.ndarray):
+        return ~np.isfinite(row_bias) if row_bias is not None else None
+
+    def exact_results(self, query: str, top_k: int = 5, row_bias: np.ndarray = None) -> list:
+        """
+        Answer a query that is exactly a trend name from the postings alone (no encoding).
+
+        Exact matches come first (highest bias, then count), topped up with BM25
+        matches. 'similarity' is None since no embedding was computed.
+
+        Returns:
+            Result dicts, or [] when no trend name matches the query exactly
+        """
+        rows = self.lexical_index.exact_matches(query)
+        if row_bias is not None:
+            rows = [row for row in rows if np.isfinite(row_bias[row])]
+        if not rows:
+            return []
+        rows = np.asarray(rows, dtype=np.int64)
+        bias = row_bias[rows] if row_bias is not None else np.zeros(len(rows), dtype=np.float32)
+        counts = pd.to_numeric(pd.Series(self.count_values[rows]), errors="coerce").fillna(0).to_numpy()
+        rows = rows[np.lexsort((-counts, -bias))]
+        # The same trend often appears in several hourly cards; keep its best row per source
+        unique_rows, seen = [], set()
+        for row in rows.tolist():
+            key = (self.trend_values[row], self.source_values[row])
+            if key not in seen:
+                seen.add(key)
+                unique_rows.append(row)
+        unique_rows = self._distinct(unique_rows)[:top_k]
+        if len(unique_rows) < top_k:
+            lexical_rows, _ = self.lexical_index.search(query, top_k + len(rows), self._lexical_exclude(row_bias))
+            taken = set(rows.tolist()) | set(unique_rows)
+            unique_rows += [
+                row for row in self._distinct([row for row in lexical_rows.tolist() if row not in taken])
+                if row not in taken
+            ][:top_k - len(unique_rows)]
+        scores = [1.0 / (RRF_K + rank) for rank in range(1, len(unique_rows) + 1)]
+        return self._row_dicts(unique_rows, [None] * len(unique_rows), scores)
+
+    def hybrid_results(self, query: str, query_embedding: np.ndarray, indices: np.ndarray, scores: np.ndarray,
+                       top_k: int = 5, row_bias: np.ndarray = None) -> list:
+        """
+        Fuse dense candidates with BM25 results by reciprocal rank.
+
+        Args:
+            query: Query text for the lexical side
+            query_embedding: Query vector, used for the similarity of lexical-only hits
+            indices, scores: Dense candidates for this query (from search), best first
+            top_k: Number of results
+            row_bias: The bias the dense search used (source filter, boosts, momentum)
+
+        Returns:
+            Result dicts ranked by fused score; plain dense results when no token matches
+        """
+        found = (indices >= 0) & np.isfinite(scores)
+        dense_rows = indices[found]
+        lexical_rows, _ = self.lexical_index.search(query, len(dense_rows) or top_k, self._lexical_exclude(row_bias))
+        if len(lexical_rows) == 0:
+            return self.results(indices[:top_k], scores[:top_k], row_bias)
+        fused = reciprocal_rank_fusion([dense_rows.tolist(), self._distinct(lexical_rows.tolist())], RRF_K)
+        ranked = sorted(fused, key=fused.get, reverse=True)[:top_k]
+        return self._row_dicts(ranked, self._similarities(ranked, query_embedding), [fused[row] for row in ranked])
+
+    def results(self, indices: np.ndarray, scores: np.ndarray, row_bias: np.ndarray = None) -> list:
+        """
+        Turn search output into the trend dicts used for prompt context.
+
+        'score' is the ranking score; 'similarity' is the cosine similarity
+        with the query's row_bias (source boost, momentum) taken back out.
+        """
+        found = (indices >= 0) & np.isfinite(scores)
+        indices, scores = indices[found], scores[found]
+        similarities = scores - row_bias[indices] if row_bias is not None else scores
+        return self._row_dicts(indices, similarities.tolist(), scores)
+
+
+def build_index(df: pd.DataFrame, encoder, embedding_cache, previous: TrendIndex = None) -> TrendIndex:
+    """
+    Build a new TrendIndex, reusing embeddings from the previous snapshot.
+
+    Only texts that are not in `previous` are sent to the embedding cache
+    (and from there, only cache misses reach the encoder), so the cost of a
+    rebuild is proportional to the number of added or changed trends.
+
+    Args:
+        df: Trend dataframe with 'Trend' and 'Count' columns
+        encoder: SentenceTransformer-compatible encoder
+        embedding_cache: EmbeddingCache used for texts not in `previous`
+        previous: Currently published index, if any
+
+    Returns:
+        A new TrendIndex (or `previous` itself when nothing changed)
+    """
+    texts = build_trend_texts(df)
+
+    momentum = df['momentum'].to_numpy(dtype=np.float32) if 'momentum' in df.columns else np.zeros(len(df), dtype=np.float32)
+    if (previous is not None and tuple(texts) == previous.texts
+            and np.array_equal(momentum, previous.momentum_values)):
+        print("[trend_index] Corpus unchanged, keeping current index version", previous.version)
+        return previous
+
+    if INDEX_BACKEND in QUANTIZED_BACKENDS and is_saved(saved_index_path(INDEX_BACKEND, corpus_version(texts)),
+                                                        INDEX_BACKEND):
+        # The saved quantized index carries the float32 vectors too: map it instead of re-assembling
+        stats = {"added": 0, "reused": len(texts), "removed": 0, "mapped": True}
+        try:
+            index = TrendIndex(df, texts, None, stats)
+            print(f"[trend_index] Mapped saved {INDEX_BACKEND} index for {len(texts)} trends")
+            return index
+        except Exception as e:
+            # Unreadable files: re-encode below, which rewrites them
+            print(f"[trend_index] Could not map saved {INDEX_BACKEND} index, rebuilding it: {e}")
+
+    dim = encoder.get_sentence_embedding_dimension() if previous is None else previous.embeddings.shape[1]
+    embeddings = np.empty((len(texts), dim), dtype=np.float32)
+
+    new_rows = []
+    reused = 0
+    for i, text in enumerate(texts):
+        row = previous.row_by_text.get(text) if previous is not None else None
+        if row is None:
+            new_rows.append(i)
+        else:
+            embeddings[i] = previous.embeddings[row]
+            reused += 1
+
+    if new_rows:
+        embeddings[new_rows] = embedding_cache.encode(encoder, [texts[i] for i in new_rows])
+    if reused:
+        # Rows taken from `previous` are still in use: keep them in the cache's LRU window
+        is_new = np.zeros(len(texts), dtype=bool)
+        is_new[new_rows] = True
+        embedding_cache.touch([text for text, new in zip(texts, is_new.tolist()) if not new])
+    embedding_cache.save()
+
+    removed = len(previous) - reused if previous is not None else 0
+    stats = {"added": len(new_rows), "reused": reused, "removed": max(removed, 0)}
+    print(f"[trend_index] Built index: {stats['added']} new, {stats['reused']} reused, {stats['removed']} removed")
+    quantizer_from = previous.vector_index if previous is not None else None
+    return TrendIndex(df, texts, embeddings, stats, quantizer_from=quantizer_from, previous=previous)
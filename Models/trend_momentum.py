@@ -0,0 +1,182 @@
+"""
+Trend velocity and momentum from successive scraper snapshots.
+
+After each scrape, `update_momentum` aligns the new snapshot with the state
+kept from the previous one and computes, per trend, in one vectorized pass:
+
+    growth        change in log(1 + count) per hour since the last snapshot
+    acceleration  change in growth per hour
+    freshness     2 ** -(hours since the trend was first seen / half-life)
+
+Work is O(trends in the snapshot + trends kept in state), so it runs inline
+after every hourly scrape. The state lives in the trend history store's
+`momentum` table.
+
+Retrieval fuses the combined momentum score with cosine similarity:
+
+    score = similarity + MOMENTUM_WEIGHT * momentum
+    momentum = w_growth * tanh(growth) + w_acceleration * tanh(acceleration)
+               + w_freshness * freshness
+
+with the component weights set by MOMENTUM_WEIGHTS, e.g.
+"growth=0.5,acceleration=0.2,freshness=0.3".
+"""
+import os
+
+import numpy as np
+
+DEFAULT_WEIGHTS = {"growth": 0.5, "acceleration": 0.2, "freshness": 0.3}
+
+# Blend of momentum into the retrieval score (0 disables re-ranking)
+MOMENTUM_WEIGHT = float(os.getenv("MOMENTUM_WEIGHT", "0.1"))
+# Hours after which a trend's freshness has halved
+FRESHNESS_HALF_LIFE_HOURS = float(os.getenv("MOMENTUM_HALF_LIFE_HOURS", "6"))
+# Trends missing from this many hours of snapshots are dropped from the state
+STATE_TTL_HOURS = float(os.getenv("MOMENTUM_STATE_TTL_HOURS", "48"))
+
+
+def parse_weights(spec: str = None) -> dict:
+    """'growth=0.5,freshness=0.3' -> component weights (unspecified ones keep their default)"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        name, value = part.split("=", 1)
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"Unknown momentum component '{name}'. Choose from: {', '.join(weights)}")
+        weights[name] = float(value)
+    return weights
+
+
+MOMENTUM_WEIGHTS = parse_weights(os.getenv("MOMENTUM_WEIGHTS"))
+
+
+def latest_counts(rows: list):
+    """
+    Collapse a trends24 snapshot to one count per trend.
+
+    A trend can appear in several hourly cards; the count from its most
+    recent card (lowest slot) is used.
+
+    Args:
+        rows: (trend, count, slot, rank) tuples, as returned by TrendStore.snapshot
+
+    Returns:
+        (names, counts) with names sorted and unique
+    """
+    if not rows:
+        return np.array([], dtype=object), np.array([], dtype=np.float64)
+    names = np.array([row[0] for row in rows], dtype=object)
+    counts = np.array([row[1] for row in rows], dtype=np.float64)
+    slots = np.array([row[2] for row in rows], dtype=np.int64)
+    order = np.lexsort((slots, names))
+    names, counts = names[order], counts[order]
+    first = np.ones(len(names), dtype=bool)
+    first[1:] = names[1:] != names[:-1]
+    return names[first], counts[first]
+
+
+def empty_state() -> dict:
+    return {
+        "trend": np.array([], dtype=object),
+        "count": np.array([], dtype=np.float64),
+        "growth": np.array([], dtype=np.float64),
+        "acceleration": np.array([], dtype=np.float64),
+        "first_seen": np.array([], dtype=np.int64),
+        "last_seen": np.array([], dtype=np.int64),
+    }
+
+
+def compute_momentum(names: np.ndarray, counts: np.ndarray, now: int, state: dict) -> dict:
+    """
+    Advance the momentum state by one snapshot.
+
+    Args:
+        names: Sorted unique trend names in the new snapshot
+        counts: Their counts
+        now: Snapshot time (unix seconds)
+        state: Previous state (see empty_state), sorted by trend
+
+    Returns:
+        New state sorted by trend: every trend in the snapshot, plus earlier
+        trends seen within STATE_TTL_HOURS (carried over unchanged)
+    """
+    prev_names = state["trend"]
+    pos = np.searchsorted(prev_names, names)
+    pos = np.minimum(pos, max(len(prev_names) - 1, 0))
+    seen = (prev_names[pos] == names) if len(prev_names) else np.zeros(len(names), dtype=bool)
+
+    prev_count = np.where(seen, state["count"][pos] if len(prev_names) else 0.0, counts)
+    prev_growth = np.where(seen, state["growth"][pos] if len(prev_names) else 0.0, 0.0)
+    prev_seen = np.where(seen, state["last_seen"][pos] if len(prev_names) else now, now)
+    # Floor at one minute so back-to-back scrapes do not blow up the rates
+    hours = np.maximum((now - prev_seen) / 3600.0, 1 / 60)
+
+    growth = np.where(seen, (np.log1p(counts) - np.log1p(prev_count)) / hours, 0.0)
+    acceleration = np.where(seen, (growth - prev_growth) / hours, 0.0)
+    first_seen = np.where(seen, state["first_seen"][pos] if len(prev_names) else now, now)
+
+    # Trends that dropped out of this snapshot stay in state until they expire
+    present = np.zeros(len(prev_names), dtype=bool)
+    present[pos[seen]] = True
+    carry = ~present & (state["last_seen"] >= now - STATE_TTL_HOURS * 3600)
+
+    merged = {
+        "trend": np.concatenate([names, prev_names[carry]]),
+        "count": np.concatenate([counts, state["count"][carry]]),
+        "growth": np.concatenate([growth, state["growth"][carry]]),
+        "acceleration": np.concatenate([acceleration, state["acceleration"][carry]]),
+        "first_seen": np.concatenate([first_seen, state["first_seen"][carry]]).astype(np.int64),
+        "last_seen": np.concatenate([np.full(len(names), now, dtype=np.int64), state["last_seen"][carry]]),
+    }
+    order = np.argsort(merged["trend"], kind="stable")
+    return {field: values[order] for field, values in merged.items()}
+
+
+def momentum_scores(state: dict, now: int, weights: dict = None) -> np.ndarray:
+    """Combined momentum score per state row; tanh keeps growth terms in [-1, 1]"""
+    weights = weights or MOMENTUM_WEIGHTS
+    age_hours = np.maximum(now - state["first_seen"], 0) / 3600.0
+    freshness = np.exp2(-age_hours / FRESHNESS_HALF_LIFE_HOURS)
+    return (
+        weights["growth"] * np.tanh(state["growth"])
+        + weights["acceleration"] * np.tanh(state["acceleration"])
+        + weights["freshness"] * freshness
+    )
+
+
+def update_momentum(store, source: str = "twitter") -> int:
+    """
+    Fold the newest snapshot of `source` into the stored momentum state.
+
+    Idempotent: a snapshot that was already folded in is skipped.
+
+    Returns:
+        Number of trends in the new state (0 when nothing was updated)
+    """
+    scraped_at, rows = store.latest(source)
+    if scraped_at is None:
+        return 0
+    state = store.load_momentum(source)
+    if len(state["last_seen"]) and state["last_seen"].max() >= scraped_at:
+        return 0
+    names, counts = latest_counts(rows)
+    new_state = compute_momentum(names, counts, scraped_at, state)
+    store.save_momentum(source, new_state)
+    print(f"[trend_momentum] Updated momentum for {len(names)} {source} trends ({len(new_state['trend'])} tracked)")
+    return len(new_state["trend"])
+
+
+def lookup_momentum(store, trends, now: int, source: str = "twitter") -> np.ndarray:
+    """Momentum score for each of `trends` (0 for trends without state)"""
+    state = store.load_momentum(source)
+    trends = np.asarray(trends, dtype=object)
+    scores = np.zeros(len(trends), dtype=np.float32)
+    if len(state["trend"]) == 0 or len(trends) == 0:
+        return scores
+    state_scores = momentum_scores(state, now)
+    pos = np.minimum(np.searchsorted(state["trend"], trends), len(state["trend"]) - 1)
+    found = state["trend"][pos] == trends
+    scores[found] = state_scores[pos[found]]
+    return scores
@@ -0,0 +1,259 @@
+"""
+Append-only time-series store for scraped trend snapshots.
+
+Every scrape is appended as one snapshot instead of overwriting a CSV, so
+trend history is kept for analytics and momentum scoring. Data lives in one
+SQLite file (WAL mode) with indexes on (trend, scraped_at) and
+(source, scraped_at), so a trend's history or a time range is read without
+scanning the rest of the table.
+
+Retention is bounded: snapshots older than TREND_STORE_RETENTION_DAYS are
+dropped, and beyond TREND_STORE_HOURLY_DAYS only the last snapshot of each
+day is kept.
+
+Each point records the trends24 card it came from (`slot`, 0 = the current
+hour, 1 = an hour earlier, ...) and its position in that card (`rank`).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'trend_history.sqlite3')
+
+DAY_SECONDS = 86400
+
+
+class TrendStore:
+    def __init__(self, path: str = None, retention_days: float = None, hourly_days: float = None):
+        self.path = path or os.getenv("TREND_STORE_PATH", DEFAULT_STORE_PATH)
+        self.retention_days = retention_days if retention_days is not None else float(os.getenv("TREND_STORE_RETENTION_DAYS", "90"))
+        self.hourly_days = hourly_days if hourly_days is not None else float(os.getenv("TREND_STORE_HOURLY_DAYS", "7"))
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY,
+                source TEXT NOT NULL,
+                scraped_at INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS points (
+                snapshot_id INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                scraped_at INTEGER NOT NULL,
+                slot INTEGER NOT NULL,
+                rank INTEGER NOT NULL,
+                trend TEXT NOT NULL,
+                count INTEGER NOT NULL
+            )"""
+        )
+        # Per-trend momentum state (see trend_momentum), replaced after each scrape
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS momentum (
+                source TEXT NOT NULL,
+                trend TEXT NOT NULL,
+                count REAL NOT NULL,
+                growth REAL NOT NULL,
+                acceleration REAL NOT NULL,
+                first_seen INTEGER NOT NULL,
+                last_seen INTEGER NOT NULL,
+                PRIMARY KEY (source, trend)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_source_time ON snapshots(source, scraped_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_points_trend_time ON points(trend, scraped_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_points_source_time ON points(source, scraped_at)")
+
+    def append_snapshot(self, rows, source: str = "twitter", scraped_at: int = None) -> int:
+        """
+        Append one scrape.
+
+        Args:
+            rows: Iterable of (trend, count) or (trend, count, slot, rank) tuples
+            source: Source name (see trend_corpus.SOURCES)
+            scraped_at: Unix seconds; defaults to now
+
+        Returns:
+            The new snapshot id
+        """
+        scraped_at = int(scraped_at if scraped_at is not None else time.time())
+        points = []
+        for position, row in enumerate(rows):
+            trend, count = row[0], row[1]
+            slot, rank = (row[2], row[3]) if len(row) >= 4 else (0, position)
+            points.append((source, scraped_at, int(slot), int(rank), str(trend), int(count or 0)))
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                snapshot_id = self._conn.execute(
+                    "INSERT INTO snapshots (source, scraped_at, size) VALUES (?, ?, ?)",
+                    (source, scraped_at, len(points)),
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO points (snapshot_id, source, scraped_at, slot, rank, trend, count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(snapshot_id,) + point for point in points],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.compact(now=scraped_at)
+        return snapshot_id
+
+    def latest_time(self, source: str = "twitter"):
+        """Unix time of the newest snapshot for a source, or None"""
+        row = self._conn.execute(
+            "SELECT MAX(scraped_at) FROM snapshots WHERE source = ?", (source,)
+        ).fetchone()
+        return row[0]
+
+    def snapshot_times(self, source: str = "twitter", start: int = None, end: int = None) -> list:
+        """Snapshot times for a source within [start, end], oldest first"""
+        return [row[0] for row in self._conn.execute(
+            "SELECT scraped_at FROM snapshots WHERE source = ? AND scraped_at BETWEEN ? AND ? ORDER BY scraped_at",
+            (source, start if start is not None else 0, end if end is not None else 2 ** 62),
+        )]
+
+    def snapshot(self, scraped_at: int, source: str = "twitter") -> list:
+        """All (trend, count, slot, rank) rows of one snapshot, in scrape order"""
+        return self._conn.execute(
+            "SELECT trend, count, slot, rank FROM points WHERE source = ? AND scraped_at = ? ORDER BY slot, rank",
+            (source, scraped_at),
+        ).fetchall()
+
+    def latest(self, source: str = "twitter"):
+        """(scraped_at, rows) of the newest snapshot, or (None, []) when the store has none"""
+        scraped_at = self.latest_time(source)
+        if scraped_at is None:
+            return None, []
+        return scraped_at, self.snapshot(scraped_at, source)
+
+    def range(self, start: int, end: int, source: str = "twitter", slot: int = None) -> list:
+        """(scraped_at, trend, count, slot, rank) rows scraped within [start, end], oldest first"""
+        query = "SELECT scraped_at, trend, count, slot, rank FROM points WHERE source = ? AND scraped_at BETWEEN ? AND ?"
+        params = [source, start, end]
+        if slot is not None:
+            query += " AND slot = ?"
+            params.append(slot)
+        return self._conn.execute(query + " ORDER BY scraped_at, slot, rank", params).fetchall()
+
+    def history(self, trend: str, start: int = None, end: int = None, source: str = "twitter") -> list:
+        """(scraped_at, count) for one trend, highest count per snapshot, oldest first"""
+        return self._conn.execute(
+            "SELECT scraped_at, MAX(count) FROM points "
+            "WHERE trend = ? AND scraped_at BETWEEN ? AND ? AND source = ? "
+            "GROUP BY scraped_at ORDER BY scraped_at",
+            (trend, start if start is not None else 0, end if end is not None else 2 ** 62, source),
+        ).fetchall()
+
+    def load_momentum(self, source: str = "twitter") -> dict:
+        """Momentum state for a source as NumPy arrays sorted by trend"""
+        import numpy as np
+        from trend_momentum import empty_state
+
+        rows = self._conn.execute(
+            "SELECT trend, count, growth, acceleration, first_seen, last_seen FROM momentum "
+            "WHERE source = ? ORDER BY trend",
+            (source,),
+        ).fetchall()
+        if not rows:
+            return empty_state()
+        columns = list(zip(*rows))
+        state = {
+            "trend": np.array(columns[0], dtype=object),
+            "count": np.array(columns[1], dtype=np.float64),
+            "growth": np.array(columns[2], dtype=np.float64),
+            "acceleration": np.array(columns[3], dtype=np.float64),
+            "first_seen": np.array(columns[4], dtype=np.int64),
+            "last_seen": np.array(columns[5], dtype=np.int64),
+        }
+        # SQLite's text collation and NumPy's ordering can differ for non-ASCII names
+        order = np.argsort(state["trend"], kind="stable")
+        return {field: values[order] for field, values in state.items()}
+
+    def save_momentum(self, source: str, state: dict):
+        """Replace the momentum state for a source"""
+        rows = list(zip(
+            [source] * len(state["trend"]),
+            state["trend"].tolist(),
+            state["count"].tolist(),
+            state["growth"].tolist(),
+            state["acceleration"].tolist(),
+            state["first_seen"].tolist(),
+            state["last_seen"].tolist(),
+        ))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM momentum WHERE source = ?", (source,))
+                self._conn.executemany(
+                    "INSERT INTO momentum (source, trend, count, growth, acceleration, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def compact(self, now: int = None) -> int:
+        """
+        Enforce retention: drop snapshots older than retention_days, and keep
+        only the last snapshot per source and day once older than hourly_days.
+
+        Returns:
+            Number of snapshots removed
+        """
+        now = int(now if now is not None else time.time())
+        retention_cutoff = now - int(self.retention_days * DAY_SECONDS)
+        hourly_cutoff = now - int(self.hourly_days * DAY_SECONDS)
+        with self._lock:
+            doomed = self._conn.execute(
+                "SELECT id, source, scraped_at FROM snapshots WHERE scraped_at < ? "
+                "UNION "
+                "SELECT id, source, scraped_at FROM snapshots WHERE scraped_at < ? AND id NOT IN ("
+                "  SELECT MAX(id) FROM snapshots WHERE scraped_at < ? GROUP BY source, scraped_at / ?"
+                ")",
+                (retention_cutoff, hourly_cutoff, hourly_cutoff, DAY_SECONDS),
+            ).fetchall()
+            if not doomed:
+                return 0
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "DELETE FROM points WHERE source = ? AND scraped_at = ? AND snapshot_id = ?",
+                    [(source, scraped_at, i) for i, source, scraped_at in doomed],
+                )
+                self._conn.executemany("DELETE FROM snapshots WHERE id = ?", [(i,) for i, _, _ in doomed])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        print(f"[trend_store] Compacted {len(doomed)} snapshots")
+        return len(doomed)
+
+    def stats(self) -> dict:
+        snapshots, oldest, newest = self._conn.execute(
+            "SELECT COUNT(*), MIN(scraped_at), MAX(scraped_at) FROM snapshots"
+        ).fetchone()
+        points = self._conn.execute("SELECT COUNT(*) FROM points").fetchone()[0]
+        return {
+            "snapshots": snapshots,
+            "points": points,
+            "oldest": oldest,
+            "newest": newest,
+            "retention_days": self.retention_days,
+            "hourly_days": self.hourly_days,
+        }
+
+    def close(self):
+        self._conn.close()
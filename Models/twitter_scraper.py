@@ -1,57 +1,83 @@
-import requests
-from bs4 import BeautifulSoup
-import re
 import csv
+import os
 import time
+from fetch import shared_fetcher
+from page_parsers import convert_count, get_parser
+from trend_store import TrendStore
+from trend_momentum import update_momentum
 
-def convert_count(text):
-    match = re.search(r'(\d+(?:\.\d+)?)([KM]?)', text)
-    if match:
-        number = float(match.group(1))
-        multiplier = match.group(2)
-        if multiplier == 'K':
-            return int(number * 1_000)
-        elif multiplier == 'M':
-            return int(number * 1_000_000)
-        else:
-            return int(number)
-    return 0
-
-def scrape_twitter_trends():
-    url = 'https://trends24.in/india/'
-    r = requests.get(url)
-    soup = BeautifulSoup(r.content, 'html.parser')
-
-    trends_section = soup.find_all('ol', class_='trend-card__list')
-
-    trends = []
-    for trend_list in trends_section:
-        for trend in trend_list.find_all('li'):
-            trend_text = trend.get_text(strip=True)
-            match = re.match(r'^(.*?)(\d+(?:[KM]?)$)', trend_text)
-            if match:
-                trend_name = match.group(1).strip()
-                trend_count = convert_count(match.group(2))
-            else:
-                trend_name = trend_text.strip()
-                trend_count = 0
-            trends.append([trend_name, trend_count])
-
-    filename = r'twitter_scraper.csv'
-
-    with open(filename, 'w', newline='', encoding='utf-8') as csv_file:
-        writer = csv.writer(csv_file)
-        writer.writerow(['Trend', 'Count'])
-        writer.writerows(trends)
-
-    print(f"Data has been stored in {filename}")
+# trends24 regions scraped each cycle, e.g. "india,united-states,united-kingdom"
+# ("worldwide" is the site root). The first region feeds twitter_scraper.csv.
+TRENDS24_REGIONS = [r.strip() for r in os.getenv("TRENDS24_REGIONS", "india").split(",") if r.strip()]
+TRENDS24_BASE_URL = os.getenv("TRENDS24_BASE_URL", "https://trends24.in").rstrip("/")
+
+def region_url(region: str) -> str:
+    return f"{TRENDS24_BASE_URL}/" if region == "worldwide" else f"{TRENDS24_BASE_URL}/{region}/"
+
+def region_source(region: str, primary: str) -> str:
+    """Trend store source name: the primary region keeps the historical "twitter" source"""
+    return "twitter" if region == primary else f"twitter:{region}"
+
+def parse_trends24(content):
+    """(trend, count, slot, rank) for every trend on a trends24 page; slot 0 is the current hour"""
+    return get_parser().trends24(content)
+
+def scrape_twitter_trends(regions=None, fetcher=None):
+    """
+    Scrape all trends24 regions concurrently and store their snapshots.
+
+    Pages that are unchanged since the last cycle (HTTP 304) are skipped.
+
+    Returns:
+        {region: number of trends stored} for the regions that changed
+    """
+    regions = regions or TRENDS24_REGIONS
+    fetcher = fetcher or shared_fetcher()
+    urls = {region: region_url(region) for region in regions}
+    results = fetcher.fetch_many(urls.values(), namespace="twitter_scraper")
+
+    stored = {}
+    store = TrendStore()
+    try:
+        for region, url in urls.items():
+            result = results[url]
+            if not result.ok:
+                print(f"Failed to fetch {url}: {result.error}")
+                continue
+            if result.not_modified:
+                print(f"{region}: unchanged since last scrape, skipped")
+                continue
+            points = parse_trends24(result.content)
+
+            if region == regions[0]:
+                filename = r'twitter_scraper.csv'
+
+                with open(filename, 'w', newline='', encoding='utf-8') as csv_file:
+                    writer = csv.writer(csv_file)
+                    writer.writerow(['Trend', 'Count'])
+                    writer.writerows([name, count] for name, count, _, _ in points)
+
+            # Append the snapshot to the history store after the CSV (which stays the
+            # "latest" view the Node backend reads), so the store is never older than it
+            source = region_source(region, regions[0])
+            store.append_snapshot(points, source=source)
+            # Growth / acceleration / freshness for retrieval re-ranking, O(trends)
+            update_momentum(store, source)
+            stored[region] = len(points)
+            fetcher.commit(url, namespace="twitter_scraper")
+    finally:
+        store.close()
+
+    print(f"Stored {sum(stored.values())} trends from {len(stored)}/{len(regions)} regions "
+          f"(twitter_scraper.csv + trend history store)")
+    return stored
 
 if __name__ == "__main__":
-    print("Starting hourly Twitter scraping. Press Ctrl+C to stop.")
+    print(f"Starting hourly Twitter scraping for {len(TRENDS24_REGIONS)} region(s). Press Ctrl+C to stop.")
     try:
         while True:
             scrape_twitter_trends()
             print("Waiting 1 hour for next scrape...")
             time.sleep(3600)
     except KeyboardInterrupt:
-        print("Stopped by user.")
\ No newline at end of file
+        print("Stopped by user.")
@@ -0,0 +1,520 @@
+"""
+Pluggable nearest-neighbour index layer for trend embeddings.
+
+All backends take L2-normalized float32 vectors, score by inner product
+(= cosine similarity) and share one interface:
+
+    index = create_index("flat" | "ivf" | "hnsw", dim)
+    index.build(vectors)            # replace contents
+    index.add(vectors)              # append; ids continue from len(index)
+    ids, scores = index.search(queries, top_k, row_bias=None)
+    index.save(path) / load_index(path)
+
+`row_bias` is an optional additive score per row id, shape (n,) or
+(num_queries, n): positive values boost rows, -inf excludes them. It is
+applied inside the scoring pass, so filters and boosts need no second search.
+
+"flat" is exact brute force and the default. "ivf" is an inverted-file index
+(k-means coarse quantizer, probe the nprobe closest lists) in pure NumPy.
+"hnsw" wraps hnswlib, which is an optional dependency. "fp16" and "int8"
+scan a quantized copy of the vectors (int8 with a per-vector scale) from a
+memory-mapped file and re-rank the best candidates in float32.
+"""
+import json
+import mmap
+import os
+
+import numpy as np
+
+
+def _empty_result(num_queries: int):
+    return np.empty((num_queries, 0), dtype=np.int64), np.empty((num_queries, 0), dtype=np.float32)
+
+
+def _top_k(scores: np.ndarray, k: int):
+    """Row-wise top-k of a (queries, candidates) score matrix, sorted descending"""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return _empty_result(scores.shape[0])
+    if k < n:
+        candidates = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+def _atomic_replace(path: str, write_to):
+    """Call write_to(temporary path), then rename that file to path"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write_to(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _atomic_write(path: str, write):
+    """Call write(binary file) on a temporary file, then rename it to path"""
+    def write_file(tmp_path):
+        with open(tmp_path, "wb") as f:
+            write(f)
+    _atomic_replace(path, write_file)
+
+
+class FlatIndex:
+    """Exact search: one matrix product over all vectors plus argpartition"""
+
+    backend = "flat"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def build(self, vectors: np.ndarray):
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        return self
+
+    def add(self, vectors: np.ndarray):
+        self.vectors = np.ascontiguousarray(np.vstack([self.vectors, vectors]), dtype=np.float32)
+        return self
+
+    def search(self, queries: np.ndarray, top_k: int, row_bias: np.ndarray = None):
+        if len(self.vectors) == 0:
+            return _empty_result(len(queries))
+        scores = queries @ self.vectors.T
+        if row_bias is not None:
+            scores += row_bias
+        return _top_k(scores, top_k)
+
+    def save(self, path: str):
+        _atomic_write(path, lambda f: np.savez(f, backend=self.backend, vectors=self.vectors))
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            vectors = data["vectors"]
+        return cls(vectors.shape[1]).build(vectors)
+
+
+class IVFIndex:
+    """
+    Inverted-file index.
+
+    Vectors are clustered into `nlist` lists by spherical k-means; a query
+    scores the centroids, then only the vectors in its `nprobe` best lists.
+    Vectors are stored grouped by list in one contiguous matrix.
+    """
+
+    backend = "ivf"
+    # Arrays written by save_npy
+    NPY_ARRAYS = ("centroids", "vectors", "ids", "list_of", "offsets")
+
+    def __init__(self, dim: int, nlist: int = None, nprobe: int = None, train_iters: int = 8, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe or int(os.getenv("IVF_NPROBE", "8"))
+        self.train_iters = train_iters
+        self.seed = seed
+        self.centroids = None
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.list_of = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def train(self, vectors: np.ndarray):
+        n = len(vectors)
+        nlist = self.nlist or max(1, int(2 * np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(n, size=min(n, nlist * 32), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(self.train_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            # Empty lists keep their previous centroid
+            filled = counts > 0
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+            centroids[filled] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nlist = nlist
+        return self
+
+    def _assign(self, vectors: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[i:i + chunk] @ self.centroids.T, axis=1)
+            for i in range(0, len(vectors), chunk)
+        ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+    def _store(self, vectors: np.ndarray, ids: np.ndarray, assign: np.ndarray):
+        order = np.argsort(assign, kind="stable")
+        self.vectors = np.ascontiguousarray(vectors[order], dtype=np.float32)
+        self.ids = ids[order]
+        self.list_of = assign[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.nlist))])
+
+    def build(self, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.centroids is None:
+            self.train(vectors)
+        self._store(vectors, np.arange(len(vectors), dtype=np.int64), self._assign(vectors))
+        return self
+
+    def add(self, vectors: np.ndarray):
+        """Append vectors to their nearest lists without retraining the quantizer"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.centroids is None:
+            return self.build(vectors)
+        new_ids = np.arange(len(self.ids), len(self.ids) + len(vectors), dtype=np.int64)
+        self._store(
+            np.vstack([self.vectors, vectors]),
+            np.concatenate([self.ids, new_ids]),
+            np.concatenate([self.list_of, self._assign(vectors)]),
+        )
+        return self
+
+    def search(self, queries: np.ndarray, top_k: int, row_bias: np.ndarray = None):
+        if len(self.ids) == 0:
+            return _empty_result(len(queries))
+        nprobe = min(self.nprobe, self.nlist)
+        probe_lists, _ = _top_k(queries @ self.centroids.T, nprobe)
+        all_ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probe_lists):
+            rows = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+            if len(rows) == 0:
+                continue
+            scores = self.vectors[rows] @ queries[q]
+            if row_bias is not None:
+                scores += (row_bias if row_bias.ndim == 1 else row_bias[q])[self.ids[rows]]
+            top, top_scores = _top_k(scores[None, :], top_k)
+            all_ids[q, :top.shape[1]] = self.ids[rows[top[0]]]
+            all_scores[q, :top.shape[1]] = top_scores[0]
+        k = min(top_k, len(self.ids))
+        return all_ids[:, :k], all_scores[:, :k]
+
+    def save_npy(self, directory: str):
+        """Write the arrays as <directory>/ivf.<name>.npy, so processes can share them (see map)"""
+        for name in self.NPY_ARRAYS:
+            np.save(os.path.join(directory, f"ivf.{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def map(cls, directory: str, nprobe: int = None):
+        """Index over read-only memory maps of the arrays written by save_npy"""
+        arrays = {name: map_npy(os.path.join(directory, f"ivf.{name}.npy")) for name in cls.NPY_ARRAYS}
+        index = cls(arrays["vectors"].shape[1], nlist=len(arrays["centroids"]), nprobe=nprobe)
+        for name, array in arrays.items():
+            setattr(index, name, array)
+        return index
+
+    def save(self, path: str):
+        _atomic_write(path, lambda f: np.savez(
+            f, backend=self.backend, centroids=self.centroids, vectors=self.vectors,
+            ids=self.ids, list_of=self.list_of, offsets=self.offsets, nprobe=self.nprobe,
+        ))
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as data:
+            index = cls(data["vectors"].shape[1], nlist=len(data["centroids"]), nprobe=int(data["nprobe"]))
+            index.centroids = data["centroids"]
+            index.vectors = data["vectors"]
+            index.ids = data["ids"]
+            index.list_of = data["list_of"]
+            index.offsets = data["offsets"]
+        return index
+
+
+class HNSWIndex:
+    """Hierarchical navigable small-world graph via hnswlib (pip install hnswlib)"""
+
+    backend = "hnsw"
+
+    def __init__(self, dim: int, m: int = 16, ef_construction: int = 200, ef: int = None):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("The hnsw index backend requires hnswlib: pip install hnswlib") from e
+        self._hnswlib = hnswlib
+        self.dim = dim
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef or int(os.getenv("HNSW_EF", "64"))
+        self._index = None
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _new_graph(self, capacity: int):
+        self._index = self._hnswlib.Index(space="ip", dim=self.dim)
+        self._index.init_index(max_elements=max(capacity, 1), M=self.m, ef_construction=self.ef_construction)
+        self._index.set_ef(self.ef)
+        self._count = 0
+
+    def build(self, vectors: np.ndarray):
+        self._new_graph(len(vectors))
+        return self.add(vectors)
+
+    def add(self, vectors: np.ndarray):
+        if self._index is None:
+            self._new_graph(len(vectors))
+        needed = self._count + len(vectors)
+        if needed > self._index.get_max_elements():
+            self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+        if len(vectors):
+            ids = np.arange(self._count, needed, dtype=np.int64)
+            self._index.add_items(np.ascontiguousarray(vectors, dtype=np.float32), ids)
+        self._count = needed
+        return self
+
+    def search(self, queries: np.ndarray, top_k: int, row_bias: np.ndarray = None):
+        k = min(top_k, self._count)
+        if k <= 0:
+            return _empty_result(len(queries))
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        # With a bias the graph cannot see, over-fetch and re-rank the candidates
+        fetch = k if row_bias is None else min(self._count, k * 4)
+        while True:
+            self._index.set_ef(max(self.ef, fetch))
+            labels, distances = self._index.knn_query(queries, k=fetch)
+            labels = labels.astype(np.int64)
+            # hnswlib's "ip" distance is 1 - inner product
+            scores = (1.0 - distances).astype(np.float32)
+            if row_bias is None:
+                return labels, scores
+            bias = row_bias[labels] if row_bias.ndim == 1 else np.take_along_axis(row_bias, labels, axis=1)
+            scores += bias
+            # A -inf bias excludes rows (source filters): widen the search until every
+            # query has k candidates left, as exact search would return
+            if fetch >= self._count or (np.isfinite(scores).sum(axis=1) >= k).all():
+                break
+            fetch = min(self._count, fetch * 4)
+        top, top_scores = _top_k(scores, k)
+        return np.take_along_axis(labels, top, axis=1), top_scores
+
+    def save(self, path: str):
+        """Write the graph, then the .json metadata, so the index counts as saved (see is_saved) only once complete"""
+        _atomic_replace(path, self._index.save_index)
+        meta = {"backend": self.backend, "dim": self.dim, "count": self._count, "m": self.m,
+                "ef_construction": self.ef_construction, "ef": self.ef}
+        _atomic_write(path + ".json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], m=meta["m"], ef_construction=meta["ef_construction"], ef=meta["ef"])
+        index._index = index._hnswlib.Index(space="ip", dim=meta["dim"])
+        index._index.load_index(path, max_elements=meta["count"])
+        index._index.set_ef(index.ef)
+        index._count = meta["count"]
+        return index
+
+
+def npy_header(path: str):
+    """(shape, dtype, data offset) of a C-ordered .npy file"""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        if fortran_order:
+            raise ValueError(f"{path} is Fortran-ordered")
+        return shape, dtype, f.tell()
+
+
+def map_npy(path: str, random_access: bool = False) -> np.ndarray:
+    """
+    Read-only memory map of a .npy file.
+
+    random_access turns off kernel read-ahead (MADV_RANDOM) for files that
+    are only read a few scattered rows at a time.
+    """
+    shape, dtype, offset = npy_header(path)
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if random_access and hasattr(mapped, "madvise"):
+        mapped.madvise(mmap.MADV_RANDOM)
+    return np.ndarray(shape, dtype=dtype, buffer=mapped, offset=offset)
+
+
+class QuantizedIndex:
+    """
+    Exact-scan index over float16 or int8 vectors, memory-mapped once saved.
+
+    Every query scores all rows from the quantized matrix (2 or ~1 byte per
+    dimension instead of 4), in blocks so no float32 copy of the matrix is
+    ever materialized. The best `rerank` * top_k candidates are then re-scored
+    against the float32 vectors, which stay on disk next to the codes: once
+    saved, only those candidate rows are read (pread), so the float32 matrix
+    never becomes resident. Resident memory is the quantized matrix; loading
+    a saved index only maps the files.
+
+    int8 codes are round(v / scale) with scale = max|v| / 127 per vector.
+    NumPy converts float16 without SIMD on most CPUs, so the fp16 scan is
+    slower than int8 (see bench_quantized.py).
+    """
+
+    dtype = None
+    backend = None
+    BLOCK_ROWS = 8192
+
+    def __init__(self, dim: int, rerank: int = None):
+        self.dim = dim
+        self.rerank = rerank or int(os.getenv("QUANTIZED_RERANK", "4"))
+        self.codes = np.zeros((0, dim), dtype=self.dtype)
+        self.scales = np.zeros(0, dtype=np.float32)
+        # float32 vectors for re-ranking: in memory until saved, then memory-mapped
+        self.full_precision = np.zeros((0, dim), dtype=np.float32)
+        self._f32_fd = None
+        self._f32_offset = 0
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _quantize(self, vectors: np.ndarray):
+        if self.dtype == np.float16:
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+
+    def build(self, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.full_precision = vectors
+        self.codes, self.scales = self._quantize(vectors)
+        return self
+
+    def add(self, vectors: np.ndarray):
+        return self.build(np.vstack([np.asarray(self.full_precision), vectors]))
+
+    def _scan(self, queries: np.ndarray) -> np.ndarray:
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        queries_t = np.ascontiguousarray(queries.T, dtype=np.float32)
+        for start in range(0, len(self.codes), self.BLOCK_ROWS):
+            block = np.asarray(self.codes[start:start + self.BLOCK_ROWS], dtype=np.float32)
+            block_scores = block @ queries_t
+            if self.dtype != np.float16:
+                block_scores *= self.scales[start:start + self.BLOCK_ROWS, None]
+            scores[:, start:start + len(block)] = block_scores.T
+        return scores
+
+    def search(self, queries: np.ndarray, top_k: int, row_bias: np.ndarray = None):
+        if len(self.codes) == 0:
+            return _empty_result(len(queries))
+        scores = self._scan(queries)
+        if row_bias is not None:
+            scores += row_bias
+        candidates, _ = _top_k(scores, top_k * max(self.rerank, 1))
+        # float32 re-rank of the candidates only
+        rows = self.rows(candidates.ravel()).reshape(*candidates.shape, self.dim)
+        exact = np.einsum("qkd,qd->qk", rows, queries.astype(np.float32))
+        if row_bias is not None:
+            exact += row_bias[candidates] if row_bias.ndim == 1 else np.take_along_axis(row_bias, candidates, axis=1)
+        top, top_scores = _top_k(exact.astype(np.float32), top_k)
+        return np.take_along_axis(candidates, top, axis=1), top_scores
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        """float32 vectors of the given rows, read from disk once the index is saved"""
+        if self._f32_fd is None:
+            return np.asarray(self.full_precision[ids])
+        row_bytes = self.dim * 4
+        out = np.empty((len(ids), self.dim), dtype=np.float32)
+        for i, row in enumerate(ids):
+            data = os.pread(self._f32_fd, row_bytes, self._f32_offset + int(row) * row_bytes)
+            out[i] = np.frombuffer(data, dtype=np.float32)
+        return out
+
+    def save(self, path: str):
+        """
+        Write codes, scales and float32 vectors as .npy files, then switch to memory-mapping them.
+
+        Every file is written under a temporary name and renamed into place, the
+        .json metadata last, so the index counts as saved (see is_saved) only once
+        all of it is complete. Renaming also leaves the files of an index that a
+        live snapshot still maps untouched.
+        """
+        for suffix, array in (("", self.codes), (".scales.npy", self.scales),
+                              (".f32.npy", np.asarray(self.full_precision))):
+            _atomic_write(path + suffix, lambda f, array=array: np.save(f, array))
+        meta = {"backend": self.backend, "dim": self.dim, "count": len(self.codes), "rerank": self.rerank}
+        _atomic_write(path + ".json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+        self._map(path)
+
+    def _map(self, path: str):
+        self.codes = map_npy(path)
+        self.scales = np.load(path + ".scales.npy")
+        self.full_precision = map_npy(path + ".f32.npy", random_access=True)
+        if hasattr(os, "pread"):
+            if self._f32_fd is not None:
+                os.close(self._f32_fd)
+            self._f32_offset = npy_header(path + ".f32.npy")[2]
+            self._f32_fd = os.open(path + ".f32.npy", os.O_RDONLY)
+
+    def __del__(self):
+        if getattr(self, "_f32_fd", None) is not None:
+            os.close(self._f32_fd)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], rerank=meta.get("rerank"))
+        index._map(path)
+        return index
+
+
+class Float16Index(QuantizedIndex):
+    dtype = np.float16
+    backend = "fp16"
+
+
+class Int8Index(QuantizedIndex):
+    dtype = np.int8
+    backend = "int8"
+
+
+BACKENDS = {"flat": FlatIndex, "ivf": IVFIndex, "hnsw": HNSWIndex, "fp16": Float16Index, "int8": Int8Index}
+# Backends whose saved files include the float32 vectors (see QuantizedIndex)
+QUANTIZED_BACKENDS = ("fp16", "int8")
+
+
+def create_index(backend: str, dim: int, **kwargs):
+    """Instantiate an empty index for a backend name ("flat", "ivf", "hnsw", "fp16" or "int8")"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown index backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](dim, **kwargs)
+
+
+def index_filename(backend: str, name: str) -> str:
+    """File name used to persist an index of this backend"""
+    if backend == "hnsw":
+        return f"{name}.{backend}.bin"
+    if backend in QUANTIZED_BACKENDS:
+        return f"{name}.{backend}.npy"
+    return f"{name}.{backend}.npz"
+
+
+def is_saved(path: str, backend: str) -> bool:
+    """Whether a complete saved index exists at path (hnsw and quantized indexes: their .json, written last)"""
+    return os.path.exists(path + ".json" if backend == "hnsw" or backend in QUANTIZED_BACKENDS else path)
+
+
+def load_index(path: str, backend: str):
+    return BACKENDS[backend].load(path)